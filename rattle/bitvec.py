@@ -1,7 +1,16 @@
 """Three-valued logic and three-valued bit vectors."""
+import re
+
 from .bitmath import bitindex, bitmask, bitrepeat, signext
 
 
+# Vectors are immutable, so frequently created values are shared. These are
+# all values of width one and the all zero and all x values of each width.
+_interned = {}
+
+_X_DIGITS = str.maketrans('2', 'x')
+
+
 class BitVec:
     """Three-valued bit vector.
 
@@ -9,6 +18,11 @@ class BitVec:
     The string representation is MSB first and uses ``1``, ``0``, and ``x``
     respectively.
 
+    The :attr:`width`, :attr:`value` and :attr:`mask` attributes are plain
+    fields. A BitVec is immutable and must not be modified after construction,
+    as equal vectors may be shared. The value is an int using ``0`` in place of
+    ``x`` and the mask is ``1`` exactly where the BitVec is ``x``.
+
     Supported operations using standard Python operators include:
 
     *   Boolean logic by broadcasting operations and zero-extending on a width
@@ -18,7 +32,9 @@ class BitVec:
     *   Arithmetic comparison (unsigned)
     *   Bitshifts
     """
-    def __init__(self, width, value, mask=0):
+    __slots__ = ('width', 'value', 'mask')
+
+    def __new__(cls, width, value, mask=0):
         """Construct a BitVec from the value/mask representation.
 
         Automatically zeros mask bits in value and truncates value and mask.
@@ -26,35 +42,43 @@ class BitVec:
         Most of the time you should use the :func:`bv` helper instead for
         constructing BitVec values.
         """
-        self.__width = width
-        width_mask = bitmask(width)
-        self.__value = (value & ~mask) & width_mask
-        self.__mask = mask & width_mask
-
-    @property
-    def width(self):
-        """Bit width."""
-        return self.__width
-
-    @property
-    def value(self):
-        """Value as int using ``0`` in place of ``x``."""
-        return self.__value
-
-    @property
-    def mask(self):
-        """Bit mask that is ``1`` exactly when the the BitVec is ``x``."""
-        return self.__mask
+        width_mask = (1 << width) - 1
+        mask &= width_mask
+        value &= width_mask & ~mask
+        if width == 1 or not value and (not mask or mask == width_mask):
+            key = (width, value, mask)
+            try:
+                return _interned[key]
+            except KeyError:
+                pass
+            self = _interned[key] = object.__new__(cls)
+        else:
+            self = object.__new__(cls)
+        self.width = width
+        self.value = value
+        self.mask = mask
+        return self
+
+    def __reduce__(self):
+        return (BitVec, (self.width, self.value, self.mask))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):  # pylint: disable=unused-argument
+        return self
 
     def __str__(self):
-        def bit_reprs(bit):
-            if bit is False:
-                return '0'
-            elif bit is True:
-                return '1'
-            else:
-                return 'x'
-        return ''.join(bit_reprs(bit) for bit in self)[::-1]
+        if not self.width:
+            return ''
+        digits = format(self.value, '0%ib' % self.width)
+        if not self.mask:
+            return digits
+        # Reading binary digits as hex places each bit in its own nibble,
+        # where value and mask bits can be added up to a digit each
+        mask_digits = format(self.mask, '0%ib' % self.width)
+        nibbles = int(digits, 16) + 2 * int(mask_digits, 16)
+        return format(nibbles, '0%ix' % self.width).translate(_X_DIGITS)
 
     def __repr__(self):
         return "bv('%s')" % str(self)
@@ -104,11 +128,7 @@ class BitVec:
             if width < 0:
                 raise IndexError('BitVec stop index before start index')
 
-            width_mask = bitmask(width)
-            return BitVec(
-                width,
-                (self.value >> start) & width_mask,
-                (self.mask >> start) & width_mask)
+            return BitVec(width, self.value >> start, self.mask >> start)
         else:
             raise TypeError('BitVec indices must be integers or slices')
 
@@ -143,7 +163,12 @@ class BitVec:
     def __and__(self, other):
         if not isinstance(other, BitVec):
             return NotImplemented
-        return ~(~self | ~other)
+        if self.width != other.width:
+            return ~(~self | ~other)
+        value = self.value & other.value
+        mask = (self.mask | other.mask) & (
+            (self.value | self.mask) & (other.value | other.mask))
+        return BitVec(self.width, value, mask)
 
     def __xor__(self, other):
         if not isinstance(other, BitVec):
@@ -187,10 +212,10 @@ class BitVec:
             return self == bv(other)
         elif not isinstance(other, BitVec):
             return NotImplemented
-        diff = self ^ other
-        if diff.value != 0:
+        mask = self.mask | other.mask
+        if (self.value ^ other.value) & ~mask:
             return False
-        elif diff.mask != 0:
+        elif mask:
             return X
         else:
             return True
@@ -237,8 +262,12 @@ class BitVec:
         The first given vector comes first (LSB) in the resulting vector.
         """
         # TODO Add __matmul__ for concatenation?
-        # TODO Use more efficient implementation?
-        return bv(''.join(str(value) for value in reversed(values)))
+        width = value = mask = 0
+        for part in values:
+            value |= part.value << width
+            mask |= part.mask << width
+            width += part.width
+        return BitVec(width, value, mask)
 
     def repeat(self, count):
         """Concatenate multiple copies of the same bit vector."""
@@ -389,6 +418,21 @@ def _raise(cls):  # pylint: disable=unused-argument
 XClass.__new__ = _raise
 
 
+def _literal_digits(digits, base):
+    # Translation tables for the value and the mask digits of a literal
+    value_digits = str.maketrans('xX', '00')
+    mask_digits = str.maketrans(
+        digits + 'xX', '0' * len(digits) + 2 * '0123456789abcdef'[base - 1])
+    return base, re.compile('[%sxX]*' % digits), value_digits, mask_digits
+
+
+_LITERAL_DIGITS = {
+    'b': _literal_digits('01', 2),
+    'o': _literal_digits('01234567', 8),
+    'h': _literal_digits('0123456789abcdefABCDEF', 16),
+}
+
+
 def bv(value):
     """Construct a BitVec.
 
@@ -396,6 +440,11 @@ def bv(value):
 
     *   A string representation of a bit vector (``0``, ``1`` and ``x`` MSB
         first).
+    *   A Verilog style literal with a ``'b``, ``'o`` or ``'h`` base prefix,
+        e.g. ``'h3x``, where each digit, including ``x`` digits, stands for
+        one, three or four bits. An optional width can precede the prefix, as
+        in ``8'h3x``. Extension to that width repeats a leading ``x`` and
+        zero-extends otherwise.
     *   An int ``x``, resulting in a bit vector of width ``x.bit_length()``.
     """
     if value is True:
@@ -408,16 +457,39 @@ def bv(value):
         return BitVec(value.bit_length(), value)
     # TODO Make it possible to extend this
 
-    # TODO Hex
     if not isinstance(value, str):
         # TODO incorrect error message
         raise TypeError('bv value must be a str')
-    if any(c not in '01xX' for c in value):
+
+    width = None
+    radix = 'b'
+    if "'" in value:
+        width, value = value.split("'", 1)
+        radix, value = value[:1].lower(), value[1:]
+        if radix not in _LITERAL_DIGITS:
+            raise ValueError('invalid bit value base')
+        if width:
+            if not width.isdigit():
+                raise ValueError('invalid bit value width')
+            width = int(width)
+        else:
+            width = None
+
+    base, digits, value_digits, mask_digits = _LITERAL_DIGITS[radix]
+    if not digits.fullmatch(value):
         raise ValueError('invalid bit value')
-    value = value[::-1]
-    width = len(value)
-    bits = sum((value[i] == '1') << i for i in range(width))
-    mask = sum((value[i] in 'xX') << i for i in range(width))
+
+    digits_width = len(value) * (base.bit_length() - 1)
+    if not value:
+        bits = mask = 0
+    else:
+        bits = int(value.translate(value_digits), base)
+        mask = int(value.translate(mask_digits), base)
+
+    if width is None:
+        width = digits_width
+    elif width > digits_width and mask and mask >> (digits_width - 1) & 1:
+        mask |= bitmask(width, digits_width)
 
     return BitVec(width, bits, mask)
 
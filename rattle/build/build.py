@@ -7,6 +7,7 @@ from contextlib import contextmanager
 from pathlib import Path
 
 from ..verilog import Verilog
+from ..verilog.cache import VerilogCache
 from ..attribute import Attribute, BuildAttribute
 from ..primitive import PrimSlice, PrimStorage
 from ..signal import Signal
@@ -109,8 +110,11 @@ class Build(metaclass=abc.ABCMeta):
         verilog_dir = self.build_dir / 'verilog'
 
         verilog_dir.mkdir(exist_ok=True)
-        verilog_gen = Verilog(self.top_module)
+        # Kept so that callers can inspect the hit and miss counts
+        self.verilog_cache = VerilogCache(self.build_dir / 'verilog_cache')
+        verilog_gen = Verilog(self.top_module, cache=self.verilog_cache)
         paths = verilog_gen.write_to_dir(verilog_dir)
+        self.verilog_cache.evict()
 
         for file in verilog_dir.glob('*.v'):
             if file not in paths:
@@ -1,3 +1,4 @@
+import copy
 from collections import OrderedDict, namedtuple
 
 
@@ -14,6 +15,9 @@ class Circuit:
 
         self.clocked_storage = {}
 
+        self.keep = set()
+        self.removed_storage = set()
+
         self.finalized = False
         # TODO forbid modification after finalizing
 
@@ -63,18 +67,26 @@ class Circuit:
     def add_inout(self, lvalue, rvalue):
         self.inout.append((lvalue, rvalue))
 
+    def add_keep(self, prim):
+        self.keep.update(prim.simplify_read().accessed_storage)
+
     @staticmethod
     def _opt_passes():
         from .opt.lower_sync_reset import LowerSyncReset
+        from .opt.lower_async_reset import LowerAsyncReset
         from .opt.remove_overwritten_assignments import (
             RemoveOverwrittenAssignments)
         from .opt.find_continuous_assignments import FindContinuousAssignments
+        from .opt.eliminate_common_subexpressions import (
+            EliminateCommonSubexpressions)
         from .opt.reduce_bit_widths import ReduceBitWidths
 
         return [
             LowerSyncReset,
+            LowerAsyncReset,
             RemoveOverwrittenAssignments,
             FindContinuousAssignments,
+            EliminateCommonSubexpressions,
             ReduceBitWidths,
         ]
 
@@ -87,6 +99,31 @@ class Circuit:
 
         self.finalized = True
 
+    def eliminate_dead_logic(self, keep=()):
+        """Copy of the circuit without logic not affecting IO or kept storage.
+
+        Storage accessed by prims in ``keep`` or passed to :meth:`add_keep` is
+        kept. The circuit itself is finalized but not modified otherwise.
+        """
+        from .opt.eliminate_dead_logic import EliminateDeadLogic
+
+        self.finalize()
+
+        circuit = copy.copy(self)
+        for name in (
+                'combinational', 'assign', 'clocked', 'async_reset',
+                'sync_reset', 'initial', 'clocked_storage'):
+            setattr(circuit, name, getattr(self, name).copy())
+        circuit.inout = list(self.inout)
+        circuit.keep = set(self.keep)
+        circuit.removed_storage = set(self.removed_storage)
+
+        for prim in keep:
+            circuit.add_keep(prim)
+
+        EliminateDeadLogic(circuit)
+        return circuit
+
     def blocks(self):
         for block_dict in (
                 self.combinational,
@@ -0,0 +1,176 @@
+"""Cloning of elaborated modules, see :func:`rattle.module.elaborate_once`.
+
+A clone copies the finalized circuit, the names and the attributes of its
+template and of all the template's submodules, replacing the template's
+storage by fresh storage of the clone. Signals stored in attributes of the
+modules are replaced by signals of the clone. Other attribute values are
+shared with the template.
+"""
+import copy
+
+from . import context
+from .attribute import Attribute
+from .circuit import Block, Circuit
+from .names import Names
+from .primitive import PrimSignal, PrimStorage, PrimReg
+from .signal import Signal, _wrap_assign_x_parent
+
+
+class _Cloner:
+    def __init__(self):
+        self.prims = {}
+        self.signals = {}
+        self.modules = {}
+
+    def module(self, template):
+        from .module import ModuleData
+
+        ctx = context.current()
+        cls = type(template)
+        module = cls.__new__(cls)
+        module_data = module._module_data = ModuleData(ctx, module)
+        self.modules[template] = module
+
+        template_data = template._module_data
+        template_data.circuit.finalize()
+
+        for prim in template_data.storage_prims:
+            storage = self.prims[prim] = PrimStorage(
+                module, prim.direction, prim.width, prim.dimensions)
+            module_data.storage_prims.append(storage)
+        module_data.io_prims = [
+            self.prims[prim] for prim in template_data.io_prims]
+
+        with ctx.constructing_module(module):
+            for submodule in template_data.submodules:
+                self.module(submodule)
+
+        for prim in template_data.storage_prims:
+            if prim.signal is not None:
+                self.prims[prim].signal = self.value(prim.signal)
+
+        module_data.circuit = self.circuit(template_data.circuit)
+        module_data.names = self.names(template_data.names)
+        module_data.instance_name = template_data.instance_name
+        module_data.attributes = self.value(template_data.attributes)
+        module_data.implicit_bindings = self.value(
+            template_data.implicit_bindings)
+        module_data.implicit_inputs = list(template_data.implicit_inputs)
+
+        for name, value in template.__dict__.items():
+            if name != '_module_data':
+                module.__dict__[name] = self.value(value)
+
+        return module
+
+    def prim(self, prim):
+        try:
+            return self.prims[prim]
+        except KeyError:
+            pass
+        if isinstance(prim, PrimStorage):
+            # Storage outside of the template is shared
+            result = prim
+        elif isinstance(prim, PrimReg):
+            # The clock, enable and reset of a register are no operands
+            result = PrimReg(
+                self.value(prim.clk), self.value(prim.en),
+                self.value(prim.reset), prim.reset_mode,
+                self.prim(prim.x))
+        else:
+            result = prim.map(self.value)
+        self.prims[prim] = result
+        return result
+
+    def value(self, value):
+        if isinstance(value, PrimSignal):
+            return self.prim(value)
+        elif isinstance(value, Signal):
+            return self.signal(value)
+        elif _is_module(value):
+            # Modules outside of the template are shared
+            return self.modules.get(value, value)
+        elif isinstance(value, tuple):
+            items = [self.value(item) for item in value]
+            if hasattr(value, '_fields'):
+                return type(value)(*items)
+            return type(value)(items)
+        elif isinstance(value, (list, set, frozenset)):
+            return type(value)(self.value(item) for item in value)
+        elif isinstance(value, dict):
+            return type(value)(
+                (self.value(key), self.value(item))
+                for key, item in value.items())
+        elif isinstance(value, Block):
+            block = Block()
+            block.assignments = self.value(value.assignments)
+            block.storage = self.value(value.storage)
+            return block
+        elif isinstance(value, Attribute):
+            attribute = copy.copy(value)
+            attribute.__dict__ = self.value(value.__dict__)
+            return attribute
+        return value
+
+    def signal(self, signal):
+        try:
+            return self.signals[id(signal)][1]
+        except KeyError:
+            pass
+        prims = {key: self.prim(prim) for key, prim in signal._prims.items()}
+        result = type(signal)(
+            signal.signal_type, prims, storage=signal._storage)
+        # The template's signal is kept alive, so its id isn't reused
+        self.signals[id(signal)] = (signal, result)
+        return result
+
+    def circuit(self, template):
+        circuit = Circuit()
+        for name in (
+                'combinational', 'assign', 'clocked', 'async_reset',
+                'sync_reset', 'initial', 'clocked_storage'):
+            setattr(circuit, name, self.value(getattr(template, name)))
+        circuit.inout = self.value(template.inout)
+        circuit.keep = self.value(template.keep)
+        circuit.removed_storage = self.value(template.removed_storage)
+        circuit.finalized = template.finalized
+        return circuit
+
+    def names(self, template):
+        names = Names()
+        names.used_names = set(template.used_names)
+        names.prim_to_name = {
+            self.prim(prim): name
+            for prim, name in template.prim_to_name.items()}
+        names.module_to_name = {
+            self.modules.get(module, module): name
+            for module, name in template.module_to_name.items()}
+        return names
+
+
+def _is_module(value):
+    from .module import Module
+    return isinstance(value, Module)
+
+
+def clone_module(template):
+    """Create a clone of ``template`` in the module under construction."""
+    from .implicit import Implicit
+
+    module = _Cloner().module(template)
+    module_data = module._module_data
+    module_data.instance_name = None
+    parent = module_data.parent
+    if parent is None:
+        return module
+
+    for prim in module_data.io_prims:
+        if prim.direction == 'input':
+            _wrap_assign_x_parent(module, prim)
+
+    for name in module_data.implicit_inputs:
+        value = Implicit(name)
+        with parent.reopen():
+            module_data.implicit_bindings[name][:] = value
+
+    return module
@@ -0,0 +1,223 @@
+"""Saving elaborated designs to files and loading them back.
+
+A saved design contains the whole module tree with finalized circuits, so
+loading it skips elaboration and optimization. The classes of all modules have
+to be importable when saving and loading.
+
+A design file records a key, usually computed by :func:`construction_key`
+from the arguments used to construct the design. :func:`elaborate` uses it to
+load a design only if it was constructed in the same way and to elaborate and
+save it again otherwise. A design file also records the sources of rattle and
+of all modules in the design, so a design is out of date when any of them is
+changed.
+"""
+import hashlib
+import inspect
+import os
+import pickle
+import sys
+import tempfile
+from contextlib import contextmanager
+from functools import lru_cache
+
+from .error import StaleDesign
+from .module import Module
+from .primitive import PrimStorage
+
+_format_version = 2
+
+
+def save(module, path, *, key=None):
+    """Save the design with top-level ``module`` to the file at ``path``."""
+    modules = _design_modules(module)
+    storage = [
+        prim for module in modules
+        for prim in module._module_data.storage_prims]
+
+    for module in modules:
+        module._module_data.circuit.finalize()
+
+    module_classes = [type(module) for module in modules]
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            pickle.dump((_format_version, key), file, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(
+                (module_classes, _sources_digest(module_classes),
+                 len(storage)),
+                file, pickle.HIGHEST_PROTOCOL)
+            with _deep_recursion():
+                _DesignPickler(file, modules, storage).dump((
+                    [module.__dict__ for module in modules],
+                    [prim.__getstate__() for prim in storage]))
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def load(path, *, key=None):
+    """Load a design saved by :func:`save`, returning its top-level module.
+
+    Raises :class:`~rattle.error.StaleDesign` if the design was saved with a
+    different key, by an incompatible version or with different sources.
+    """
+    with open(path, 'rb') as file:
+        saved_version, saved_key = pickle.load(file)
+        if saved_version != _format_version or saved_key != key:
+            raise StaleDesign('design file %r is out of date' % (path,))
+
+        try:
+            module_classes, sources_digest, storage_count = pickle.load(file)
+        except (AttributeError, ImportError):
+            raise StaleDesign(
+                'design file %r refers to missing modules' % (path,))
+        if sources_digest != _sources_digest(module_classes):
+            raise StaleDesign('design file %r is out of date' % (path,))
+
+        modules = [cls.__new__(cls) for cls in module_classes]
+        storage = [
+            PrimStorage.__new__(PrimStorage) for _ in range(storage_count)]
+
+        with _deep_recursion():
+            module_dicts, storage_states = _DesignUnpickler(
+                file, modules, storage).load()
+
+    for module, module_dict in zip(modules, module_dicts):
+        module.__dict__.update(module_dict)
+    for prim, state in zip(storage, storage_states):
+        prim.__setstate__(state)
+
+    return modules[0]
+
+
+def construction_key(constructor, args=(), kwds=None):
+    """A key identifying a design constructed by ``constructor``.
+
+    The key covers the arguments, which have to be picklable, and the source
+    file defining the constructor. Other sources of the design are checked
+    when loading it.
+    """
+    digest = hashlib.sha256()
+    digest.update(pickle.dumps(
+        (constructor, args, sorted((kwds or {}).items())),
+        pickle.HIGHEST_PROTOCOL))
+    try:
+        source_file = inspect.getsourcefile(constructor)
+    except TypeError:
+        source_file = None
+    if source_file is not None:
+        with open(source_file, 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def elaborate(path, constructor, *args, **kwds):
+    """Load a design from ``path`` or construct and save it if out of date.
+
+    The design is constructed by calling ``constructor(*args, **kwds)``.
+    """
+    key = construction_key(constructor, args, kwds)
+    try:
+        return load(path, key=key)
+    except (FileNotFoundError, StaleDesign):
+        pass
+    module = constructor(*args, **kwds)
+    save(module, path, key=key)
+    return module
+
+
+def _sources_digest(module_classes):
+    # Covers the source files defining the module classes and their bases,
+    # along with the sources of rattle itself
+    paths = set()
+    for cls in set(module_classes):
+        for base in cls.__mro__:
+            try:
+                paths.add(inspect.getsourcefile(base))
+            except TypeError:
+                pass
+    paths.discard(None)
+
+    digest = hashlib.sha256(_rattle_sources_digest())
+    for path in sorted(paths):
+        digest.update(path.encode())
+        with open(path, 'rb') as file:
+            digest.update(hashlib.sha256(file.read()).digest())
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _rattle_sources_digest():
+    digest = hashlib.sha256()
+    root = os.path.dirname(os.path.abspath(__file__))
+    for directory, subdirectories, filenames in os.walk(root):
+        subdirectories.sort()
+        for filename in sorted(filenames):
+            if filename.endswith('.py'):
+                path = os.path.join(directory, filename)
+                digest.update(os.path.relpath(path, root).encode())
+                with open(path, 'rb') as file:
+                    digest.update(hashlib.sha256(file.read()).digest())
+    return digest.digest()
+
+
+def _design_modules(module):
+    modules = []
+    stack = [module]
+    while stack:
+        module = stack.pop()
+        modules.append(module)
+        stack.extend(reversed(module._module_data.submodules))
+    return modules
+
+
+@contextmanager
+def _deep_recursion():
+    # Pickling recurses along long chains of primitives
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, 10000))
+    try:
+        yield
+    finally:
+        sys.setrecursionlimit(limit)
+
+
+# Modules and storage can be referenced from anywhere in the design, including
+# from their own state. They are pickled as references into lists of modules
+# and storage given when loading. For a saved design, these are created before
+# the rest of the design is loaded, so that loading never needs to hash a
+# primitive whose state isn't set yet. Simulation snapshots refer to the
+# simulated design this way, see rattle.sim.snapshot.
+
+class _DesignPickler(pickle.Pickler):
+    def __init__(self, file, modules, storage):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self._module_index = {
+            module: i for i, module in enumerate(modules)}
+        self._storage_index = {
+            prim: i for i, prim in enumerate(storage)}
+
+    def persistent_id(self, obj):  # pylint: disable=method-hidden
+        if isinstance(obj, Module):
+            return ('module', self._module_index[obj])
+        elif isinstance(obj, PrimStorage):
+            return ('storage', self._storage_index[obj])
+        return None
+
+
+class _DesignUnpickler(pickle.Unpickler):
+    def __init__(self, file, modules, storage):
+        super().__init__(file)
+        self._modules = modules
+        self._storage = storage
+
+    def persistent_load(self, pid):
+        kind, index = pid
+        if kind == 'module':
+            return self._modules[index]
+        elif kind == 'storage':
+            return self._storage[index]
+        raise pickle.UnpicklingError('unknown persistent id %r' % (pid,))
@@ -40,3 +40,11 @@ class SignalRedefined(RuntimeError):
 
 class UnsupportedInOutUse(RuntimeError):
     pass
+
+
+class UnexpectedXValue(RuntimeError):
+    pass
+
+
+class StaleDesign(RuntimeError):
+    pass
@@ -32,6 +32,7 @@ class ImplicitMeta(type):
                 implicit_input = Input(value.signal_type)
             child._module_data.names.name_signal(implicit_input, name)
             child._module_data.implicit_bindings[name] = implicit_input
+            child._module_data.implicit_inputs.append(name)
             with parent.reopen():
                 implicit_input[:] = value
             value = implicit_input
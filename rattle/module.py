@@ -1,3 +1,5 @@
+from weakref import WeakValueDictionary
+
 from . import context
 from .error import NoModuleUnderConstruction, SignalRedefined
 from .signal import Signal
@@ -7,6 +9,28 @@ from .names import Names
 
 class ModuleMeta(type):
     def __call__(cls, *args, **kwds):
+        if not getattr(cls, '_elaborate_once', False):
+            return cls._elaborate(*args, **kwds)
+
+        try:
+            # Arguments that are equal but differ in type, like 1 and True,
+            # can elaborate differently
+            kwd_items = tuple(sorted(kwds.items()))
+            key = (
+                cls, args, kwd_items, tuple(type(arg) for arg in args),
+                tuple(type(value) for _name, value in kwd_items))
+            template = _templates.get(key)
+        except TypeError:
+            return cls._elaborate(*args, **kwds)
+
+        if template is not None:
+            from .clone import clone_module
+            return clone_module(template)
+
+        module = _templates[key] = cls._elaborate(*args, **kwds)
+        return module
+
+    def _elaborate(cls, *args, **kwds):
         module = cls.__new__(cls, *args, **kwds)
 
         ctx = context.current()
@@ -16,10 +40,16 @@ class ModuleMeta(type):
         return module
 
 
+# Modules elaborated as templates for further instances, by class and arguments
+_templates = WeakValueDictionary()
+
+
 class ModuleData:
     def __init__(self, ctx, module):
         self.condition_stack = None
         self.implicit_bindings = {}
+        # Names of implicit inputs added to connect to a parent's implicit
+        self.implicit_inputs = []
         self.submodules = []
         self.io_prims = []
         self.storage_prims = []
@@ -71,4 +101,19 @@ class Module(metaclass=ModuleMeta):
             self._module_data.attributes.append(attribute)
 
 
-__all__ = ['Module']
+def elaborate_once(cls):
+    """Class decorator elaborating a module once for equal arguments.
+
+    Only the first instance of the class for each combination of (hashable)
+    constructor arguments runs ``__init__``. Further instances with equal
+    arguments are clones of that instance, sharing its finalized circuit
+    structure but having their own storage. Implicit inputs of a clone are
+    connected in its parent. A clone is created from the current state of the
+    first instance, so instances must not be modified after construction and
+    their construction must depend on nothing but the arguments.
+    """
+    cls._elaborate_once = True
+    return cls
+
+
+__all__ = ['Module', 'elaborate_once']
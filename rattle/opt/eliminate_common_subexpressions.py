@@ -0,0 +1,117 @@
+from ..visitor import visitor
+from ..primitive import *
+
+
+_COMMUTATIVE = (PrimAnd, PrimOr, PrimXor, PrimAdd, PrimMul, PrimEq)
+
+
+class EliminateCommonSubexpressions:
+    # pylint: disable=function-redefined
+    def __init__(self, circuit):
+        # Structurally equal prims are already shared when they are created.
+        # This additionally shares commutative operations independent of the
+        # operand order and replaces reads of storage that is continuously
+        # assigned a constant with that constant, folding everything that
+        # becomes constant in turn.
+        self._drivers = {}
+
+        inout_storage = set()
+        for lvalue, _rvalue in circuit.inout:
+            inout_storage |= lvalue.accessed_storage
+
+        for storage, assignments in circuit.assign.items():
+            if (len(assignments) != 1
+                    or storage.dimensions
+                    or storage in circuit.combinational
+                    or storage in circuit.clocked_storage
+                    or storage in circuit.initial
+                    or storage in inout_storage):
+                continue
+            lvalue, rvalue = assignments[0]
+            if lvalue is storage:
+                self._drivers[storage] = rvalue
+
+        self._storage_values = {}
+        self._commuted = {}
+        self._cache = {}
+
+        circuit.map_rvalues(self._eliminate)
+
+    def _eliminate(self, rvalue):
+        try:
+            return self._cache[rvalue]
+        except KeyError:
+            pass
+
+        new_rvalue = self._eliminate_subexpr(rvalue)
+
+        self._cache[rvalue] = new_rvalue
+        return new_rvalue
+
+    def _storage_value(self, storage):
+        try:
+            return self._storage_values[storage]
+        except KeyError:
+            pass
+
+        # Reads stay as they are while resolving the driver, which also
+        # terminates combinational loops
+        self._storage_values[storage] = storage
+
+        try:
+            driver = self._drivers[storage]
+        except KeyError:
+            return storage
+
+        # Storage left at its default x value can still be poked during
+        # simulation, so only fully defined constants are propagated
+        driver = self._eliminate(driver)
+        if isinstance(driver, PrimConst) and not driver.value.mask:
+            self._storage_values[storage] = driver
+            return driver
+        return storage
+
+    @visitor
+    def _eliminate_subexpr(self, rvalue):
+        return rvalue.map(self._eliminate)
+
+    @_eliminate_subexpr.on(PrimStorage)
+    def _eliminate_subexpr(self, rvalue):
+        return self._storage_value(rvalue)
+
+    @_eliminate_subexpr.on(PrimReg)
+    def _eliminate_subexpr(self, rvalue):
+        return rvalue
+
+    @_eliminate_subexpr.on(PrimInOut)
+    def _eliminate_subexpr(self, rvalue):
+        return rvalue
+
+    @_eliminate_subexpr.on(PrimBinaryOp)
+    def _eliminate_subexpr(self, rvalue):
+        return self._eliminate_binary_op(rvalue)
+
+    @_eliminate_subexpr.on(PrimCompareOp)
+    def _eliminate_subexpr(self, rvalue):
+        return self._eliminate_binary_op(rvalue)
+
+    def _eliminate_binary_op(self, rvalue):
+        op = type(rvalue)
+        a, b = self._eliminate(rvalue.a), self._eliminate(rvalue.b)
+
+        if not isinstance(rvalue, _COMMUTATIVE):
+            return op(a, b)
+
+        if isinstance(a, PrimConst) and not isinstance(b, PrimConst):
+            a, b = b, a
+
+        try:
+            return self._commuted[(op, a, b)]
+        except KeyError:
+            pass
+
+        result = op(a, b)
+        self._commuted[(op, a, b)] = result
+        if not isinstance(a, PrimConst):
+            self._commuted[(op, b, a)] = result
+        return result
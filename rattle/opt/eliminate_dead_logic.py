@@ -0,0 +1,113 @@
+from ..circuit import Block, BlockAssign, BlockCond
+
+
+class EliminateDeadLogic:
+    # Blocks are replaced instead of modified, so that only the block
+    # dictionaries of the circuit need to be copied to keep the original
+    # circuit unchanged, see Circuit.eliminate_dead_logic.
+    def __init__(self, circuit):
+        # Storage is live when it is IO of the module or of a submodule, when
+        # it is explicitly kept or when live storage depends on it.
+        self._dependencies = {}
+        self._storage = set()
+
+        for storage, assignments in circuit.assign.items():
+            for lvalue, rvalue in assignments:
+                self._add_dependencies(
+                    storage, lvalue.accessed_storage, rvalue.accessed_storage)
+
+        for storage, block in circuit.combinational.items():
+            self._add_block_dependencies(block.assignments)
+
+        for clock, block in circuit.clocked.items():
+            self._add_block_dependencies(
+                block.assignments, clock.accessed_storage)
+
+        for clock, block in circuit.sync_reset.items():
+            self._add_block_dependencies(
+                block.assignments, clock.accessed_storage)
+
+        for (clock, reset), block in circuit.async_reset.items():
+            self._add_block_dependencies(
+                block.assignments,
+                clock.accessed_storage | reset.accessed_storage)
+
+        for storage, block in circuit.initial.items():
+            self._add_block_dependencies(block.assignments)
+
+        for lvalue, rvalue in circuit.inout:
+            self._storage.update(lvalue.accessed_storage)
+            self._storage.update(rvalue.accessed_storage)
+
+        live = set()
+        pending = [
+            storage for storage in self._storage
+            if storage.direction is not None]
+        pending.extend(circuit.keep)
+        while pending:
+            storage = pending.pop()
+            if storage in live:
+                continue
+            live.add(storage)
+            pending.extend(self._dependencies.get(storage, ()))
+
+        dead = self._storage - live
+        if not dead:
+            return
+
+        circuit.removed_storage.update(dead)
+
+        for storage in dead:
+            circuit.assign.pop(storage, None)
+            circuit.combinational.pop(storage, None)
+            circuit.initial.pop(storage, None)
+            circuit.clocked_storage.pop(storage, None)
+
+        for block_dict in (
+                circuit.clocked, circuit.sync_reset, circuit.async_reset):
+            for key, block in list(block_dict.items()):
+                assignments = self._remove_dead(block.assignments, dead)
+                if assignments:
+                    new_block = block_dict[key] = Block()
+                    new_block.assignments = assignments
+                    new_block.storage = block.storage - dead
+                else:
+                    del block_dict[key]
+
+    def _add_dependencies(self, storage, *dependencies):
+        self._storage.add(storage)
+        storage_dependencies = self._dependencies.setdefault(storage, set())
+        for accessed_storage in dependencies:
+            self._storage.update(accessed_storage)
+            storage_dependencies.update(accessed_storage)
+
+    def _add_block_dependencies(self, assignments, condition=frozenset()):
+        for statement in assignments:
+            if isinstance(statement, BlockAssign):
+                self._add_dependencies(
+                    statement.storage, condition,
+                    statement.lvalue.accessed_storage,
+                    statement.rvalue.accessed_storage)
+            elif isinstance(statement, BlockCond):
+                inner_condition = (
+                    condition | statement.condition.accessed_storage)
+                self._add_block_dependencies(statement.true, inner_condition)
+                self._add_block_dependencies(statement.false, inner_condition)
+            else:
+                assert False
+
+    def _remove_dead(self, assignments, dead):
+        new_assignments = []
+        for statement in assignments:
+            if isinstance(statement, BlockAssign):
+                if statement.storage not in dead:
+                    new_assignments.append(statement)
+            elif isinstance(statement, BlockCond):
+                true = self._remove_dead(statement.true, dead)
+                false = self._remove_dead(statement.false, dead)
+                if true or false:
+                    new_assignments.append(
+                        BlockCond(statement.condition, true, false))
+            else:
+                assert False
+        return new_assignments
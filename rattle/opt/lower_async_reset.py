@@ -0,0 +1,49 @@
+from ..circuit import Block, BlockAssign, BlockCond
+
+
+class LowerAsyncReset:
+    def __init__(self, circuit):
+        # Each async reset block becomes the complete process of the storage
+        # it resets, assigning the reset values while the reset is asserted
+        # and performing the clocked assignments to that storage otherwise.
+        # These are moved out of the clocked block of the same clock.
+        for (clock, reset), reset_block in circuit.async_reset.items():
+            clocked = []
+            clocked_block = circuit.clocked.get(clock)
+            if clocked_block is not None:
+                clocked, other = self._split(
+                    clocked_block.assignments, reset_block.storage)
+                clocked_block.assignments = other
+                clocked_block.storage -= reset_block.storage
+                if not other:
+                    del circuit.clocked[clock]
+
+            block = Block()
+            block.assignments.append(
+                BlockCond(reset, reset_block.assignments, clocked))
+            block.storage.update(reset_block.storage)
+            circuit.async_reset[(clock, reset)] = block
+
+    def _split(self, assignments, storage):
+        selected = []
+        other = []
+        for statement in assignments:
+            if isinstance(statement, BlockAssign):
+                if statement.storage in storage:
+                    selected.append(statement)
+                else:
+                    other.append(statement)
+            elif isinstance(statement, BlockCond):
+                true_selected, true_other = self._split(
+                    statement.true, storage)
+                false_selected, false_other = self._split(
+                    statement.false, storage)
+                if true_selected or false_selected:
+                    selected.append(BlockCond(
+                        statement.condition, true_selected, false_selected))
+                if true_other or false_other:
+                    other.append(BlockCond(
+                        statement.condition, true_other, false_other))
+            else:
+                assert False
+        return selected, other
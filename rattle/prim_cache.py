@@ -0,0 +1,143 @@
+import abc
+from weakref import WeakValueDictionary
+
+
+class AllSet:
+    def __and__(self, other):
+        return other
+
+    def __rand__(self, other):
+        return other
+
+    def __contains__(self, key):
+        return True
+
+
+_cached_slots = frozenset([
+    '_allowed_readers', '_allowed_writers', '_accessed_storage', '_hash',
+    '__weakref__'])
+
+
+class CachedNode(metaclass=abc.ABCMeta):
+    __slots__ = (
+        '_allowed_readers', '_allowed_writers', '_accessed_storage',
+        '__weakref__')
+
+    # The properties below are computed on first use and cached, as nodes
+    # are immutable.
+
+    @property
+    def allowed_readers(self):
+        try:
+            return self._allowed_readers
+        except AttributeError:
+            self._allowed_readers = self._get_allowed_readers()
+            return self._allowed_readers
+
+    @property
+    def allowed_writers(self):
+        try:
+            return self._allowed_writers
+        except AttributeError:
+            self._allowed_writers = self._get_allowed_writers()
+            return self._allowed_writers
+
+    @property
+    def accessed_storage(self):
+        try:
+            return self._accessed_storage
+        except AttributeError:
+            self._accessed_storage = self._get_accessed_storage()
+            return self._accessed_storage
+
+    @abc.abstractmethod
+    def _get_allowed_readers(self):
+        pass
+
+    @abc.abstractmethod
+    def _get_allowed_writers(self):
+        pass
+
+    @abc.abstractmethod
+    def _get_accessed_storage(self):
+        pass
+
+    def __getstate__(self):
+        # Cached attributes are left out, the hash of storage depends on the
+        # process
+        state = dict(getattr(self, '__dict__', {}))
+        for cls in type(self).__mro__:
+            for name in getattr(cls, '__slots__', ()):
+                if name not in _cached_slots and hasattr(self, name):
+                    state[name] = getattr(self, name)
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+
+class InternedValue:
+    # Mixed into nodes that provide a _hash slot
+    __slots__ = ()
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, type(self)):
+            return NotImplemented
+        return self.shape == other.shape and self.tuple() == other.tuple()
+
+    def __hash__(self):
+        try:
+            return self._hash
+        except AttributeError:
+            # pylint: disable=assigning-non-slot
+            self._hash = hash((type(self), self.shape, self.tuple()))
+            return self._hash
+
+    def __reduce__(self):
+        return _load_value, (type(self), self.__getstate__())
+
+
+_interned = WeakValueDictionary()
+
+
+def _intern(value, fold=None):
+    # Structurally equal values are shared. Only values that don't fold or
+    # simplify are interned, so that an interned value keeps all operands
+    # of its key alive, see _intern_key. Folded results that are new values
+    # are interned on their own construction.
+    key = _intern_key(value)
+    try:
+        return _interned[key]
+    except KeyError:
+        pass
+
+    result = value if fold is None else fold(value)
+    if result is value:
+        _interned[key] = result
+    return result
+
+
+def _intern_key(value):
+    # Operands are identified by id, as structurally equal operands are shared
+    # already. Holding operands in the key would keep the interned value alive,
+    # e.g. through storage referring to its module. An entry only exists while
+    # its value and thus the operands are alive, so their ids aren't reused.
+    return (type(value), value.shape, _operand_ids(value.tuple()))
+
+
+def _operand_ids(items):
+    return tuple(
+        (CachedNode, id(item)) if isinstance(item, CachedNode) else
+        _operand_ids(item) if isinstance(item, tuple) else item
+        for item in items)
+
+
+def _load_value(cls, state):
+    # Loaded values are shared with structurally equal existing values. As
+    # they were constructed as values that don't fold, they can be interned.
+    value = cls.__new__(cls)
+    value.__setstate__(state)
+    return _intern(value)
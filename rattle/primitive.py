@@ -2,45 +2,44 @@ import abc
 from .bitvec import BitVec, bv
 from .bitmath import log2up
 from .error import ValueNotAvailable
-
-
-class AllSet:
-    def __and__(self, other):
-        return other
-
-    def __rand__(self, other):
-        return other
-
-    def __contains__(self, key):
-        return True
+from .prim_cache import AllSet, CachedNode, InternedValue, _intern
 
 
 class PrimMeta(abc.ABCMeta):
     def __call__(cls, *args, **kwds):
         signal = super().__call__(*args, **kwds)
-        # TODO Memoize
 
+        if not isinstance(signal, PrimValue):
+            return cls._fold(signal)
+        return _intern(signal, cls._fold)
+
+    @staticmethod
+    def _fold(signal):
         if isinstance(signal, PrimConst):
             return signal
 
         if signal.width == 0:
             return PrimConst(BitVec(0, 0))
 
-        def raise_fn(_prim):
-            raise ValueNotAvailable
+        if isinstance(signal, PrimValue) and all(
+                isinstance(operand, PrimConst) for operand in signal):
+            def raise_fn(_prim):
+                raise ValueNotAvailable
 
-        def value_fn(prim):
-            return prim.eval(raise_fn)
+            def value_fn(prim):
+                return prim.eval(raise_fn)
 
-        try:
-            return PrimConst(signal.eval(value_fn))
-        except ValueNotAvailable:
-            pass
+            try:
+                return PrimConst(signal.eval(value_fn))
+            except ValueNotAvailable:
+                pass
 
         return signal.simplify()
 
 
-class PrimSignal(metaclass=PrimMeta):
+class PrimSignal(CachedNode, metaclass=PrimMeta):
+    __slots__ = ('width', 'dimensions')
+
     def __init__(self, width, dimensions=()):
         self.width = width
         self.dimensions = tuple(dimensions)
@@ -59,14 +58,6 @@ class PrimSignal(metaclass=PrimMeta):
     def shape(self):
         return (self.width, *self.dimensions)
 
-    @abc.abstractproperty
-    def allowed_readers(self):
-        pass
-
-    @abc.abstractproperty
-    def allowed_writers(self):
-        pass
-
     def lower_inout_and_add_to_circuit(
             self, condition, rvalue, circuit, reset):
         if self.width == 0:
@@ -146,10 +137,6 @@ class PrimSignal(metaclass=PrimMeta):
         raise RuntimeError(
             'primitive signal %r cannot be written in simulation' % self)
 
-    @abc.abstractproperty
-    def accessed_storage(self):
-        pass
-
     @abc.abstractmethod
     def __iter__(self):
         pass
@@ -178,15 +165,13 @@ class PrimStorage(PrimSignal):
                     self.module, self.direction, self.width, self.dimensions,
                     id(self))
 
-    @property
-    def allowed_readers(self):
+    def _get_allowed_readers(self):
         if self.direction is not None and self.module.parent is not None:
             return frozenset([self.module, self.module.parent])
         else:
             return frozenset([self.module])
 
-    @property
-    def allowed_writers(self):
+    def _get_allowed_writers(self):
         if self.direction == 'input':
             if self.module.parent is not None:
                 return frozenset([self.module.parent])
@@ -208,22 +193,15 @@ class PrimStorage(PrimSignal):
         if lvalue.width != 0:
             sim._poke(self, lvalue, rvalue, xpoke)
 
-    @property
-    def accessed_storage(self):
+    def _get_accessed_storage(self):
         return frozenset([self])
 
     def __iter__(self):
         return iter(())
 
 
-class PrimValue(PrimSignal, metaclass=abc.ABCMeta):
-    def __eq__(self, other):
-        if not isinstance(other, type(self)):
-            return NotImplemented
-        return self.shape == other.shape and self.tuple() == other.tuple()
-
-    def __hash__(self):
-        return hash((type(self), self.shape, self.tuple()))
+class PrimValue(PrimSignal, InternedValue, metaclass=abc.ABCMeta):
+    __slots__ = ('_hash',)
 
     @abc.abstractmethod
     def tuple(self):
@@ -234,12 +212,13 @@ class PrimValue(PrimSignal, metaclass=abc.ABCMeta):
             type(self).__name__,
             ','.join(repr(i) for i in self.tuple()))
 
-    @property
-    def allowed_writers(self):
+    def _get_allowed_writers(self):
         return frozenset()
 
 
 class PrimReg(PrimValue):
+    __slots__ = ('clk', 'en', 'reset', 'reset_mode', 'x')
+
     def __init__(self, clk, en, reset, reset_mode, x):
         assert clk.dimensions == ()
         assert clk.width == 1
@@ -262,12 +241,10 @@ class PrimReg(PrimValue):
     def simplify_read(self):
         return self.x
 
-    @property
-    def allowed_readers(self):
+    def _get_allowed_readers(self):
         return self.x.allowed_readers
 
-    @property
-    def allowed_writers(self):
+    def _get_allowed_writers(self):
         return self.x.allowed_writers
 
     def lower_lvalue(self):
@@ -297,8 +274,7 @@ class PrimReg(PrimValue):
         if lvalue.width != 0:
             sim._poke(self, lvalue, rvalue, xpoke)
 
-    @property
-    def accessed_storage(self):
+    def _get_accessed_storage(self):
         return self.x.accessed_storage
 
     def __iter__(self):
@@ -310,6 +286,8 @@ class PrimReg(PrimValue):
 
 
 class PrimInOut(PrimValue):
+    __slots__ = ('x',)
+
     def __init__(self, x):
         assert isinstance(x, PrimStorage)
         super().__init__(width=x.width, dimensions=x.dimensions)
@@ -321,16 +299,13 @@ class PrimInOut(PrimValue):
     def simplify_read(self):
         return self.x
 
-    @property
-    def allowed_readers(self):
+    def _get_allowed_readers(self):
         return self.x.allowed_readers
 
-    @property
-    def allowed_writers(self):
+    def _get_allowed_writers(self):
         return self.x.allowed_writers
 
-    @property
-    def accessed_storage(self):
+    def _get_accessed_storage(self):
         return self.x.accessed_storage
 
     def __iter__(self):
@@ -341,6 +316,8 @@ class PrimInOut(PrimValue):
 
 
 class PrimIndex(PrimValue):
+    __slots__ = ('x', 'index')
+
     def __init__(self, index, x):
         index_width = log2up(x.dimensions[-1])
         if isinstance(index, int):
@@ -373,20 +350,17 @@ class PrimIndex(PrimValue):
     def simplify_read(self):
         return PrimIndex(self.index, self.x.simplify_read())
 
-    @property
-    def allowed_readers(self):
+    def _get_allowed_readers(self):
         return self.x.allowed_readers & self.index.allowed_readers
 
-    @property
-    def allowed_writers(self):
+    def _get_allowed_writers(self):
         return self.x.allowed_writers & self.index.allowed_readers
 
     def lower_lvalue(self):
         x, storage = self.x.lower_lvalue()
         return PrimIndex(self.index, x), storage
 
-    @property
-    def accessed_storage(self):
+    def _get_accessed_storage(self):
         return self.index.accessed_storage | self.x.accessed_storage
 
     def __iter__(self):
@@ -398,6 +372,8 @@ class PrimIndex(PrimValue):
 
 
 class PrimNot(PrimValue):
+    __slots__ = ('x',)
+
     def __init__(self, x):
         x = x.simplify_read()
         assert x.dimensions == ()
@@ -411,12 +387,10 @@ class PrimNot(PrimValue):
     def eval(self, values):
         return ~values(self.x)
 
-    @property
-    def allowed_readers(self):
+    def _get_allowed_readers(self):
         return self.x.allowed_readers
 
-    @property
-    def accessed_storage(self):
+    def _get_accessed_storage(self):
         return self.x.accessed_storage
 
     def __iter__(self):
@@ -428,6 +402,8 @@ class PrimNot(PrimValue):
 
 class PrimConcat(PrimValue):
     # TODO Make PrimConcat writable?
+    __slots__ = ('parts',)
+
     def __init__(self, parts):
         parts = tuple(
             part.simplify_read() for part in parts if part.width != 0)
@@ -442,15 +418,13 @@ class PrimConcat(PrimValue):
     def eval(self, values):
         return BitVec.concat(*(values(part) for part in self.parts))
 
-    @property
-    def allowed_readers(self):
+    def _get_allowed_readers(self):
         readers = AllSet()
         for part in self.parts:
             readers &= part.allowed_readers
         return readers
 
-    @property
-    def accessed_storage(self):
+    def _get_accessed_storage(self):
         accessed = frozenset()
         for part in self.parts:
             accessed |= part.accessed_storage
@@ -464,6 +438,8 @@ class PrimConcat(PrimValue):
 
 
 class PrimBinaryOp(PrimValue, metaclass=abc.ABCMeta):
+    __slots__ = ('a', 'b')
+
     def __init__(self, a, b):
         a, b = a.simplify_read(), b.simplify_read()
         assert a.dimensions == ()
@@ -477,12 +453,10 @@ class PrimBinaryOp(PrimValue, metaclass=abc.ABCMeta):
     def tuple(self):
         return (self.a, self.b)
 
-    @property
-    def allowed_readers(self):
+    def _get_allowed_readers(self):
         return self.a.allowed_readers & self.b.allowed_readers
 
-    @property
-    def accessed_storage(self):
+    def _get_accessed_storage(self):
         return self.a.accessed_storage | self.b.accessed_storage
 
     def __iter__(self):
@@ -494,36 +468,50 @@ class PrimBinaryOp(PrimValue, metaclass=abc.ABCMeta):
 
 
 class PrimAnd(PrimBinaryOp):
+    __slots__ = ()
+
     def eval(self, values):
         return values(self.a) & values(self.b)
 
 
 class PrimOr(PrimBinaryOp):
+    __slots__ = ()
+
     def eval(self, values):
         return values(self.a) | values(self.b)
 
 
 class PrimXor(PrimBinaryOp):
+    __slots__ = ()
+
     def eval(self, values):
         return values(self.a) ^ values(self.b)
 
 
 class PrimAdd(PrimBinaryOp):
+    __slots__ = ()
+
     def eval(self, values):
         return values(self.a) + values(self.b)
 
 
 class PrimSub(PrimBinaryOp):
+    __slots__ = ()
+
     def eval(self, values):
         return values(self.a) - values(self.b)
 
 
 class PrimMul(PrimBinaryOp):
+    __slots__ = ()
+
     def eval(self, values):
         return values(self.a) * values(self.b)
 
 
 class PrimCompareOp(PrimValue, metaclass=abc.ABCMeta):
+    __slots__ = ('a', 'b')
+
     def __init__(self, a, b):
         a, b = a.simplify_read(), b.simplify_read()
         assert a.dimensions == ()
@@ -537,12 +525,10 @@ class PrimCompareOp(PrimValue, metaclass=abc.ABCMeta):
     def tuple(self):
         return (self.a, self.b)
 
-    @property
-    def allowed_readers(self):
+    def _get_allowed_readers(self):
         return self.a.allowed_readers & self.b.allowed_readers
 
-    @property
-    def accessed_storage(self):
+    def _get_accessed_storage(self):
         return self.a.accessed_storage | self.b.accessed_storage
 
     def __iter__(self):
@@ -554,21 +540,29 @@ class PrimCompareOp(PrimValue, metaclass=abc.ABCMeta):
 
 
 class PrimEq(PrimCompareOp):
+    __slots__ = ()
+
     def eval(self, values):
         return bv(values(self.a) == values(self.b))
 
 
 class PrimLt(PrimCompareOp):
+    __slots__ = ()
+
     def eval(self, values):
         return bv(values(self.a) < values(self.b))
 
 
 class PrimSignedLt(PrimCompareOp):
+    __slots__ = ()
+
     def eval(self, values):
         return bv(values(self.a).sign_wrap() < values(self.b).sign_wrap())
 
 
 class PrimShiftOp(PrimValue, metaclass=abc.ABCMeta):
+    __slots__ = ('x', 'shift')
+
     def __init__(self, x, shift):
         x, shift = x.simplify_read(), shift.simplify_read()
         assert x.dimensions == ()
@@ -581,12 +575,10 @@ class PrimShiftOp(PrimValue, metaclass=abc.ABCMeta):
     def tuple(self):
         return (self.x, self.shift)
 
-    @property
-    def allowed_readers(self):
+    def _get_allowed_readers(self):
         return self.x.allowed_readers & self.shift.allowed_readers
 
-    @property
-    def accessed_storage(self):
+    def _get_accessed_storage(self):
         return self.x.accessed_storage | self.shift.accessed_storage
 
     def __iter__(self):
@@ -598,6 +590,8 @@ class PrimShiftOp(PrimValue, metaclass=abc.ABCMeta):
 
 
 class PrimShiftLeft(PrimShiftOp):
+    __slots__ = ()
+
     def eval(self, values):
         res = None
         x = values(self.x)
@@ -607,6 +601,8 @@ class PrimShiftLeft(PrimShiftOp):
 
 
 class PrimShiftRight(PrimShiftOp):
+    __slots__ = ()
+
     def eval(self, values):
         res = None
         x = values(self.x)
@@ -616,6 +612,8 @@ class PrimShiftRight(PrimShiftOp):
 
 
 class PrimArithShiftRight(PrimShiftOp):
+    __slots__ = ()
+
     def eval(self, values):
         res = None
         x = values(self.x)
@@ -625,6 +623,8 @@ class PrimArithShiftRight(PrimShiftOp):
 
 
 class PrimExtendOp(PrimValue, metaclass=abc.ABCMeta):
+    __slots__ = ('x',)
+
     def __init__(self, width, x):
         x = x.simplify_read()
         assert width >= x.width
@@ -636,12 +636,10 @@ class PrimExtendOp(PrimValue, metaclass=abc.ABCMeta):
     def tuple(self):
         return (self.width, self.x)
 
-    @property
-    def allowed_readers(self):
+    def _get_allowed_readers(self):
         return self.x.allowed_readers
 
-    @property
-    def accessed_storage(self):
+    def _get_accessed_storage(self):
         return self.x.accessed_storage
 
     def __iter__(self):
@@ -652,16 +650,22 @@ class PrimExtendOp(PrimValue, metaclass=abc.ABCMeta):
 
 
 class PrimSignExt(PrimExtendOp):
+    __slots__ = ()
+
     def eval(self, values):
         return values(self.x).sign_extend(self.width)
 
 
 class PrimZeroExt(PrimExtendOp):
+    __slots__ = ()
+
     def eval(self, values):
         return values(self.x).extend(self.width)
 
 
 class PrimSlice(PrimValue):
+    __slots__ = ('start', 'x')
+
     def __init__(self, start, width, x):
         assert start + width <= x.width
         assert x.dimensions == ()
@@ -687,16 +691,13 @@ class PrimSlice(PrimValue):
     def simplify_read(self):
         return PrimSlice(self.start, self.width, self.x.simplify_read())
 
-    @property
-    def allowed_readers(self):
+    def _get_allowed_readers(self):
         return self.x.allowed_readers
 
-    @property
-    def allowed_writers(self):
+    def _get_allowed_writers(self):
         return self.x.allowed_writers
 
-    @property
-    def accessed_storage(self):
+    def _get_accessed_storage(self):
         return self.x.accessed_storage
 
     def lower_lvalue(self):
@@ -711,6 +712,8 @@ class PrimSlice(PrimValue):
 
 
 class PrimRepeat(PrimValue):
+    __slots__ = ('count', 'x')
+
     def __init__(self, count, x):
         x = x.simplify_read()
         assert x.dimensions == ()
@@ -725,12 +728,10 @@ class PrimRepeat(PrimValue):
     def eval(self, values):
         return values(self.x).repeat(self.count)
 
-    @property
-    def allowed_readers(self):
+    def _get_allowed_readers(self):
         return self.x.allowed_readers
 
-    @property
-    def accessed_storage(self):
+    def _get_accessed_storage(self):
         return self.x.accessed_storage
 
     def __iter__(self):
@@ -741,6 +742,8 @@ class PrimRepeat(PrimValue):
 
 
 class PrimBitIndex(PrimValue):
+    __slots__ = ('index', 'x')
+
     def __init__(self, index, x):
         index = index.simplify_read()
         assert index.dimensions == ()
@@ -760,16 +763,13 @@ class PrimBitIndex(PrimValue):
     def simplify_read(self):
         return PrimBitIndex(self.index, self.x.simplify_read())
 
-    @property
-    def allowed_readers(self):
+    def _get_allowed_readers(self):
         return self.index.allowed_readers & self.x.allowed_readers
 
-    @property
-    def allowed_writers(self):
+    def _get_allowed_writers(self):
         return self.index.allowed_readers & self.x.allowed_writers
 
-    @property
-    def accessed_storage(self):
+    def _get_accessed_storage(self):
         return self.index.accessed_storage | self.x.accessed_storage
 
     def lower_lvalue(self):
@@ -789,6 +789,8 @@ class PrimBitIndex(PrimValue):
 
 
 class PrimMux(PrimValue):
+    __slots__ = ('index', 'ports')
+
     def __init__(self, index, ports):
         index = index.simplify_read()
         ports = tuple(ports)
@@ -834,25 +836,22 @@ class PrimMux(PrimValue):
         return PrimMux(
             self.index, (port.simplify_read() for port in self.ports))
 
-    @property
-    def allowed_readers(self):
+    def _get_allowed_readers(self):
         readers = self.index.allowed_readers
         for port in self.ports:
             readers &= port.allowed_readers
         return readers
 
-    @property
-    def allowed_writers(self):
+    def _get_allowed_writers(self):
         writers = self.index.allowed_readers
         for port in self.ports:
             writers &= port.allowed_writers
         return writers
 
-    @property
-    def accessed_storage(self):
-        accessed = frozenset()
+    def _get_accessed_storage(self):
+        accessed = self.index.accessed_storage
         for port in self.ports:
-            accessed &= port.accessed_storage
+            accessed |= port.accessed_storage
         return accessed
 
     def split_scalar(self, condition, rvalue):
@@ -871,6 +870,8 @@ class PrimMux(PrimValue):
 
 
 class PrimTable(PrimValue):
+    __slots__ = ('table',)
+
     def __init__(self, table):
         table = tuple(table)
         assert table
@@ -888,25 +889,22 @@ class PrimTable(PrimValue):
     def simplify_read(self):
         return PrimTable((entry.simplify_read() for entry in self.table))
 
-    @property
-    def allowed_readers(self):
+    def _get_allowed_readers(self):
         readers = AllSet()
         for entry in self.table:
             readers &= entry.allowed_readers
         return readers
 
-    @property
-    def allowed_writers(self):
+    def _get_allowed_writers(self):
         writers = AllSet()
         for entry in self.table:
             writers &= entry.allowed_writers
         return writers
 
-    @property
-    def accessed_storage(self):
+    def _get_accessed_storage(self):
         accessed = frozenset()
         for entry in self.table:
-            accessed &= entry.accessed_storage
+            accessed |= entry.accessed_storage
         return accessed
 
     def __iter__(self):
@@ -917,6 +915,8 @@ class PrimTable(PrimValue):
 
 
 class PrimConst(PrimValue):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         assert isinstance(value, BitVec)
         super().__init__(
@@ -932,19 +932,16 @@ class PrimConst(PrimValue):
     def __repr__(self):
         return 'PrimConst(%s)' % self.value
 
-    @property
-    def allowed_readers(self):
+    def _get_allowed_readers(self):
         return AllSet()
 
-    @property
-    def allowed_writers(self):
+    def _get_allowed_writers(self):
         if self.width == 0:
             return AllSet()
         else:
             return frozenset()
 
-    @property
-    def accessed_storage(self):
+    def _get_accessed_storage(self):
         return frozenset()
 
     def __iter__(self):
@@ -238,6 +238,11 @@ class Signal(metaclass=abc.ABCMeta):
         else:
             raise AttributeError("can't set attributes on Signals")
 
+    def __setstate__(self, state):
+        # Defined so unpickling doesn't look it up using a subclass's
+        # __getattr__ before the signal is initialized
+        self.__dict__.update(state)
+
 
 _flip_dir = {'input': 'output', 'output': 'input'}
 
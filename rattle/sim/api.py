@@ -32,22 +32,21 @@ def always_on(event, action=None):
         return decorate(action)
 
 
-def clock(target, period):
+def clock(target, period, cycle_based=False):
+    """Periodically toggle a clock.
+
+    The clock starts high for the first half of each period. With
+    ``cycle_based`` set, the low phase is skipped while no thread waits for
+    changes of the clock and no trace is dumped, falling right before the next
+    rising edge instead. This saves a time step per cycle, but makes logic
+    sensitive to falling edges or the clock level run at the rising edge.
+    """
     if Signal.isinstance(target, Clock):
         target = target.clk
     if not Signal.isinstance(target, Bool):
         raise TypeError('clock requries a Clock or Bool signal')
 
-    high_period = period // 2
-    low_period = (period + 1) // 2
-
-    @thread
-    def _clock_thread():
-        while True:
-            target[:] = 1
-            yield high_period
-            target[:] = 0
-            yield low_period
+    context.current().sim.clock(target, period, cycle_based)
 
 
 def time():
@@ -0,0 +1,765 @@
+"""Batched simulation of many independent instances of a design.
+
+All instances ("lanes") of a batch share the same circuit but have their own
+state. The value and mask of every storage primitive are kept as NumPy arrays
+with the lanes along the first axis, so each primitive is evaluated once for
+all lanes using vectorized operations. Storage of up to 64 bits uses
+``uint64`` arrays, wider storage uses arrays of Python ints.
+
+Requires NumPy.
+"""
+import numpy as np
+
+from ..bitmath import bitmask, bitrepeat
+from ..bitvec import BitVec
+from ..circuit import BlockAssign, BlockCond
+from ..error import InvalidSignalAssignment
+from ..primitive import *
+from ..signal import Signal
+from ..type import Bool, Clock
+from ..visitor import visitor
+from .engine import SimEngine
+
+
+def _dtype(width):
+    return np.uint64 if width <= 64 else object
+
+
+def _cast(array, width):
+    dtype = _dtype(width)
+    if array.dtype == dtype:
+        return array
+    return array.astype(dtype)
+
+
+def _combine(value_a, mask_a, value_b, mask_b):
+    mask = (value_a ^ value_b) | mask_a | mask_b
+    return value_a & ~mask, mask
+
+
+def _lane_select(select, array):
+    return select.reshape(select.shape + (1,) * (array.ndim - 1))
+
+
+class BatchSimEngine(SimEngine):
+    """Simulation engine evaluating a batch of independent lanes at once.
+
+    Values are ``(value, mask)`` pairs of arrays with the lanes along the first
+    axis followed by the dimensions of the primitive (outermost first).
+    Evaluation is vectorized across lanes. Lanes that need special handling,
+    e.g. indexing with unknown indices, are evaluated individually.
+    """
+    # pylint: disable=function-redefined
+    def __init__(self, *modules, lanes):
+        self.lanes = lanes
+        self._lane_range = np.arange(lanes)
+        super().__init__(*modules)
+
+    def _xval(self, storage):
+        shape = (self.lanes,) + tuple(reversed(storage.dimensions))
+        dtype = _dtype(storage.width)
+        return (
+            np.zeros(shape, dtype=dtype),
+            np.full(shape, bitmask(storage.width), dtype=dtype))
+
+    def _eval_combinational(self, block):
+        self._apply_pokes(self._eval_block(block))
+
+    def _eval_clocked(self, params):
+        clock, block = params
+
+        clock_value = self.peek(clock)
+        old_clock_value = self._old_clock_values.get(clock)
+        self._old_clock_values[clock] = clock_value
+
+        if old_clock_value is None:
+            return
+
+        self._eval_edge(block, self._rising_edge(old_clock_value, clock_value))
+
+    def _eval_async_reset(self, params):
+        clocks, block = params
+
+        values = tuple(self.peek(clock) for clock in clocks)
+        old_values = self._old_clock_values.get(clocks)
+        self._old_clock_values[clocks] = values
+
+        if old_values is None:
+            return
+
+        clock_edge, reset_edge = (
+            self._rising_edge(old_value, value)
+            for old_value, value in zip(old_values, values))
+        self._eval_edge(block, clock_edge | reset_edge)
+
+    @staticmethod
+    def _rising_edge(old_value, value):
+        return (
+            (old_value[0] == 0) & (old_value[1] == 0) &
+            (value[0] == 1) & (value[1] == 0))
+
+    def _eval_edge(self, block, edge):
+        if edge.any():
+            shadow = self._eval_block(block)
+            if not edge.all():
+                shadow.select = edge
+            self.poke_delayed(shadow)
+
+    def _eval_block(self, block):
+        shadow = _Shadow(self)
+        self._eval_statements(block.assignments, shadow, {})
+        return shadow
+
+    def _eval_statements(self, assignments, shadow, memo):
+        for statement in assignments:
+            if isinstance(statement, BlockAssign):
+                self.poke(
+                    statement.storage, statement.lvalue,
+                    self._eval(statement.rvalue, memo),
+                    shadow=shadow, memo=memo)
+            elif isinstance(statement, BlockCond):
+                value, mask = self._eval(statement.condition, memo)
+                known = mask == 0
+                take_true = known & (value != 0)
+                take_false = known & (value == 0)
+                if take_true.all():
+                    self._eval_statements(statement.true, shadow, memo)
+                elif take_false.all():
+                    self._eval_statements(statement.false, shadow, memo)
+                else:
+                    true_shadow = _Shadow(self, shadow)
+                    false_shadow = _Shadow(self, shadow)
+                    self._eval_statements(statement.true, true_shadow, memo)
+                    self._eval_statements(statement.false, false_shadow, memo)
+                    shadow.merge(
+                        take_true, true_shadow, take_false, false_shadow)
+            else:
+                assert False
+
+    def _apply_pokes(self, pokes):
+        for storage, (value, mask) in pokes.targets.items():
+            old_value, old_mask = self._values[storage]
+            if pokes.select is not None:
+                select = _lane_select(pokes.select, value)
+                value = np.where(select, value, old_value)
+                mask = np.where(select, mask, old_mask)
+            if not (
+                    np.array_equal(value, old_value) and
+                    np.array_equal(mask, old_mask)):
+                self._values[storage] = (value, mask)
+                self._notify_change(storage)
+
+    def dump_trace(self, trace, file, format='vcd'):
+        # pylint: disable=redefined-builtin
+        raise RuntimeError('tracing is not supported for batched simulation')
+
+    def _set_clock(self, storage, level, time=None):
+        # pylint: disable=unused-argument
+        self.poke(storage, storage, (
+            self._full(1, level), self._full(1, 0)))
+
+    def peek(self, rvalue, indices=()):
+        if indices:
+            raise RuntimeError(
+                'peeking with separate indices is not supported for batched '
+                'simulation')
+        return self._eval(rvalue, {})
+
+    def poke(
+            self, storage, lvalue, rvalue, *,
+            indices=(), bitslice=None, xpoke=False, shadow=None, memo=None):
+        # Indices and bit slices are taken from the lvalue and x values are
+        # part of the poked value
+        if indices or bitslice is not None or xpoke:
+            raise RuntimeError(
+                'poking with separate indices, bit slices or x is not '
+                'supported for batched simulation')
+
+        if lvalue.width == 0:
+            return
+
+        if memo is None:
+            memo = {}
+
+        if shadow is None:
+            pokes = _Shadow(self)
+            self._write(pokes, storage, lvalue, rvalue, memo)
+            self._apply_pokes(pokes)
+        else:
+            self._write(shadow, storage, lvalue, rvalue, memo)
+
+    def _write(self, shadow, storage, lvalue, rvalue, memo):
+        bitslice = bitindex = None
+        target = lvalue
+        if isinstance(target, PrimSlice):
+            bitslice = target.start
+            target = target.x
+        elif isinstance(target, PrimBitIndex):
+            bitindex = (
+                *self._eval(target.index, memo), target.index.width)
+            target = target.x
+
+        indices = []
+        while isinstance(target, PrimIndex):
+            indices.append(
+                (self._eval(target.index, memo), target.x.dimensions[-1],
+                 target.index.width))
+            target = target.x
+        indices.reverse()
+
+        if target != storage:
+            raise RuntimeError('unexpected lvalue')
+
+        value, mask = rvalue
+        target_value, target_mask = shadow.target(storage)
+
+        known = np.ones(self.lanes, dtype=bool)
+        for (index_value, index_mask), index_range, _width in indices:
+            known &= (index_mask == 0) & (index_value < index_range)
+        if bitindex is not None:
+            index_value, index_mask, _width = bitindex
+            known &= (index_mask == 0) & (index_value < target.width)
+
+        if known.all():
+            lanes = self._lane_range
+        else:
+            lanes = np.flatnonzero(known)
+
+        if len(lanes):
+            position = (lanes,) + tuple(
+                index_value[lanes].astype(np.intp)
+                for (index_value, _mask), _range, _width in indices)
+            new_value, new_mask = value[lanes], mask[lanes]
+
+            if bitslice is not None or bitindex is not None:
+                if bitindex is not None:
+                    offset = _cast(bitindex[0][lanes], storage.width)
+                else:
+                    offset = bitslice
+                keep_mask = bitmask(storage.width) ^ (
+                    bitmask(lvalue.width) << offset)
+                new_value = _cast(new_value, storage.width) << offset
+                new_mask = _cast(new_mask, storage.width) << offset
+                new_value |= target_value[position] & keep_mask
+                new_mask |= target_mask[position] & keep_mask
+
+            target_value[position] = new_value
+            target_mask[position] = new_mask
+
+        for lane in np.flatnonzero(~known):
+            self._lane_write(
+                target_value, target_mask, lane, storage, indices,
+                bitslice, bitindex, value[lane], mask[lane], lvalue.width)
+
+    def _lane_write(
+            self, target_value, target_mask, lane, storage, indices,
+            bitslice, bitindex, value, mask, width):
+        # Follows the scalar semantics of SimEngine.poke for a single lane
+        positions = [(lane,)]
+        xpoke = False
+        for (index_value, index_mask), index_range, index_width in indices:
+            index = BitVec(
+                index_width, int(index_value[lane]), int(index_mask[lane]))
+            candidates = list(index.values())
+            if index.mask:
+                xpoke = True
+            if any(i >= index_range for i in candidates):
+                candidates = range(index_range)
+                xpoke = True
+            positions = [
+                position + (i,)
+                for position in positions
+                for i in candidates]
+
+        for position in positions:
+            old_value, old_mask = target_value[position], target_mask[position]
+
+            if bitslice is None and bitindex is None:
+                if xpoke:
+                    target_value[position], target_mask[position] = _combine(
+                        value, mask, old_value, old_mask)
+                else:
+                    target_value[position] = value
+                    target_mask[position] = mask
+                continue
+
+            new = BitVec(storage.width, int(old_value), int(old_mask))
+            rvalue = BitVec(width, int(value), int(mask))
+
+            if bitslice is not None:
+                updates = [(bitslice, rvalue, xpoke)]
+            else:
+                index_value, index_mask, index_width = bitindex
+                index = BitVec(
+                    index_width, int(index_value[lane]), int(index_mask[lane]))
+                updates = []
+                for i in index.values():
+                    if i >= storage.width:
+                        updates.append((0, rvalue.repeat(storage.width), True))
+                        break
+                    updates.append((i, rvalue, xpoke or bool(index.mask)))
+
+            for offset, update, update_xpoke in updates:
+                update = new.updated_at(offset, update)
+                if update_xpoke:
+                    update = update.combine(new)
+                new = update
+
+            target_value[position] = new.value
+            target_mask[position] = new.mask
+
+    def _eval(self, prim, memo):
+        try:
+            return memo[prim]
+        except KeyError:
+            pass
+        result = memo[prim] = self._eval_prim(prim, memo)
+        return result
+
+    def _full(self, width, value):
+        return np.full(self.lanes, value, dtype=_dtype(width))
+
+    def _fallback(self, prim, operands, lanes, value, mask):
+        """Evaluate prim for the given lanes using scalar BitVec evaluation."""
+        operand_prims = list(prim)
+        for lane in lanes:
+            operand_values = {
+                operand: BitVec(
+                    operand.width, int(operand_value[lane]),
+                    int(operand_mask[lane]))
+                for operand, (operand_value, operand_mask)
+                in zip(operand_prims, operands)}
+            result = prim.eval(operand_values.__getitem__)
+            value[lane] = result.value
+            mask[lane] = result.mask
+        return value, mask
+
+    def _eval_operands(self, prim, memo):
+        return [self._eval(operand, memo) for operand in prim]
+
+    @visitor
+    def _eval_prim(self, prim, memo):
+        raise RuntimeError(
+            'batched evaluation of %s not supported' % type(prim).__name__)
+
+    @_eval_prim.on(PrimStorage)
+    def _eval_prim(self, prim, memo):
+        return self._values[prim]
+
+    @_eval_prim.on(PrimReg)
+    def _eval_prim(self, prim, memo):
+        return self._eval(prim.simplify_read(), memo)
+
+    @_eval_prim.on(PrimConst)
+    def _eval_prim(self, prim, memo):
+        return (
+            self._full(prim.width, prim.value.value),
+            self._full(prim.width, prim.value.mask))
+
+    @_eval_prim.on(PrimTable)
+    def _eval_prim(self, prim, memo):
+        entries = [self._eval(entry, memo) for entry in prim.table]
+        return (
+            np.stack([value for value, _mask in entries], axis=1),
+            np.stack([mask for _value, mask in entries], axis=1))
+
+    @_eval_prim.on(PrimIndex)
+    def _eval_prim(self, prim, memo):
+        value_x, mask_x = self._eval(prim.x, memo)
+        value_index, mask_index = self._eval(prim.index, memo)
+        index_range = prim.x.dimensions[-1]
+
+        known = (mask_index == 0) & (value_index < index_range)
+        index = np.where(known, value_index, 0).astype(np.intp)
+
+        value = value_x[self._lane_range, index]
+        mask = mask_x[self._lane_range, index]
+
+        for lane in np.flatnonzero(~known):
+            index = BitVec(
+                prim.index.width,
+                int(value_index[lane]), int(mask_index[lane]))
+            result = None
+            for i in index.values():
+                if i >= index_range:
+                    result = (0, bitmask(prim.width))
+                    break
+                candidate = value_x[lane, i], mask_x[lane, i]
+                if result is None:
+                    result = candidate
+                else:
+                    result = _combine(*result, *candidate)
+            value[lane], mask[lane] = result
+
+        return value, mask
+
+    @_eval_prim.on(PrimNot)
+    def _eval_prim(self, prim, memo):
+        value, mask = self._eval(prim.x, memo)
+        return (value | mask) ^ bitmask(prim.width), mask
+
+    @_eval_prim.on(PrimConcat)
+    def _eval_prim(self, prim, memo):
+        value = self._full(prim.width, 0)
+        mask = self._full(prim.width, 0)
+        offset = 0
+        for part in prim.parts:
+            part_value, part_mask = self._eval(part, memo)
+            value |= _cast(part_value, prim.width) << offset
+            mask |= _cast(part_mask, prim.width) << offset
+            offset += part.width
+        return value, mask
+
+    @_eval_prim.on(PrimAnd)
+    def _eval_prim(self, prim, memo):
+        (value_a, mask_a), (value_b, mask_b) = self._eval_operands(prim, memo)
+        return (
+            value_a & value_b,
+            (mask_a | mask_b) & (value_a | mask_a) & (value_b | mask_b))
+
+    @_eval_prim.on(PrimOr)
+    def _eval_prim(self, prim, memo):
+        (value_a, mask_a), (value_b, mask_b) = self._eval_operands(prim, memo)
+        value = value_a | value_b
+        return value, (mask_a | mask_b) & ~value
+
+    @_eval_prim.on(PrimXor)
+    def _eval_prim(self, prim, memo):
+        (value_a, mask_a), (value_b, mask_b) = self._eval_operands(prim, memo)
+        mask = mask_a | mask_b
+        return (value_a ^ value_b) & ~mask, mask
+
+    @_eval_prim.on(PrimAdd)
+    def _eval_prim(self, prim, memo):
+        (value_a, mask_a), (value_b, mask_b) = self._eval_operands(prim, memo)
+        width_mask = bitmask(prim.width)
+        low = value_a + value_b
+        mask = (
+            (low ^ (low + mask_a + mask_b)) | mask_a | mask_b) & width_mask
+        return low & ~mask & width_mask, mask
+
+    @_eval_prim.on(PrimSub)
+    def _eval_prim(self, prim, memo):
+        (value_a, mask_a), (value_b, mask_b) = self._eval_operands(prim, memo)
+        width_mask = bitmask(prim.width)
+        diff = value_a - value_b
+        low = diff - mask_b
+        mask = ((low ^ (diff + mask_a)) | mask_a | mask_b) & width_mask
+        return low & ~mask & width_mask, mask
+
+    @_eval_prim.on(PrimMul)
+    def _eval_prim(self, prim, memo):
+        (value_a, mask_a), (value_b, mask_b) = self._eval_operands(prim, memo)
+        width_mask = bitmask(prim.width)
+        unknown = (mask_a != 0) | (mask_b != 0)
+        value = (value_a * value_b) & width_mask
+        value[unknown] = 0
+        mask = self._full(prim.width, 0)
+        mask[unknown] = width_mask
+        return value, mask
+
+    @staticmethod
+    def _select_bit(true, false):
+        return true.astype(np.uint64), (~(true | false)).astype(np.uint64)
+
+    @_eval_prim.on(PrimEq)
+    def _eval_prim(self, prim, memo):
+        (value_a, mask_a), (value_b, mask_b) = self._eval_operands(prim, memo)
+        unknown = mask_a | mask_b
+        return self._select_bit(
+            (value_a == value_b) & (unknown == 0),
+            ((value_a ^ value_b) & ~unknown) != 0)
+
+    def _less_than(self, value_a, mask_a, value_b, mask_b):
+        return self._select_bit(
+            (value_a | mask_a) < value_b,
+            value_a >= (value_b | mask_b))
+
+    @_eval_prim.on(PrimLt)
+    def _eval_prim(self, prim, memo):
+        (value_a, mask_a), (value_b, mask_b) = self._eval_operands(prim, memo)
+        return self._less_than(value_a, mask_a, value_b, mask_b)
+
+    @_eval_prim.on(PrimSignedLt)
+    def _eval_prim(self, prim, memo):
+        sign_bit = 1 << (prim.a.width - 1)
+        operands = []
+        for value, mask in self._eval_operands(prim, memo):
+            operands.extend(((value ^ sign_bit) & ~mask, mask))
+        return self._less_than(*operands)
+
+    def _shift(self, prim, memo, shift_fn):
+        value_x, mask_x = self._eval(prim.x, memo)
+        value_shift, mask_shift = self._eval(prim.shift, memo)
+
+        known = mask_shift == 0
+        amount = _cast(
+            np.minimum(np.where(known, value_shift, 0), prim.width),
+            prim.width)
+
+        value = shift_fn(value_x, amount)
+        mask = shift_fn(mask_x, amount)
+
+        if not known.all():
+            self._fallback(
+                prim, [(value_x, mask_x), (value_shift, mask_shift)],
+                np.flatnonzero(~known), value, mask)
+
+        return value, mask
+
+    @_eval_prim.on(PrimShiftLeft)
+    def _eval_prim(self, prim, memo):
+        width, width_mask = prim.width, bitmask(prim.width)
+
+        def shift_left(x, amount):
+            if x.dtype == object:
+                return (x << amount) & width_mask
+            return np.where(
+                amount < width, (x << np.minimum(amount, 63)) & width_mask, 0
+            ).astype(np.uint64)
+
+        return self._shift(prim, memo, shift_left)
+
+    @_eval_prim.on(PrimShiftRight)
+    def _eval_prim(self, prim, memo):
+        def shift_right(x, amount):
+            if x.dtype == object:
+                return x >> amount
+            return np.where(
+                amount < 64, x >> np.minimum(amount, 63), 0
+            ).astype(np.uint64)
+
+        return self._shift(prim, memo, shift_right)
+
+    @_eval_prim.on(PrimArithShiftRight)
+    def _eval_prim(self, prim, memo):
+        width_mask = bitmask(prim.width)
+
+        def arith_shift_right(x, amount):
+            if not prim.width:
+                return x
+            amount = np.minimum(amount, prim.width - 1)
+            fill = width_mask & ~(width_mask >> amount)
+            sign = (x >> (prim.width - 1)) & 1
+            return (x >> amount) | np.where(sign != 0, fill, 0).astype(x.dtype)
+
+        return self._shift(prim, memo, arith_shift_right)
+
+    @_eval_prim.on(PrimZeroExt)
+    def _eval_prim(self, prim, memo):
+        value, mask = self._eval(prim.x, memo)
+        return _cast(value, prim.width), _cast(mask, prim.width)
+
+    @_eval_prim.on(PrimSignExt)
+    def _eval_prim(self, prim, memo):
+        value, mask = self._eval(prim.x, memo)
+        sign_bit = 1 << (prim.x.width - 1)
+        width_mask = bitmask(prim.width)
+
+        def sign_extend(x):
+            return ((_cast(x, prim.width) ^ sign_bit) - sign_bit) & width_mask
+
+        return sign_extend(value), sign_extend(mask)
+
+    @_eval_prim.on(PrimSlice)
+    def _eval_prim(self, prim, memo):
+        value, mask = self._eval(prim.x, memo)
+        width_mask = bitmask(prim.width)
+        return (
+            _cast((value >> prim.start) & width_mask, prim.width),
+            _cast((mask >> prim.start) & width_mask, prim.width))
+
+    @_eval_prim.on(PrimRepeat)
+    def _eval_prim(self, prim, memo):
+        value, mask = self._eval(prim.x, memo)
+        factor = bitrepeat(prim.count, prim.x.width, 1)
+        return (
+            _cast(value, prim.width) * factor,
+            _cast(mask, prim.width) * factor)
+
+    @_eval_prim.on(PrimBitIndex)
+    def _eval_prim(self, prim, memo):
+        operands = self._eval_operands(prim, memo)
+        (value_index, mask_index), (value_x, mask_x) = operands
+
+        known = (mask_index == 0) & (value_index < prim.x.width)
+        index = _cast(np.where(known, value_index, 0), prim.x.width)
+
+        value = _cast((value_x >> index) & 1, 1)
+        mask = _cast((mask_x >> index) & 1, 1)
+
+        if not known.all():
+            self._fallback(
+                prim, operands, np.flatnonzero(~known), value, mask)
+
+        return value, mask
+
+    @_eval_prim.on(PrimMux)
+    def _eval_prim(self, prim, memo):
+        operands = self._eval_operands(prim, memo)
+        value_index, mask_index = operands[0]
+
+        known = (mask_index == 0) & (value_index < len(prim.ports))
+        index = np.where(known, value_index, 0).astype(np.intp)
+
+        value = np.stack([port_value for port_value, _ in operands[1:]])[
+            index, self._lane_range]
+        mask = np.stack([port_mask for _, port_mask in operands[1:]])[
+            index, self._lane_range]
+
+        if not known.all():
+            self._fallback(
+                prim, operands, np.flatnonzero(~known), value, mask)
+
+        return value, mask
+
+
+class _Shadow:
+    """Pending writes of a block evaluation.
+
+    Storage is copied on the first write, so all writes can be performed in
+    place. A shadow with a parent sees the pending writes of its parent.
+    """
+    def __init__(self, engine, parent=None):
+        self.engine = engine
+        self.parent = parent
+        self.targets = {}
+        self.select = None
+
+    def read(self, storage):
+        try:
+            return self.targets[storage]
+        except KeyError:
+            pass
+        if self.parent is not None:
+            return self.parent.read(storage)
+        return self.engine._values[storage]
+
+    def target(self, storage):
+        try:
+            return self.targets[storage]
+        except KeyError:
+            pass
+        value, mask = self.read(storage)
+        target = self.targets[storage] = (value.copy(), mask.copy())
+        return target
+
+    def merge(self, take_true, true_shadow, take_false, false_shadow):
+        storages = dict.fromkeys(
+            list(true_shadow.targets) + list(false_shadow.targets))
+        for storage in storages:
+            true_value, true_mask = true_shadow.read(storage)
+            false_value, false_mask = false_shadow.read(storage)
+            value, mask = _combine(
+                true_value, true_mask, false_value, false_mask)
+
+            select_true = _lane_select(take_true, value)
+            select_false = _lane_select(take_false, value)
+
+            value = np.where(
+                select_true, true_value,
+                np.where(select_false, false_value, value))
+            mask = np.where(
+                select_true, true_mask,
+                np.where(select_false, false_mask, mask))
+
+            self.targets[storage] = (value, mask)
+
+    def __bool__(self):
+        return bool(self.targets)
+
+
+class BatchSim:
+    """Simulation driver for a batch of independent instances of a module.
+
+    Unlike :class:`SimContext` this does not run simulation threads. Instead
+    the caller drives the batch directly by poking inputs, stepping the
+    simulation and peeking at outputs. Peeked and poked values are arrays with
+    one entry per lane.
+    """
+    def __init__(self, module, lanes):
+        module._module_data.circuit.finalize()
+
+        self._module = module
+        self._engine = BatchSimEngine(module, lanes=lanes)
+
+    @property
+    def lanes(self):
+        return self._engine.lanes
+
+    def reset(self):
+        self._engine.reset()
+
+    @staticmethod
+    def _prim(signal):
+        prims = list(signal._prims.values())
+        if len(prims) != 1:
+            raise TypeError(
+                'batched simulation only supports signals consisting of a '
+                'single primitive')
+        return prims[0].simplify_read()
+
+    def peek(self, signal):
+        """Value of a signal for every lane, using ``0`` for ``x`` bits."""
+        value, _mask = self._engine.peek(self._prim(signal))
+        return value
+
+    def peek_x(self, signal):
+        """Mask of the ``x`` bits of a signal for every lane."""
+        _value, mask = self._engine.peek(self._prim(signal))
+        return mask
+
+    def poke(self, signal, value, mask=0):
+        """Set a signal to a value per lane.
+
+        The value and mask can be an int, which is used for all lanes, or an
+        array with one entry per lane.
+        """
+        prims = list(signal._prims.values())
+        if len(prims) != 1:
+            raise TypeError(
+                'batched simulation only supports signals consisting of a '
+                'single primitive')
+        lvalue = prims[0]
+
+        if lvalue.allowed_writers == set():
+            raise InvalidSignalAssignment  # TODO Message
+
+        lvalue, storage = lvalue.lower_lvalue()
+
+        shape = (self.lanes,) + tuple(reversed(lvalue.dimensions))
+        width_mask = bitmask(lvalue.width)
+        value = np.broadcast_to(np.asarray(value, dtype=object), shape)
+        mask = np.broadcast_to(np.asarray(mask, dtype=object), shape)
+        mask = _cast(mask & width_mask, lvalue.width)
+        value = _cast(value & width_mask, lvalue.width) & ~mask
+
+        self._engine.poke(storage.simplify_read(), lvalue, (value, mask))
+
+    def settle(self):
+        """Propagate pokes through the combinational logic."""
+        self._engine.step_combinational()
+
+    def step(self):
+        """Settle and evaluate clocked logic for any clock edges."""
+        while self._engine.step():
+            pass
+
+    def cycle(self, clock, count=1):
+        """Run a clock for a number of cycles, ending with the clock high."""
+        if Signal.isinstance(clock, Clock):
+            clock = clock.clk
+        if not Signal.isinstance(clock, Bool):
+            raise TypeError('cycle requries a Clock or Bool signal')
+
+        for _ in range(count):
+            self.poke(clock, 0)
+            self.step()
+            self.poke(clock, 1)
+            self.step()
+
+
+__all__ = [
+    'BatchSimEngine',
+    'BatchSim',
+]
@@ -0,0 +1,584 @@
+import linecache
+from collections import OrderedDict
+from contextlib import contextmanager
+from itertools import count
+
+from ..bitmath import bitmask, bitrepeat
+from ..bitvec import BitVec
+from ..circuit import BlockAssign, BlockCond
+from ..primitive import *
+from ..visitor import visitor
+from .engine import SimEngine
+
+
+class CompiledSimEngine(SimEngine):
+    """Simulation engine evaluating circuits using generated Python code.
+
+    Every assignment and block of the simulated circuits is translated once
+    into a straight-line Python function operating on the value/mask integer
+    pairs of the involved storage. Cases that cannot be handled by the
+    generated code (e.g. indexing with unknown indices) fall back to the
+    interpreting :class:`SimEngine` implementation.
+    """
+    def __init__(self, *modules, circuits=None):
+        self._compiler = self._make_compiler()
+        self._block_fns = {}
+        self._peek_fns = {}
+        super().__init__(*modules, circuits=circuits)
+
+    def _make_compiler(self):
+        return SimCompiler(self)
+
+    def _add_assign(self, storage, lvalue, rvalue):
+        assign_fn = self._compiler.compile_assign(storage, lvalue, rvalue)
+        self._add_combinational_node(
+            (assign_fn, None), rvalue.accessed_storage, [storage])
+
+    def _add_combinational(self, storage, block):
+        self._block_fns[block] = self._compiler.compile_block(block)
+        super()._add_combinational(storage, block)
+
+    def _add_clocked(self, clock, block):
+        self._block_fns[block] = self._compiler.compile_block(block)
+        super()._add_clocked(clock, block)
+
+    def _add_async_reset(self, clock, reset, block):
+        self._block_fns[block] = self._compiler.compile_block(block)
+        super()._add_async_reset(clock, reset, block)
+
+    def _add_initial(self, storage, block):
+        self._block_fns[block] = self._compiler.compile_block(block)
+        super()._add_initial(storage, block)
+
+    def _eval_block(self, block):
+        return self._block_fns[block]()
+
+    def peek(self, rvalue, indices=()):
+        if indices or rvalue.dimensions or rvalue in self._storage_prims:
+            return super().peek(rvalue, indices)
+        try:
+            peek_fn = self._peek_fns[rvalue]
+        except KeyError:
+            peek_fn = self._peek_fns[rvalue] = (
+                self._compiler.compile_peek(rvalue))
+        return peek_fn()
+
+
+class SimCompiler:
+    def __init__(self, engine):
+        self.engine = engine
+        self._counter = count()
+
+    def compile_assign(self, storage, lvalue, rvalue):
+        gen = self.function_gen('assign')
+        gen.store(storage, lvalue, rvalue, shadow=False)
+        return gen.build('_params')
+
+    def compile_block(self, block):
+        gen = self.function_gen('block')
+        gen.line('shadow = OrderedDict()')
+        gen.statements(block.assignments)
+        gen.line('return shadow')
+        return gen.build()
+
+    def compile_peek(self, rvalue):
+        gen = self.function_gen('peek')
+        value, mask = gen.expr(rvalue)
+        gen.line('return BitVec(%i, %s, %s)' % (rvalue.width, value, mask))
+        return gen.build()
+
+    def namespace(self):
+        engine = self.engine
+        return {
+            'engine': engine,
+            'BitVec': BitVec,
+            'OrderedDict': OrderedDict,
+            'notify': engine._notify_change,
+            'poke': engine.poke,
+            'shadow_peek': engine._shadow_peek,
+            'eval_statements': engine._eval_block_assignments,
+            'interp_peek': super(CompiledSimEngine, engine).peek,
+            'fallback_eval': _fallback_eval,
+        }
+
+    def function_gen(self, kind):
+        return _FunctionGen(self, kind)
+
+    def function_name(self, kind):
+        return '%s_%i' % (kind, next(self._counter))
+
+
+def _fallback_eval(prim, operands):
+    operands = dict(zip(prim, operands))
+    return prim.eval(operands.__getitem__)
+
+
+class _FunctionGen:
+    # pylint: disable=function-redefined
+    def __init__(self, compiler, kind):
+        self.compiler = compiler
+        self.name = compiler.function_name(kind)
+        self.namespace = compiler.namespace()
+        self.lines = []
+        self.indent = 1
+        self.exprs = {}
+        self.refs = {}
+        self.counter = count()
+
+        self.line('values = engine._values')
+
+    def build(self, *params):
+        source = '\n'.join(
+            ['def %s(%s):' % (self.name, ', '.join(params))] + self.lines)
+        filename = '<rattle sim %s>' % self.name
+        linecache.cache[filename] = (
+            len(source), None, source.splitlines(True), filename)
+        exec(compile(source, filename, 'exec'), self.namespace)
+        return self.namespace[self.name]
+
+    def line(self, line):
+        self.lines.append('    ' * self.indent + line)
+
+    @contextmanager
+    def branch(self, header):
+        self.line(header)
+        self.indent += 1
+        saved_exprs = self.exprs
+        self.exprs = dict(saved_exprs)
+        start = len(self.lines)
+        try:
+            yield
+        finally:
+            if len(self.lines) == start:
+                self.line('pass')
+            self.exprs = saved_exprs
+            self.indent -= 1
+
+    def ref(self, obj):
+        try:
+            return self.refs[id(obj)][0]
+        except KeyError:
+            pass
+        name = 'k%i' % len(self.refs)
+        self.refs[id(obj)] = (name, obj)
+        self.namespace[name] = obj
+        return name
+
+    def tmp(self, prefix='t'):
+        return '%s%i' % (prefix, next(self.counter))
+
+    def tmp_pair(self):
+        i = next(self.counter)
+        return 'v%i' % i, 'm%i' % i
+
+    def unpack(self, bitvec_expr):
+        value, mask = self.tmp_pair()
+        tmp = self.tmp()
+        self.line('%s = %s' % (tmp, bitvec_expr))
+        self.line('%s = %s.value' % (value, tmp))
+        self.line('%s = %s.mask' % (mask, tmp))
+        return value, mask
+
+    def statements(self, assignments):
+        for statement in assignments:
+            if isinstance(statement, BlockAssign):
+                self.store(
+                    statement.storage, statement.lvalue, statement.rvalue,
+                    shadow=True)
+            elif isinstance(statement, BlockCond):
+                value, mask = self.expr(statement.condition)
+                with self.branch('if %s:' % mask):
+                    self.line('eval_statements(%s, shadow)' % self.ref(
+                        (statement,)))
+                with self.branch('elif %s:' % value):
+                    self.statements(statement.true)
+                with self.branch('else:'):
+                    self.statements(statement.false)
+            else:
+                assert False
+
+    def store(self, storage, lvalue, rvalue, shadow):
+        value, mask = self.expr(rvalue)
+        new_value = 'BitVec(%i, %s, %s)' % (rvalue.width, value, mask)
+
+        target = lvalue
+        bitslice = None
+        if isinstance(target, PrimSlice):
+            bitslice = target.start
+            target = target.x
+
+        indices = []
+        while isinstance(target, PrimIndex):
+            indices.append((self.expr(target.index), target.index.width,
+                            target.x.dimensions[-1]))
+            target = target.x
+
+        storage_ref = self.ref(storage)
+
+        if target is not storage or not (shadow or lvalue is storage):
+            self.line('poke(%s, %s, %s%s)' % (
+                storage_ref, self.ref(lvalue), new_value,
+                ', shadow=shadow' if shadow else ''))
+            return
+
+        if not shadow:
+            old = self.tmp()
+            self.line('%s = values[%s]' % (old, storage_ref))
+            with self.branch('if %s.value != %s or %s.mask != %s:' % (
+                    old, value, old, mask)):
+                self.line('values[%s] = %s' % (storage_ref, new_value))
+                self.line('notify(%s)' % storage_ref)
+            return
+
+        checks = []
+        for (index_value, index_mask), index_width, index_range in indices:
+            checks.append('%s == 0' % index_mask)
+            if index_range < 1 << index_width:
+                checks.append('%s < %i' % (index_value, index_range))
+
+        key_indices = '(%s)' % ''.join(
+            '%s, ' % index_value
+            for (index_value, _index_mask), _, _ in indices)
+
+        if checks:
+            with self.branch('if %s:' % ' and '.join(checks)):
+                self._store_shadow(
+                    storage_ref, key_indices, bitslice, new_value)
+            with self.branch('else:'):
+                self.line('poke(%s, %s, %s, shadow=shadow)' % (
+                    storage_ref, self.ref(lvalue), new_value))
+        else:
+            self._store_shadow(storage_ref, key_indices, bitslice, new_value)
+
+    def _store_shadow(self, storage_ref, key_indices, bitslice, new_value):
+        if bitslice is not None:
+            old = self.tmp()
+            self.line('%s = shadow_peek(shadow, %s, %s)' % (
+                old, storage_ref, key_indices))
+            new_value = '%s.updated_at(%i, %s)' % (old, bitslice, new_value)
+        self.line('shadow[(%s, %s)] = %s' % (
+            storage_ref, key_indices, new_value))
+
+    def expr(self, prim):
+        try:
+            return self.exprs[prim]
+        except KeyError:
+            pass
+        result = self._expr(prim)
+        self.exprs[prim] = result
+        return result
+
+    @staticmethod
+    def memory_offset(storage, index_values):
+        # Index values are innermost first, see Memory.offset
+        terms = []
+        stride = 1
+        for index_value, dimension in zip(index_values, storage.dimensions):
+            if stride == 1:
+                terms.append(index_value)
+            else:
+                terms.append('%s * %i' % (index_value, stride))
+            stride *= dimension
+        return ' + '.join(terms)
+
+    def fallback_peek(self, prim):
+        return self.unpack('interp_peek(%s)' % self.ref(prim))
+
+    def fallback_eval(self, prim):
+        operands = ', '.join(
+            'BitVec(%i, %s, %s)' % (operand.width, *self.expr(operand))
+            for operand in prim)
+        return self.unpack('fallback_eval(%s, (%s,))' % (
+            self.ref(prim), operands))
+
+    def assign_pair(self, value_expr, mask_expr):
+        value, mask = self.tmp_pair()
+        self.line('%s = %s' % (value, value_expr))
+        self.line('%s = %s' % (mask, mask_expr))
+        return value, mask
+
+    @visitor
+    def _expr(self, prim):
+        return self.fallback_peek(prim)
+
+    @_expr.on(PrimStorage)
+    def _expr(self, prim):
+        if prim.dimensions:
+            return self.fallback_peek(prim)
+        return self.unpack('values[%s]' % self.ref(prim))
+
+    @_expr.on(PrimReg)
+    def _expr(self, prim):
+        return self.expr(prim.simplify_read())
+
+    @_expr.on(PrimConst)
+    def _expr(self, prim):
+        return '%#x' % prim.value.value, '%#x' % prim.value.mask
+
+    @_expr.on(PrimIndex)
+    def _expr(self, prim):
+        indices = []
+        target = prim
+        while isinstance(target, PrimIndex):
+            indices.append(target)
+            target = target.x
+        if not isinstance(target, PrimStorage) or prim.dimensions:
+            return self.fallback_peek(prim)
+
+        checks = []
+        index_values = []
+        for index_prim in indices:
+            index_value, index_mask = self.expr(index_prim.index)
+            checks.append('%s == 0' % index_mask)
+            index_range = index_prim.x.dimensions[-1]
+            if index_range < 1 << index_prim.index.width:
+                checks.append('%s < %i' % (index_value, index_range))
+            index_values.append(index_value)
+
+        value, mask = self.tmp_pair()
+        tmp = self.tmp()
+        with self.branch('if %s:' % ' and '.join(checks)):
+            self.line('%s = values[%s].get(%s)' % (
+                tmp, self.ref(target),
+                self.memory_offset(target, index_values)))
+        with self.branch('else:'):
+            self.line('%s = interp_peek(%s)' % (tmp, self.ref(prim)))
+        self.line('%s = %s.value' % (value, tmp))
+        self.line('%s = %s.mask' % (mask, tmp))
+        return value, mask
+
+    @_expr.on(PrimNot)
+    def _expr(self, prim):
+        value, mask = self.expr(prim.x)
+        return self.assign_pair(
+            '(%s | %s) ^ %#x' % (value, mask, bitmask(prim.width)), mask)
+
+    @_expr.on(PrimConcat)
+    def _expr(self, prim):
+        values, masks = [], []
+        offset = 0
+        for part in prim.parts:
+            value, mask = self.expr(part)
+            if offset:
+                value = '(%s << %i)' % (value, offset)
+                mask = '(%s << %i)' % (mask, offset)
+            values.append(value)
+            masks.append(mask)
+            offset += part.width
+        return self.assign_pair(' | '.join(values), ' | '.join(masks))
+
+    @_expr.on(PrimAnd)
+    def _expr(self, prim):
+        value_a, mask_a = self.expr(prim.a)
+        value_b, mask_b = self.expr(prim.b)
+        return self.assign_pair(
+            '%s & %s' % (value_a, value_b),
+            '(%s | %s) & (%s | %s) & (%s | %s)' % (
+                mask_a, mask_b, value_a, mask_a, value_b, mask_b))
+
+    @_expr.on(PrimOr)
+    def _expr(self, prim):
+        value_a, mask_a = self.expr(prim.a)
+        value_b, mask_b = self.expr(prim.b)
+        value, mask = self.tmp_pair()
+        self.line('%s = %s | %s' % (value, value_a, value_b))
+        self.line('%s = (%s | %s) & ~%s' % (mask, mask_a, mask_b, value))
+        return value, mask
+
+    @_expr.on(PrimXor)
+    def _expr(self, prim):
+        value_a, mask_a = self.expr(prim.a)
+        value_b, mask_b = self.expr(prim.b)
+        value, mask = self.tmp_pair()
+        self.line('%s = %s | %s' % (mask, mask_a, mask_b))
+        self.line('%s = (%s ^ %s) & ~%s' % (value, value_a, value_b, mask))
+        return value, mask
+
+    @_expr.on(PrimAdd)
+    def _expr(self, prim):
+        value_a, mask_a = self.expr(prim.a)
+        value_b, mask_b = self.expr(prim.b)
+        width_mask = bitmask(prim.width)
+        value, mask = self.tmp_pair()
+        low = self.tmp()
+        self.line('%s = %s + %s' % (low, value_a, value_b))
+        self.line('%s = ((%s ^ (%s + %s + %s)) | %s | %s) & %#x' % (
+            mask, low, low, mask_a, mask_b, mask_a, mask_b, width_mask))
+        self.line('%s = %s & ~%s & %#x' % (value, low, mask, width_mask))
+        return value, mask
+
+    @_expr.on(PrimSub)
+    def _expr(self, prim):
+        value_a, mask_a = self.expr(prim.a)
+        value_b, mask_b = self.expr(prim.b)
+        width_mask = bitmask(prim.width)
+        value, mask = self.tmp_pair()
+        diff = self.tmp()
+        self.line('%s = %s - %s' % (diff, value_a, value_b))
+        self.line('%s = (((%s - %s) ^ (%s + %s)) | %s | %s) & %#x' % (
+            mask, diff, mask_b, diff, mask_a, mask_a, mask_b, width_mask))
+        self.line('%s = (%s - %s) & ~%s & %#x' % (
+            value, diff, mask_b, mask, width_mask))
+        return value, mask
+
+    @_expr.on(PrimMul)
+    def _expr(self, prim):
+        value_a, mask_a = self.expr(prim.a)
+        value_b, mask_b = self.expr(prim.b)
+        width_mask = bitmask(prim.width)
+        value, mask = self.tmp_pair()
+        with self.branch('if %s or %s:' % (mask_a, mask_b)):
+            self.line('%s = 0' % value)
+            self.line('%s = %#x' % (mask, width_mask))
+        with self.branch('else:'):
+            self.line('%s = (%s * %s) & %#x' % (
+                value, value_a, value_b, width_mask))
+            self.line('%s = 0' % mask)
+        return value, mask
+
+    def _select_bit(self, value, mask, true_test, false_test):
+        with self.branch('if %s:' % true_test):
+            self.line('%s = 1' % value)
+            self.line('%s = 0' % mask)
+        with self.branch('elif %s:' % false_test):
+            self.line('%s = 0' % value)
+            self.line('%s = 0' % mask)
+        with self.branch('else:'):
+            self.line('%s = 0' % value)
+            self.line('%s = 1' % mask)
+
+    @_expr.on(PrimEq)
+    def _expr(self, prim):
+        value_a, mask_a = self.expr(prim.a)
+        value_b, mask_b = self.expr(prim.b)
+        value, mask = self.tmp_pair()
+        unknown = self.tmp()
+        self.line('%s = %s | %s' % (unknown, mask_a, mask_b))
+        self._select_bit(
+            value, mask,
+            '%s == %s and not %s' % (value_a, value_b, unknown),
+            '(%s ^ %s) & ~%s' % (value_a, value_b, unknown))
+        return value, mask
+
+    def _less_than(self, value_a, mask_a, value_b, mask_b):
+        value, mask = self.tmp_pair()
+        self._select_bit(
+            value, mask,
+            '(%s | %s) < %s' % (value_a, mask_a, value_b),
+            '%s >= (%s | %s)' % (value_a, value_b, mask_b))
+        return value, mask
+
+    @_expr.on(PrimLt)
+    def _expr(self, prim):
+        return self._less_than(*self.expr(prim.a), *self.expr(prim.b))
+
+    @_expr.on(PrimSignedLt)
+    def _expr(self, prim):
+        sign_bit = 1 << (prim.a.width - 1)
+        operands = []
+        for operand in (prim.a, prim.b):
+            value, mask = self.expr(operand)
+            wrapped = self.tmp()
+            self.line('%s = (%s ^ %#x) & ~%s' % (
+                wrapped, value, sign_bit, mask))
+            operands.extend((wrapped, mask))
+        return self._less_than(*operands)
+
+    def _shift(self, prim, value_expr, mask_expr):
+        value_x, mask_x = self.expr(prim.x)
+        _value_shift, mask_shift = self.expr(prim.shift)
+        value, mask = self.tmp_pair()
+        with self.branch('if %s == 0:' % mask_shift):
+            self.line('%s = %s' % (value, value_expr % value_x))
+            self.line('%s = %s' % (mask, mask_expr % mask_x))
+        with self.branch('else:'):
+            fallback_value, fallback_mask = self.fallback_eval(prim)
+            self.line('%s = %s' % (value, fallback_value))
+            self.line('%s = %s' % (mask, fallback_mask))
+        return value, mask
+
+    @_expr.on(PrimShiftLeft)
+    def _expr(self, prim):
+        value_shift, _mask_shift = self.expr(prim.shift)
+        fmt = '(%%s << %s) & %#x if %s < %i else 0' % (
+            value_shift, bitmask(prim.width), value_shift, prim.width)
+        return self._shift(prim, fmt, fmt)
+
+    @_expr.on(PrimShiftRight)
+    def _expr(self, prim):
+        value_shift, _mask_shift = self.expr(prim.shift)
+        fmt = '%%s >> %s' % value_shift
+        return self._shift(prim, fmt, fmt)
+
+    @_expr.on(PrimArithShiftRight)
+    def _expr(self, prim):
+        value_shift, _mask_shift = self.expr(prim.shift)
+        sign_bit = 1 << (prim.width - 1)
+        fmt = '(((%%s ^ %#x) - %#x) >> %s) & %#x' % (
+            sign_bit, sign_bit, value_shift, bitmask(prim.width))
+        return self._shift(prim, fmt, fmt)
+
+    @_expr.on(PrimZeroExt)
+    def _expr(self, prim):
+        return self.expr(prim.x)
+
+    @_expr.on(PrimSignExt)
+    def _expr(self, prim):
+        value, mask = self.expr(prim.x)
+        sign_bit = 1 << (prim.x.width - 1)
+        fmt = '((%%s ^ %#x) - %#x) & %#x' % (
+            sign_bit, sign_bit, bitmask(prim.width))
+        return self.assign_pair(fmt % value, fmt % mask)
+
+    @_expr.on(PrimSlice)
+    def _expr(self, prim):
+        value, mask = self.expr(prim.x)
+        fmt = '(%%s >> %i) & %#x' % (prim.start, bitmask(prim.width))
+        return self.assign_pair(fmt % value, fmt % mask)
+
+    @_expr.on(PrimRepeat)
+    def _expr(self, prim):
+        value, mask = self.expr(prim.x)
+        factor = bitrepeat(prim.count, prim.x.width, 1)
+        return self.assign_pair(
+            '%s * %#x' % (value, factor), '%s * %#x' % (mask, factor))
+
+    @_expr.on(PrimBitIndex)
+    def _expr(self, prim):
+        value_x, mask_x = self.expr(prim.x)
+        value_index, mask_index = self.expr(prim.index)
+        value, mask = self.tmp_pair()
+        with self.branch('if %s == 0 and %s < %i:' % (
+                mask_index, value_index, prim.x.width)):
+            self.line('%s = (%s >> %s) & 1' % (value, value_x, value_index))
+            self.line('%s = (%s >> %s) & 1' % (mask, mask_x, value_index))
+        with self.branch('else:'):
+            fallback_value, fallback_mask = self.fallback_eval(prim)
+            self.line('%s = %s' % (value, fallback_value))
+            self.line('%s = %s' % (mask, fallback_mask))
+        return value, mask
+
+    @_expr.on(PrimMux)
+    def _expr(self, prim):
+        value_index, mask_index = self.expr(prim.index)
+        port_values, port_masks = [], []
+        for port in prim.ports:
+            port_value, port_mask = self.expr(port)
+            port_values.append(port_value)
+            port_masks.append(port_mask)
+
+        test = '%s == 0' % mask_index
+        if len(prim.ports) < 1 << prim.index.width:
+            test += ' and %s < %i' % (value_index, len(prim.ports))
+
+        value, mask = self.tmp_pair()
+        with self.branch('if %s:' % test):
+            self.line('%s = (%s,)[%s]' % (
+                value, ', '.join(port_values), value_index))
+            self.line('%s = (%s,)[%s]' % (
+                mask, ', '.join(port_masks), value_index))
+        with self.branch('else:'):
+            fallback_value, fallback_mask = self.fallback_eval(prim)
+            self.line('%s = %s' % (value, fallback_value))
+            self.line('%s = %s' % (mask, fallback_mask))
+        return value, mask
@@ -1,11 +1,18 @@
 from collections import OrderedDict
-from queue import PriorityQueue, Empty
+from functools import partial
 from .engine import SimEngine
+from .compiled import CompiledSimEngine
+from .two_state import TwoStateSimEngine
+from .scheduler import Scheduler
+from .snapshot import SimSnapshot
+from .trace import Trace
 from .event import *
 from ..bitmath import log2up
 from ..bitvec import BitVec, XClass, xnot
 from ..primitive import PrimConst, PrimTable, PrimIndex
 from ..error import InvalidSignalAssignment
+from ..attribute import Keep
+from ..design import _design_modules
 from ..signal import Signal
 from ..type import Clock
 from .. import context
@@ -13,20 +20,78 @@ from .. import context
 
 class SimContext:
     # pylint: disable=attribute-defined-outside-init
-    def __init__(self, module):
-        module._module_data.circuit.finalize()
+    def __init__(
+            self, module, *, compiled=False, two_state=False, check_x=False,
+            eliminate_dead_logic=False, keep=(), x_index_limit=None):
+        if check_x and not two_state:
+            raise ValueError('check_x requires two_state simulation')
+
+        if eliminate_dead_logic:
+            circuits = self._eliminate_dead_logic(module, keep)
+        else:
+            module._module_data.circuit.finalize()
+            circuits = None
 
         self._module = module
-        self._engine = SimEngine(module)
+        if two_state:
+            self._engine = TwoStateSimEngine(
+                module, check_x=check_x, circuits=circuits)
+        elif compiled:
+            self._engine = CompiledSimEngine(module, circuits=circuits)
+        else:
+            self._engine = SimEngine(module, circuits=circuits)
+
+        if x_index_limit is not None:
+            self._engine.x_index_limit = x_index_limit
 
         self.reset(_reset_engine=False)
 
+    @staticmethod
+    def _eliminate_dead_logic(module, keep):
+        # Logic that is only peeked at by testbenches would be removed, so
+        # everything peeked at has to be kept explicitly, either by passing
+        # the signals or by passing a trace of them.
+        if isinstance(keep, Trace):
+            kept_prims = [prim for _scope, _name, prim in keep._traces]
+        else:
+            kept_prims = [
+                prim for signal in keep for prim in signal._prims.values()]
+
+        # The modules' circuits are left unchanged, the engine simulates the
+        # circuits returned here instead.
+        keep_by_module = {}
+        for prim in kept_prims:
+            for storage in prim.simplify_read().accessed_storage:
+                keep_by_module.setdefault(storage.module, []).append(storage)
+
+        circuits = {}
+
+        def recurse(module):
+            module_data = module._module_data
+            keep = keep_by_module.get(module, [])
+            for attribute in module_data.attributes:
+                if isinstance(attribute, Keep):
+                    keep.extend(attribute.signal._prims.values())
+            circuits[module] = module_data.circuit.eliminate_dead_logic(keep)
+            for submodule in module_data.submodules:
+                recurse(submodule)
+
+        recurse(module)
+        return circuits
+
     def reset(self, *, _reset_engine=True):
         if _reset_engine:
             self._engine.reset()
 
+        self._reset_threads()
+        self._clocks = []
+
+        self._discover_sim_inits(self._module)
+
+    def _reset_threads(self):
         self._threads = set()
         self._watched_events = {}
+        self._watched_storage = {}
         self._new_events = []
 
         self._old_values = {}
@@ -34,7 +99,7 @@ class SimContext:
         self._potential_changes = OrderedDict()
         self._potential_edges = OrderedDict()
 
-        self._future_events_queue = PriorityQueue()
+        self._scheduler = Scheduler(self._engine.time())
 
         self._pending_threads = OrderedDict()
 
@@ -45,8 +110,6 @@ class SimContext:
         self._idle = False
         self._stop = False
 
-        self._discover_sim_inits(self._module)
-
     def activate(self):
         return context.current().activate_sim_context(self)
 
@@ -124,10 +187,17 @@ class SimContext:
             watchlist = self._watched_events[event] = OrderedDict()
             self._new_events.append(event)
         watchlist[thread] = thread
+        if isinstance(event, PrimChangeEvent):
+            for storage in event.prim.accessed_storage:
+                self._watched_storage[storage] = (
+                    self._watched_storage.get(storage, 0) + 1)
 
     def _unwatch_event(self, event, thread):
         watchlist = self._watched_events[event]
         del watchlist[thread]
+        if isinstance(event, PrimChangeEvent):
+            for storage in event.prim.accessed_storage:
+                self._watched_storage[storage] -= 1
 
     def _trigger_thread(self, thread):
         self._activity = True
@@ -197,7 +267,11 @@ class SimContext:
 
     def _step(self):
         self._activity = False
-        self._trigger_event(TimeEvent(self._engine.time()))
+        time = self._engine.time()
+        for action in self._scheduler.advance(time):
+            action(time)
+        self._activity |= self._engine.step_clocks()
+        self._trigger_event(TimeEvent(time))
         self._step_combinational()
 
         self._shadow = OrderedDict()
@@ -225,19 +299,104 @@ class SimContext:
                     break
                 while self._step():
                     pass
-                try:
-                    next_time = self._future_events_queue.get(block=False)
-                except Empty:
+                next_time = self._scheduler.next_time()
+                clock_time = self._engine.next_clock_time()
+                if next_time is None or (
+                        clock_time is not None and clock_time < next_time):
+                    next_time = clock_time
+                if next_time is None:
                     if timeout:
                         self._engine.advance_time(timeout - engine_time)
                     break
-                step = next_time - engine_time
-                assert step > 0
-                self._engine.advance_time(step)
+                if next_time > engine_time:
+                    self._engine.advance_time(next_time - engine_time)
 
     def stop(self):
         self._stop = True
 
+    def clock(self, target, period, cycle_based=False):
+        self._clocks.append(
+            (target, period, self._engine.time(), cycle_based))
+        self._add_clock(target, period, 0, cycle_based)
+
+    def _add_clock(self, target, period, phase, cycle_based):
+        storage = target._prim().simplify_read()
+        skip_low = None
+        if cycle_based:
+            skip_low = partial(self._clock_unobserved, storage)
+        self._engine.add_clock(storage, period, phase, skip_low=skip_low)
+
+    def _clock_unobserved(self, storage):
+        # Threads waiting for rising edges still see them when the low phase
+        # is skipped, but threads waiting for any change or traces would not.
+        return not (
+            self._watched_storage.get(storage) or self._engine.is_tracing())
+
+    def snapshot(self):
+        """Capture the current simulation state.
+
+        This can only be used between calls to :meth:`run`. Running threads
+        cannot be captured, instead the following re-entry protocol is used:
+
+        When taking a snapshot, the ``sim_snapshot`` method of each module
+        that has one is called and may return a state, which must be
+        picklable to save the snapshot to a file. When restoring a snapshot,
+        all running threads are stopped and the ``sim_restore`` method of each
+        module that has one is started as thread, like ``sim_init`` on reset,
+        passing the state returned by ``sim_snapshot`` or ``None``. As a
+        snapshot can be restored multiple times, ``sim_restore`` must not
+        modify that state. Clocks started using :func:`clock` are restarted
+        automatically, keeping their phase.
+        """
+        if self._pending_threads or self._shadow is not None:
+            raise RuntimeError(
+                'cannot take a snapshot of a running simulation')
+
+        modules = _design_modules(self._module)
+        module_states = {}
+        for i, module in enumerate(modules):
+            try:
+                snapshot_fn = module.sim_snapshot
+            except AttributeError:
+                pass
+            else:
+                module_states[i] = snapshot_fn()
+
+        return SimSnapshot(
+            (modules, self._engine._storage_order),
+            self._engine.get_state(),
+            list(self._clocks),
+            module_states)
+
+    def restore(self, snapshot):
+        """Restore a state captured by :meth:`snapshot`."""
+        modules, storage = snapshot._design
+        if storage != self._engine._storage_order:
+            raise ValueError('snapshot does not match the simulated design')
+
+        self._engine.set_state(snapshot._engine_state)
+        self._reset_threads()
+
+        time = self._engine.time()
+        self._clocks = list(snapshot._clocks)
+        for target, period, start, cycle_based in self._clocks:
+            self._add_clock(
+                target, period, (time - start) % period, cycle_based)
+
+        for i, module in enumerate(modules):
+            try:
+                restore_fn = module.sim_restore
+            except AttributeError:
+                pass
+            else:
+                self.thread(partial(
+                    restore_fn, snapshot._module_states.get(i)))
+
+    def load_snapshot(self, file):
+        """Read a snapshot saved using :meth:`SimSnapshot.save`."""
+        return SimSnapshot.load(
+            file, (_design_modules(self._module), self._engine._storage_order))
+
     def _register_new_events(self):
         for event in self._new_events:
             if isinstance(event, PrimChangeEvent):
@@ -257,7 +416,7 @@ class SimContext:
                     # TODO better exception
                     raise RuntimeError('event is in the past')
                 elif event.timestamp > self._engine.time():
-                    self._future_events_queue.put(event.timestamp)
+                    self._scheduler.schedule(event.timestamp)
         self._new_events.clear()
 
     def _change_callback(self, event, storage):
@@ -337,10 +496,19 @@ class SimContext:
         else:
             self.thread(setup_fn)
 
-    def dump_vcd_trace(self, trace, file):
+    def dump_trace(self, trace, file, format='vcd'):
+        """Dump a trace to a file.
+
+        The format is either ``'vcd'`` or ``'waveform'``, a compressed binary
+        format that can be read using :mod:`rattle.sim.waveform`.
+        """
+        # pylint: disable=redefined-builtin
         if isinstance(file, str):
-            file = open(file, 'w')
-        self._engine.dump_vcd_trace(trace, file)
+            file = open(file, 'wb' if format == 'waveform' else 'w')
+        self._engine.dump_trace(trace, file, format)
+
+    def dump_vcd_trace(self, trace, file):
+        self.dump_trace(trace, file)
 
 
 class SimThread:
@@ -1,23 +1,37 @@
 from collections import OrderedDict
-from ..primitive import PrimIndex, PrimBitIndex, PrimSlice
+from functools import partial
+from ..primitive import PrimIndex, PrimBitIndex, PrimSlice, PrimMux
 from ..bitvec import BitVec, X
 from ..circuit import BlockAssign, BlockCond
+from .levelize import levelize, WorkQueue
+from .memory import Memory
+from .scheduler import Scheduler
 
 
 class SimEngine:
-    def __init__(self, *modules):
+    # Indices with unknown bits that could take more values than this are
+    # not enumerated. Reading evaluates to x and writing sets all entries of
+    # the indexed storage to x.
+    x_index_limit = 1 << 8
+
+    def __init__(self, *modules, circuits=None):
         self._root_modules = modules
+        # Circuits simulated in place of those of the given modules, used to
+        # simulate circuits after dead logic elimination
+        self._module_circuits = circuits or {}
         self._modules = set()
         self._storage_prims = set()
+        self._storage_order = []
 
-        self._assign_queue = OrderedDict()
-        self._combinational_queue = OrderedDict()
-        self._clocked_eval_queue = OrderedDict()
+        self._combinational_queue = WorkQueue()
+        self._clocked_eval_queue = WorkQueue()
 
         self._clocked_assign_queue = OrderedDict()
         self._delayed_assign_queue = OrderedDict()
 
         self._change_enqueues = {}
+        self._combinational_nodes = []
+        self._clocked_nodes = []
         self._user_callbacks = {}
 
         self._initial_blocks = []
@@ -26,26 +40,42 @@ class SimEngine:
 
         self._old_clock_values = {}
 
+        self._aliases = {}
+        self._alias_targets = {}
+
+        circuits = []
         for module in modules:
-            self._add_module_recursive(module)
+            self._add_module_recursive(module, circuits)
+
+        self._find_aliases(circuits)
+
+        for circuit in circuits:
+            self._add_circuit(circuit)
+
+        # Readers of an alias have to be ranked after the writer of its
+        # target
+        self._combinational_queue.ranks = levelize([
+            (key, [self._alias_targets.get(storage, storage)
+                   for storage in inputs], outputs)
+            for key, inputs, outputs in self._combinational_nodes])
 
-        self._vcd_dumps = {}
+        self._trace_dumps = {}
 
         self.reset()
 
     def reset(self):
-        for vcd in self._vcd_dumps.values():
-            vcd.close()
+        for dump in self._trace_dumps.values():
+            dump.close()
 
-        self._vcd_dumps = {}
+        self._trace_dumps = {}
 
         self._values = {
             storage: self._xval(storage)
             for storage in self._storage_prims}
 
         self._time = 0
+        self._clock_scheduler = Scheduler()
 
-        self._assign_queue.clear()
         self._combinational_queue.clear()
         self._clocked_eval_queue.clear()
         self._clocked_assign_queue.clear()
@@ -58,29 +88,21 @@ class SimEngine:
             self._apply_pokes(self._eval_block(block))
 
         for enqueues in self._change_enqueues.values():
-            for queue, callback, params in enqueues:
-                self._enqueue(queue, callback, params)
+            for queue, key in enqueues:
+                queue.push(key)
 
         self.step_combinational()
 
     def time(self):
         return self._time
 
-    @staticmethod
-    def _xval(storage):
-        scalar = BitVec(storage.width, 0, -1)
-
-        def recurse(dimensions):
-            if not dimensions:
-                return scalar
-            else:
-                next_dimensions = dimensions[:-1]
-                return [
-                    recurse(next_dimensions) for _ in range(dimensions[-1])]
-
-        return recurse(storage.dimensions)
+    def _xval(self, storage):
+        # pylint: disable=no-self-use
+        if storage.dimensions:
+            return Memory(storage.width, storage.dimensions)
+        return BitVec(storage.width, 0, -1)
 
-    def _add_module_recursive(self, module):
+    def _add_module_recursive(self, module, circuits):
         if module in self._modules:
             raise RuntimeError('Module already added to simulation engine')
 
@@ -89,52 +111,107 @@ class SimEngine:
         self._modules.add(module)
 
         self._storage_prims.update(module_data.storage_prims)
+        self._storage_order.extend(module_data.storage_prims)
 
-        self._add_circuit(module_data.circuit)
+        circuit = self._module_circuits.get(module)
+        if circuit is None:
+            circuit = module_data.circuit
+            circuit.finalize()
+        circuits.append(circuit)
 
         for submodule in module_data.submodules:
-            self._add_module_recursive(submodule)
+            self._add_module_recursive(submodule, circuits)
+
+    def _find_aliases(self, circuits):
+        # Storage continuously assigned the value of other storage, as done
+        # when connecting ports across the module hierarchy, becomes an alias
+        # of that storage. Instead of evaluating the assignment, changes of
+        # the target are copied to the alias immediately.
+        writers = {}
+        candidates = {}
+        for circuit in circuits:
+            for storage, assignments in circuit.assign.items():
+                writers[storage] = writers.get(storage, 0) + len(assignments)
+                lvalue, rvalue = assignments[0]
+                if (lvalue is storage
+                        and rvalue in self._storage_prims
+                        and not storage.dimensions
+                        and not rvalue.dimensions):
+                    candidates[storage] = rvalue
+            for block in circuit.blocks():
+                for storage in block.storage:
+                    writers[storage] = writers.get(storage, 0) + 1
+            for lvalue, _rvalue in circuit.inout:
+                for storage in lvalue.accessed_storage:
+                    writers[storage] = writers.get(storage, 0) + 1
+
+        for storage, target in candidates.items():
+            if writers[storage] != 1:
+                continue
+            # Follow chains of aliases to the storage holding the value,
+            # ignoring loops of port connections
+            seen = {storage}
+            while target in candidates and writers[target] == 1:
+                if target in seen:
+                    break
+                seen.add(target)
+                target = candidates[target]
+            else:
+                self._add_alias(storage, target)
+
+    def _add_alias(self, alias, target):
+        self._alias_targets[alias] = target
+        self._aliases.setdefault(target, []).append(alias)
 
     def _add_circuit(self, circuit):
         for storage, assignments in circuit.assign.items():
+            if storage in self._alias_targets:
+                continue
             for lvalue, rvalue in assignments:
                 self._add_assign(storage, lvalue, rvalue)
         for storage, block in circuit.combinational.items():
             self._add_combinational(storage, block)
         for clock, block in circuit.clocked.items():
             self._add_clocked(clock, block)
+        for (clock, reset), block in circuit.async_reset.items():
+            self._add_async_reset(clock, reset, block)
 
         for storage, block in circuit.initial.items():
             self._add_initial(storage, block)
 
-        if circuit.async_reset:
-            raise RuntimeError('Simulation of async reset not supported yet')
-
     def _add_assign(self, storage, lvalue, rvalue):
-        enqueue = (
-            self._assign_queue, self._eval_assign,
-            (storage, lvalue, rvalue))
-        for accessed_storage in rvalue.accessed_storage or [None]:
-            enqueues = self._change_enqueues.setdefault(
-                accessed_storage, [])
-
-            enqueues.append(enqueue)
+        self._add_combinational_node(
+            (self._eval_assign, (storage, lvalue, rvalue)),
+            rvalue.accessed_storage, [storage])
 
     def _add_combinational(self, storage, block):
         # pylint: disable=unused-argument
-        enqueue = (
-            self._combinational_queue, self._eval_combinational,
-            block)
-        for accessed_storage in block.accessed_storage or [None]:
-            enqueues = self._change_enqueues.setdefault(accessed_storage, [])
-            enqueues.append(enqueue)
+        self._add_combinational_node(
+            (self._eval_combinational, block),
+            block.accessed_storage, block.storage)
 
-    def _add_clocked(self, clock, block):
-        enqueue = (
-            self._clocked_eval_queue, self._eval_clocked,
-            (clock, block))
+    def _add_combinational_node(self, key, inputs, outputs):
+        self._combinational_nodes.append((key, inputs, outputs))
+        self._add_enqueue(
+            (self._combinational_queue, key), inputs or [None])
 
-        for accessed_storage in clock.accessed_storage:
+    def _add_clocked(self, clock, block):
+        key = (self._eval_clocked, (clock, block))
+        self._clocked_nodes.append(key)
+        self._add_enqueue(
+            (self._clocked_eval_queue, key), clock.accessed_storage)
+
+    def _add_async_reset(self, clock, reset, block):
+        # Evaluated like a clocked block, using the clock and reset pair in
+        # place of the clock
+        key = (self._eval_async_reset, ((clock, reset), block))
+        self._clocked_nodes.append(key)
+        self._add_enqueue(
+            (self._clocked_eval_queue, key),
+            clock.accessed_storage | reset.accessed_storage)
+
+    def _add_enqueue(self, enqueue, sensitivity):
+        for accessed_storage in sensitivity:
             enqueues = self._change_enqueues.setdefault(accessed_storage, [])
             enqueues.append(enqueue)
 
@@ -142,47 +219,99 @@ class SimEngine:
         # pylint: disable=unused-argument
         self._initial_blocks.append(block)
 
-    @staticmethod
-    def _enqueue(queue, callback, params):
-        key = (callback, params)
-        try:
-            queue.move_to_end(key)
-        except KeyError:
-            queue[key] = key
-
     def step_combinational(self):
-        while True:
-            # TODO configurable timeout
-            if self._assign_queue:
-                self._step_queue(self._assign_queue)
-                continue
-            if self._combinational_queue:
-                self._step_queue(self._combinational_queue)
-                continue
-            break
+        # TODO configurable timeout
+        queue = self._combinational_queue
+        while queue:
+            callback, params = queue.pop()
+            callback(params)
 
     def step(self):
         self.step_combinational()
-        while self._clocked_eval_queue:
-            self._step_queue(self._clocked_eval_queue)
+        queue = self._clocked_eval_queue
+        while queue:
+            callback, params = queue.pop()
+            callback(params)
         stepped = bool(
             self._clocked_assign_queue or self._delayed_assign_queue)
-        self._assign_queue.update(self._clocked_assign_queue)
-        self._assign_queue.update(self._delayed_assign_queue)
-        self._clocked_assign_queue.clear()
-        self._delayed_assign_queue.clear()
+        for assign_queue in (
+                self._clocked_assign_queue, self._delayed_assign_queue):
+            pending = list(assign_queue.values())
+            assign_queue.clear()
+            for callback, params in pending:
+                callback(params)
         self.step_combinational()
         return stepped
 
     def advance_time(self, step):
-        for vcd in self._vcd_dumps.values():
-            vcd.update()
+        for dump in self._trace_dumps.values():
+            dump.update()
         self._time += step
 
-    @staticmethod
-    def _step_queue(queue):
-        _key, (callback, parameters) = queue.popitem(last=False)
-        callback(parameters)
+    def add_clock(self, storage, period, phase=0, *, skip_low=None):
+        """Periodically toggle a clock storage.
+
+        The clock is high for the first half of each period and starts at the
+        given phase into a period, setting its level immediately. A clock with
+        a period of one rises at every time and falls again in a separate step
+        at the same time. Clocks are removed on reset and when restoring a
+        state.
+
+        If ``skip_low`` is given, it is called at each rising edge. When it
+        returns true, the low phase of that cycle is skipped. The clock
+        instead falls at the next rising edge, in a separate step just before
+        rising, so that no time step is needed in between.
+        """
+        if period < 1:
+            raise ValueError('clock period must be positive')
+        high_period = period // 2
+        time = self._time
+        level = int(phase < high_period)
+        self._set_clock(storage, level)
+
+        self._clock_scheduler.schedule_periodic(
+            time + (-phase - 1) % period + 1, period,
+            partial(self._rise_clock, storage, high_period, skip_low))
+        if level:
+            self._clock_scheduler.schedule(
+                time + high_period - phase,
+                partial(self._fall_clock, storage))
+
+    def is_tracing(self):
+        """Whether any trace is dumped."""
+        return bool(self._trace_dumps)
+
+    def next_clock_time(self):
+        """Time of the next clock edge or ``None`` without clocks."""
+        return self._clock_scheduler.next_time()
+
+    def step_clocks(self):
+        """Apply clock edges due at the current time.
+
+        Returns whether any clock changed.
+        """
+        actions = self._clock_scheduler.advance(self._time)
+        for action in actions:
+            action(self._time)
+        return bool(actions)
+
+    def _rise_clock(self, storage, high_period, skip_low, time):
+        if skip_low is not None and skip_low():
+            self._set_clock(storage, 0)
+            self._clock_scheduler.schedule(
+                time, partial(self._set_clock, storage, 1))
+        else:
+            self._set_clock(storage, 1)
+            self._clock_scheduler.schedule(
+                time + high_period, partial(self._fall_clock, storage))
+
+    def _fall_clock(self, storage, time):
+        # pylint: disable=unused-argument
+        self._set_clock(storage, 0)
+
+    def _set_clock(self, storage, level, time=None):
+        # pylint: disable=unused-argument
+        self.poke(storage, storage, BitVec(1, level))
 
     def _eval_assign(self, params):
         storage, lvalue, rvalue = params
@@ -203,11 +332,28 @@ class SimEngine:
             pokes = self._eval_block(block)
             self.poke_delayed(pokes)
 
+    def _eval_async_reset(self, params):
+        clocks, block = params
+
+        values = tuple(self.peek(clock)[0] for clock in clocks)
+        old_values = self._old_clock_values.get(clocks, (X, X))
+        self._old_clock_values[clocks] = values
+
+        if any(
+                old_value is False and value is True
+                for old_value, value in zip(old_values, values)):
+            pokes = self._eval_block(block)
+            self.poke_delayed(pokes)
+
     def peek(self, rvalue, indices=()):
         if rvalue in self._storage_prims:
             value = self._values[rvalue]
+            if indices and len(indices) == len(rvalue.dimensions):
+                return value.get(value.offset(indices))
         elif isinstance(rvalue, PrimIndex):
             index = self.peek(rvalue.index)
+            if self._exceeds_x_index_limit(index):
+                return BitVec(rvalue.x.width, 0, -1)
 
             res = None
             index_range = rvalue.x.dimensions[len(indices)]
@@ -221,6 +367,9 @@ class SimEngine:
                 else:
                     res = res.combine(value)
             return res
+        elif (isinstance(rvalue, PrimMux) and
+                self._exceeds_x_index_limit(self.peek(rvalue.index))):
+            return BitVec(rvalue.width, 0, -1)
         else:
             value = rvalue.eval(self.peek)
 
@@ -247,7 +396,9 @@ class SimEngine:
         elif isinstance(lvalue, PrimIndex):
             index = self.peek(lvalue.index)
             index_range = lvalue.x.dimensions[len(indices)]
-            if index.mask != 0:
+            if self._exceeds_x_index_limit(index):
+                self._poke_x(storage, shadow)
+            elif index.mask != 0:
                 for i in index.values():
                     if i >= index_range:
                         self._poke_anywhere(
@@ -278,7 +429,12 @@ class SimEngine:
         elif isinstance(lvalue, PrimBitIndex):
             index = self.peek(lvalue.index)
             index_range = lvalue.x.width
-            if index.mask != 0:
+            if self._exceeds_x_index_limit(index):
+                self.poke(
+                    storage, lvalue.x, rvalue.repeat(lvalue.x.width),
+                    indices=indices,
+                    xpoke=True, shadow=shadow)
+            elif index.mask != 0:
                 for i in index.values():
                     if i >= index_range:
                         self.poke(
@@ -307,6 +463,21 @@ class SimEngine:
         else:
             raise RuntimeError('unexpected lvalue')
 
+    def _exceeds_x_index_limit(self, index):
+        return (
+            index.mask != 0 and
+            1 << bin(index.mask).count('1') > self.x_index_limit)
+
+    def _poke_x(self, storage, shadow):
+        value = self._xval(storage)
+        if shadow is None:
+            self._direct_poke(storage, value, (), None, False)
+        else:
+            # Replaces all earlier writes to the storage within the block
+            for key in [key for key in shadow if key[0] == storage]:
+                del shadow[key]
+            shadow[(storage, ())] = value
+
     def _poke_anywhere(self, storage, lvalue, rvalue, indices, shadow):
         assert isinstance(lvalue, PrimIndex)
         index_range = lvalue.x.dimensions[len(indices)]
@@ -317,31 +488,43 @@ class SimEngine:
                 xpoke=True, shadow=shadow)
 
     def _direct_poke(self, storage, rvalue, indices, bitslice, xpoke):
-        key = storage
-        values = self._values
-
-        for idx in reversed(indices):
-            values = values[key]
-            key = idx
-
-        old_value = values[key]
+        if indices:
+            memory = self._values[storage]
+            offset = memory.offset(indices)
+            old_value = memory.get(offset)
+        else:
+            old_value = self._values[storage]
 
         if bitslice is not None:
             rvalue = old_value.updated_at(bitslice, rvalue)
 
         if xpoke:
             rvalue = rvalue.combine(old_value)
-        values[key] = rvalue
+        if indices:
+            memory.set(offset, rvalue)
+        else:
+            self._values[storage] = rvalue
         if not old_value.same_as(rvalue):
-            for enqueue in self._change_enqueues.get(storage, ()):
-                self._enqueue(*enqueue)
-            for key, callback in self._user_callbacks.get(storage, {}).items():
-                callback(key, storage)
+            self._notify_change(storage)
+
+    def _notify_change(self, storage):
+        for queue, key in self._change_enqueues.get(storage, ()):
+            queue.push(key)
+        for key, callback in self._user_callbacks.get(storage, {}).items():
+            callback(key, storage)
+        for alias in self._aliases.get(storage, ()):
+            self._values[alias] = self._values[storage]
+            self._notify_change(alias)
 
     def _shadow_peek(self, shadow, storage, indices):
         try:
             return shadow[(storage, indices)]
         except KeyError:
+            pass
+        if indices and (storage, ()) in shadow:
+            memory = shadow[(storage, ())]
+            return memory.get(memory.offset(indices))
+        else:
             return self.peek(storage, indices)
 
     def _eval_block(self, block):
@@ -378,12 +561,13 @@ class SimEngine:
             try:
                 value_a = shadow_a[key]
             except KeyError:
-                value_a = self.peek(*key)
+                value_a = self._shadow_peek(shadow_a, *key)
             shadow_a[key] = value_a.combine(value_b)
 
         for key, value_a in shadow_a.items():
             if key not in shadow_b:
-                shadow_a[key] = value_a.combine(self.peek(*key))
+                shadow_a[key] = value_a.combine(
+                    self._shadow_peek(shadow_b, *key))
 
     def _apply_pokes(self, pokes):
         for (storage, indices), rvalue in pokes.items():
@@ -407,8 +591,104 @@ class SimEngine:
         except KeyError:
             return False
 
-    def dump_vcd_trace(self, trace, file):
-        from .vcd import Vcd
-        if trace in self._vcd_dumps:
+    def get_state(self):
+        """Return a copy of the complete simulation state.
+
+        Storage, evaluation callbacks and clocks are referred to by index, so
+        that the state can be pickled and restored into an engine simulating
+        an identical design.
+        """
+        storage_index = {
+            storage: i for i, storage in enumerate(self._storage_order)}
+        combinational_index = {
+            key: i for i, (key, _inputs, _outputs)
+            in enumerate(self._combinational_nodes)}
+        clocked_index = {
+            key: i for i, key in enumerate(self._clocked_nodes)}
+        clock_index = {}
+        for i, (_callback, (clock, _block)) in enumerate(self._clocked_nodes):
+            clock_index.setdefault(clock, i)
+
+        def pokes_state(pokes):
+            return [
+                (storage_index[storage], indices, rvalue)
+                for (storage, indices), rvalue in pokes.items()]
+
+        return dict(
+            time=self._time,
+            values=[
+                self._copy_value(self._values[storage])
+                for storage in self._storage_order],
+            combinational_queue=[
+                combinational_index[key]
+                for key in self._combinational_queue.pending()],
+            clocked_eval_queue=[
+                clocked_index[key]
+                for key in self._clocked_eval_queue.pending()],
+            assign_queues=[
+                [pokes_state(pokes) for _callback, pokes in queue.values()]
+                for queue in (
+                    self._clocked_assign_queue, self._delayed_assign_queue)],
+            old_clock_values={
+                clock_index[clock]: value
+                for clock, value in self._old_clock_values.items()})
+
+    def set_state(self, state):
+        """Restore a simulation state returned by :meth:`get_state`.
+
+        All callbacks are removed, as on reset.
+        """
+        for dump in self._trace_dumps.values():
+            dump.close()
+
+        self._trace_dumps = {}
+        self._user_callbacks.clear()
+
+        self._time = state['time']
+        self._clock_scheduler = Scheduler(self._time)
+        self._values = {
+            storage: self._copy_value(value)
+            for storage, value in zip(self._storage_order, state['values'])}
+
+        def pokes_from_state(pokes_state):
+            return OrderedDict(
+                ((self._storage_order[storage], indices), rvalue)
+                for storage, indices, rvalue in pokes_state)
+
+        self._combinational_queue.clear()
+        for i in state['combinational_queue']:
+            self._combinational_queue.push(self._combinational_nodes[i][0])
+        self._clocked_eval_queue.clear()
+        for i in state['clocked_eval_queue']:
+            self._clocked_eval_queue.push(self._clocked_nodes[i])
+        for assign_queue, queue_state in zip(
+                (self._clocked_assign_queue, self._delayed_assign_queue),
+                state['assign_queues']):
+            assign_queue.clear()
+            for pokes_state in queue_state:
+                assign_queue[object()] = (
+                    self._apply_pokes, pokes_from_state(pokes_state))
+        self._old_clock_values = {
+            self._clocked_nodes[i][1][0]: value
+            for i, value in state['old_clock_values'].items()}
+
+    @staticmethod
+    def _copy_value(value):
+        if isinstance(value, Memory):
+            return value.copy()
+        return value
+
+    def dump_trace(self, trace, file, format='vcd'):
+        # pylint: disable=redefined-builtin
+        if format == 'vcd':
+            from .vcd import Vcd as dump_class
+        elif format == 'waveform':
+            from .waveform import WaveformWriter as dump_class
+        else:
+            raise ValueError('unknown trace format %r' % format)
+        if trace in self._trace_dumps:
             raise RuntimeError('trace is already being dumped')
-        self._vcd_dumps[trace] = Vcd(self, trace, file)
+        self._trace_dumps[trace] = dump_class(self, trace, file)
+
+    def dump_vcd_trace(self, trace, file):
+        self.dump_trace(trace, file)
@@ -0,0 +1,113 @@
+from heapq import heappush, heappop
+from itertools import count
+
+
+def levelize(nodes):
+    """Compute evaluation ranks for a set of combinational nodes.
+
+    Each node is given as a ``(key, inputs, outputs)`` triple, where inputs
+    and outputs are the storage read and written by the node. The returned
+    dict maps each key to a rank such that a node is ranked after all nodes
+    it depends on. Nodes that are part of a combinational loop share the same
+    rank and are evaluated iteratively in the order they become dirty.
+    """
+    readers = {}
+    for i, (_key, inputs, _outputs) in enumerate(nodes):
+        for storage in inputs:
+            readers.setdefault(storage, []).append(i)
+
+    successors = [
+        sorted({
+            reader
+            for storage in outputs
+            for reader in readers.get(storage, ())})
+        for _key, _inputs, outputs in nodes]
+
+    # Iterative version of Tarjan's algorithm, which produces the strongly
+    # connected components in reverse topological order
+    index = [None] * len(nodes)
+    lowlink = [None] * len(nodes)
+    on_stack = [False] * len(nodes)
+    stack = []
+    components = []
+    counter = count()
+
+    def visit(node):
+        index[node] = lowlink[node] = next(counter)
+        stack.append(node)
+        on_stack[node] = True
+
+    for root in range(len(nodes)):
+        if index[root] is not None:
+            continue
+        visit(root)
+        work = [(root, iter(successors[root]))]
+        while work:
+            node, node_successors = work[-1]
+            for successor in node_successors:
+                if index[successor] is None:
+                    visit(successor)
+                    work.append((successor, iter(successors[successor])))
+                    break
+                elif on_stack[successor]:
+                    lowlink[node] = min(lowlink[node], index[successor])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = False
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+
+    ranks = {}
+    for rank, component in enumerate(reversed(components)):
+        for member in component:
+            ranks[nodes[member][0]] = rank
+    return ranks
+
+
+class WorkQueue:
+    """Queue of pending evaluations ordered by rank.
+
+    Keys without an assigned rank are evaluated before all ranked keys. Keys
+    of the same rank are evaluated in the order they were pushed. Pushing an
+    already pending key has no effect.
+    """
+    def __init__(self, ranks=None):
+        self.ranks = {} if ranks is None else ranks
+        self._heap = []
+        self._pending = set()
+        self._counter = count()
+
+    def push(self, key):
+        if key in self._pending:
+            return
+        self._pending.add(key)
+        rank = self.ranks.get(key, -1)
+        heappush(self._heap, (rank, next(self._counter), key))
+
+    def pop(self):
+        _rank, _seq, key = heappop(self._heap)
+        self._pending.remove(key)
+        return key
+
+    def pending(self):
+        """Return the pending keys in the order they would be popped."""
+        return [key for _rank, _seq, key in sorted(self._heap)]
+
+    def clear(self):
+        self._heap.clear()
+        self._pending.clear()
+
+    def __bool__(self):
+        return bool(self._heap)
+
+    def __len__(self):
+        return len(self._heap)
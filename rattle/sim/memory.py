@@ -0,0 +1,161 @@
+"""Compact values of storage with dimensions.
+
+Instead of nested lists of :class:`BitVec` objects, the values and masks of
+all entries are held in flat arrays, using the smallest array type that fits
+the width of an entry. Indexing a :class:`Memory` behaves like indexing the
+nested lists, i.e. the outermost dimension is indexed first, intermediate
+indices return views and the innermost index returns a single entry.
+"""
+from array import array
+
+from ..bitmath import bitmask
+from ..bitvec import BitVec
+
+
+def _typecode(width):
+    for typecode in 'BHILQ':
+        if array(typecode).itemsize * 8 >= width:
+            return typecode
+    return None
+
+
+def _plane(width, size, fill):
+    typecode = _typecode(width)
+    if typecode is None:
+        return [fill] * size
+    return array(typecode, [fill]) * size
+
+
+class Memory:
+    """Values of storage with dimensions.
+
+    Entries are :class:`BitVec` values, unless ``two_state`` is set, in which
+    case no masks are stored and entries are plain ints starting out as zero.
+    """
+    def __init__(self, width, dimensions, *, two_state=False):
+        self.width = width
+        self.dimensions = tuple(dimensions)
+
+        size = 1
+        self.strides = []
+        for dimension in self.dimensions:
+            self.strides.append(size)
+            size *= dimension
+        self.strides = tuple(self.strides)
+        self.size = size
+
+        self.values = _plane(width, size, 0)
+        if two_state:
+            self.masks = None
+        else:
+            self.masks = _plane(width, size, bitmask(width))
+
+    def offset(self, indices):
+        """Offset of the entry at the given indices, innermost first."""
+        offset = 0
+        for index, stride in zip(indices, self.strides):
+            offset += index * stride
+        return offset
+
+    def get(self, offset):
+        if self.masks is None:
+            return self.values[offset]
+        return BitVec(self.width, self.values[offset], self.masks[offset])
+
+    def set(self, offset, value):
+        if self.masks is None:
+            self.values[offset] = value
+        else:
+            self.values[offset] = value.value
+            self.masks[offset] = value.mask
+
+    def copy(self):
+        result = object.__new__(type(self))
+        result.__dict__.update(self.__dict__)
+        result.values = self.values[:]
+        if self.masks is not None:
+            result.masks = self.masks[:]
+        return result
+
+    def same_as(self, other):
+        return self == other
+
+    def combine(self, other):
+        """Entrywise nondeterministic choice, see :meth:`BitVec.combine`."""
+        if other is None:
+            return self
+        result = self.copy()
+        for offset in range(self.size):
+            result.set(offset, self.get(offset).combine(other.get(offset)))
+        return result
+
+    def to_list(self):
+        """The entries as nested lists, like they are indexed."""
+        return _MemoryView(self, 0, len(self.dimensions)).to_list()
+
+    def __eq__(self, other):
+        if not isinstance(other, Memory):
+            return NotImplemented
+        return (
+            self.width == other.width and
+            self.dimensions == other.dimensions and
+            list(self.values) == list(other.values) and
+            (self.masks is None) == (other.masks is None) and
+            (self.masks is None or list(self.masks) == list(other.masks)))
+
+    def __len__(self):
+        return self.dimensions[-1]
+
+    def __getitem__(self, index):
+        if len(self.dimensions) == 1:
+            return self.get(index)
+        return _MemoryView(self, 0, len(self.dimensions))[index]
+
+    def __setitem__(self, index, value):
+        if len(self.dimensions) == 1:
+            self.set(index, value)
+        else:
+            _MemoryView(self, 0, len(self.dimensions))[index] = value
+
+    def __repr__(self):
+        return 'Memory(%i, %r)' % (self.width, self.dimensions)
+
+
+class _MemoryView:
+    def __init__(self, memory, offset, depth):
+        self._memory = memory
+        self._offset = offset
+        self._depth = depth
+
+    def _entry_offset(self, index):
+        depth = self._depth - 1
+        if not 0 <= index < self._memory.dimensions[depth]:
+            raise IndexError('memory index out of range')
+        return self._offset + index * self._memory.strides[depth]
+
+    def __len__(self):
+        return self._memory.dimensions[self._depth - 1]
+
+    def __getitem__(self, index):
+        offset = self._entry_offset(index)
+        if self._depth == 1:
+            return self._memory.get(offset)
+        return _MemoryView(self._memory, offset, self._depth - 1)
+
+    def __setitem__(self, index, value):
+        offset = self._entry_offset(index)
+        if self._depth == 1:
+            self._memory.set(offset, value)
+        else:
+            view = _MemoryView(self._memory, offset, self._depth - 1)
+            for i, item in enumerate(value):
+                view[i] = item
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def to_list(self):
+        if self._depth == 1:
+            return list(self)
+        return [item.to_list() for item in self]
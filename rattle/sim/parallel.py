@@ -0,0 +1,204 @@
+"""Running many independent simulations in parallel processes.
+
+Each job constructs a testbench module and runs a :class:`SimContext` for it.
+Jobs are distributed over a pool of worker processes. A worker constructs each
+distinct testbench, identified by its constructor and arguments, only once and
+runs every job in a forked child process, so that all jobs start from the same
+freshly elaborated design and a job exceeding its timeout can be killed.
+
+This requires :func:`os.fork` and thus a POSIX system.
+"""
+import multiprocessing
+import os
+import pickle
+import select
+import signal
+import time
+import traceback
+
+from .context import SimContext
+from .trace import Trace
+
+
+class SimJob:
+    """A testbench simulation to run using :func:`run_parallel`.
+
+    The testbench is constructed by calling ``constructor(*args, **kwds)``.
+    The constructor and the arguments have to be picklable and the arguments
+    also hashable. The simulation is run using
+    ``SimContext(testbench, **options).run(*run_args, **run_kwds)``. A
+    ``timeout`` in seconds of wall time overrides the one passed to
+    :func:`run_parallel`.
+    """
+    def __init__(
+            self, constructor, args=(), kwds=None, *, name=None,
+            options=None, run_args=(), run_kwds=None, timeout=None):
+        self.constructor = constructor
+        self.args = tuple(args)
+        self.kwds = dict(kwds or {})
+        self.name = name
+        self.options = dict(options or {})
+        self.run_args = tuple(run_args)
+        self.run_kwds = dict(run_kwds or {})
+        self.timeout = timeout
+
+    def design_key(self):
+        """Jobs with equal keys share an elaborated testbench."""
+        kwd_items = tuple(sorted(self.kwds.items()))
+        return (
+            self.constructor, self.args, kwd_items,
+            tuple(type(arg) for arg in self.args),
+            tuple(type(value) for _name, value in kwd_items))
+
+
+class SimJobResult:
+    """Outcome of a :class:`SimJob`.
+
+    The ``status`` is ``'passed'``, ``'failed'`` when elaborating the testbench
+    or the simulation raised an exception, ``'timeout'`` when the job was
+    killed after its timeout or ``'crashed'`` when its process ended without a
+    result. For failed jobs ``error`` contains the formatted traceback.
+    ``reused`` tells whether the testbench was elaborated for an earlier job in
+    the same worker.
+    """
+    def __init__(self, index, name, status, *, error=None, duration=None,
+                 vcd_path=None, reused=False):
+        self.index = index
+        self.name = name
+        self.status = status
+        self.error = error
+        self.duration = duration
+        self.vcd_path = vcd_path
+        self.reused = reused
+
+    @property
+    def passed(self):
+        return self.status == 'passed'
+
+    def __repr__(self):
+        return 'SimJobResult(%r, %r)' % (self.name, self.status)
+
+
+def run_parallel(jobs, *, processes=None, timeout=None, vcd_dir=None):
+    """Run simulation jobs in parallel, yielding results as they complete.
+
+    The results are :class:`SimJobResult` objects, in order of completion.
+    Their ``index`` refers to the position of the job in ``jobs``. The number
+    of worker processes defaults to the number of CPUs. When ``vcd_dir`` is
+    given, each job dumps a trace of all named signals of its testbench to a
+    VCD file in that directory, named after the job.
+    """
+    if not hasattr(os, 'fork'):
+        raise RuntimeError('parallel simulation requires os.fork')
+
+    jobs = list(jobs)
+    tasks = []
+    for index, job in enumerate(jobs):
+        name = job.name if job.name is not None else 'job%i' % index
+        vcd_path = None
+        if vcd_dir is not None:
+            vcd_path = os.path.join(vcd_dir, '%s.vcd' % name)
+        job_timeout = job.timeout if job.timeout is not None else timeout
+        tasks.append((index, name, job, job_timeout, vcd_path))
+
+    # Jobs sharing a testbench are submitted next to each other, making it
+    # likely that they are run by a worker that already elaborated it
+    key_order = {}
+    for task in tasks:
+        key_order.setdefault(task[2].design_key(), len(key_order))
+    tasks.sort(key=lambda task: key_order[task[2].design_key()])
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = max(1, min(processes, len(tasks)))
+
+    pool = multiprocessing.get_context('fork').Pool(processes)
+    try:
+        yield from pool.imap_unordered(_run_task, tasks)
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+# Testbench last elaborated by this worker process, by design key. Tasks are
+# sorted by design key, so earlier testbenches are unlikely to be reused.
+_designs = {}
+
+
+def _run_task(task):
+    index, name, job, timeout, vcd_path = task
+    key = job.design_key()
+    reused = key in _designs
+    if not reused:
+        _designs.clear()
+        try:
+            _designs[key] = job.constructor(*job.args, **job.kwds)
+        except Exception:  # pylint: disable=broad-except
+            # A failing elaboration must not abort the other jobs
+            return SimJobResult(
+                index, name, 'failed', error=traceback.format_exc())
+    testbench = _designs[key]
+
+    start = time.monotonic()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        _run_child(testbench, job, vcd_path, write_fd)
+
+    os.close(write_fd)
+    data = _read_result(read_fd, pid, timeout)
+    duration = time.monotonic() - start
+
+    result = SimJobResult(
+        index, name, 'crashed',
+        duration=duration, vcd_path=vcd_path, reused=reused)
+    if data is None:
+        result.status = 'timeout'
+    elif data:
+        result.status, result.error = pickle.loads(data)
+    return result
+
+
+def _run_child(testbench, job, vcd_path, write_fd):
+    # The forked child must never return into the worker's code
+    try:
+        try:
+            ctx = SimContext(testbench, **job.options)
+            if vcd_path is not None:
+                trace = Trace()
+                testbench.trace(trace)
+                ctx.dump_vcd_trace(trace, vcd_path)
+            try:
+                ctx.run(*job.run_args, **job.run_kwds)
+            finally:
+                ctx.reset()
+            outcome = ('passed', None)
+        except BaseException:  # pylint: disable=broad-except
+            outcome = ('failed', traceback.format_exc())
+        with os.fdopen(write_fd, 'wb') as result_file:
+            pickle.dump(outcome, result_file)
+    finally:
+        os._exit(0)  # pylint: disable=protected-access
+
+
+def _read_result(read_fd, pid, timeout):
+    """Read the child's result, returning ``None`` if it timed out."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    chunks = []
+    with os.fdopen(read_fd, 'rb') as result_file:
+        while True:
+            remaining = None
+            if deadline is not None:
+                remaining = max(0, deadline - time.monotonic())
+            ready, _, _ = select.select([result_file], [], [], remaining)
+            if not ready:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+                return None
+            chunk = os.read(read_fd, 65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    os.waitpid(pid, 0)
+    return b''.join(chunks)
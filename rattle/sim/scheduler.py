@@ -0,0 +1,108 @@
+"""Scheduling of future simulation times."""
+import heapq
+
+
+class Scheduler:
+    """Timestamps at which the simulation has to step.
+
+    Each timestamp is stored only once, no matter how often it is scheduled.
+    Timestamps less than ``wheel_size`` ahead of the current time are kept in
+    the buckets of a timing wheel, later ones in a heap. Periodic actions are
+    called when stepping to one of their times and rescheduled by their
+    period.
+    """
+    def __init__(self, time=0, wheel_size=64):
+        self._time = time
+        self._wheel_size = wheel_size
+        # Each bucket is either None or the list of periodic actions due at the
+        # only timestamp in the wheel's range mapping to the bucket.
+        self._wheel = [None] * wheel_size
+        self._wheel_count = 0
+        self._heap = []
+        self._far = {}
+
+    def schedule(self, timestamp, action=None):
+        """Schedule a step at ``timestamp``.
+
+        If an action is given, it is called with the scheduler's time as
+        argument when stepping to that time, see :meth:`advance`.
+        """
+        if timestamp < self._time:
+            raise ValueError('cannot schedule a time in the past')
+        if timestamp - self._time < self._wheel_size:
+            index = timestamp % self._wheel_size
+            actions = self._wheel[index]
+            if actions is None:
+                actions = self._wheel[index] = []
+                self._wheel_count += 1
+        else:
+            try:
+                actions = self._far[timestamp]
+            except KeyError:
+                actions = self._far[timestamp] = []
+                heapq.heappush(self._heap, timestamp)
+        if action is not None:
+            actions.append(action)
+
+    def schedule_periodic(self, timestamp, period, action):
+        """Call ``action`` at ``timestamp`` and then every ``period``."""
+        if period <= 0:
+            raise ValueError('period must be positive')
+
+        def periodic(time):
+            self.schedule(time + period, periodic)
+            action(time)
+
+        self.schedule(timestamp, periodic)
+
+    def time(self):
+        return self._time
+
+    def next_time(self):
+        """The earliest scheduled timestamp or ``None`` if there is none."""
+        if self._wheel_count:
+            index = self._time % self._wheel_size
+            for offset in range(self._wheel_size):
+                if self._wheel[index] is not None:
+                    return self._time + offset
+                index += 1
+                if index == self._wheel_size:
+                    index = 0
+        if self._heap:
+            return self._heap[0]
+        return None
+
+    def advance(self, timestamp):
+        """Step to ``timestamp`` and return the actions due at that time.
+
+        No scheduled timestamp may be skipped. The returned actions still have
+        to be called, in order, passing the new time.
+        """
+        next_time = self.next_time()
+        if timestamp < self._time or (
+                next_time is not None and timestamp > next_time):
+            raise ValueError('cannot skip scheduled times')
+
+        self._time = timestamp
+
+        # Far timestamps that are now in range of the wheel move into it. The
+        # buckets they map to belonged to skipped times and thus are empty.
+        heap = self._heap
+        while heap and heap[0] - timestamp < self._wheel_size:
+            far_time = heapq.heappop(heap)
+            self._wheel[far_time % self._wheel_size] = self._far.pop(far_time)
+            self._wheel_count += 1
+
+        return self._take(timestamp)
+
+    def _take(self, timestamp):
+        index = timestamp % self._wheel_size
+        actions = self._wheel[index]
+        if actions is None:
+            return []
+        self._wheel[index] = None
+        self._wheel_count -= 1
+        return actions
+
+    def __bool__(self):
+        return bool(self._wheel_count or self._heap)
@@ -0,0 +1,47 @@
+from ..design import _DesignPickler, _DesignUnpickler
+
+
+class SimSnapshot:
+    """Saved state of a simulation, see :meth:`SimContext.snapshot`.
+
+    A snapshot can be written to a file using :meth:`save` and read back using
+    :meth:`SimContext.load_snapshot` of a context simulating an identical
+    design, e.g. in a different process.
+    """
+    def __init__(self, design, engine_state, clocks, module_states):
+        self._design = design
+        self._engine_state = engine_state
+        self._clocks = clocks
+        self._module_states = module_states
+
+    def save(self, file):
+        if isinstance(file, str):
+            with open(file, 'wb') as f:
+                return self.save(f)
+
+        modules, storage = self._design
+        pickler = _DesignPickler(file, modules, storage)
+        pickler.dump((
+            _design_signature(modules, storage),
+            self._engine_state,
+            self._clocks,
+            self._module_states))
+
+    @classmethod
+    def load(cls, file, design):
+        if isinstance(file, str):
+            with open(file, 'rb') as f:
+                return cls.load(f, design)
+
+        modules, storage = design
+        unpickler = _DesignUnpickler(file, modules, storage)
+        signature, engine_state, clocks, module_states = unpickler.load()
+        if signature != _design_signature(modules, storage):
+            raise ValueError('snapshot does not match the simulated design')
+        return cls(design, engine_state, clocks, module_states)
+
+
+def _design_signature(modules, storage):
+    return (
+        [type(module).__qualname__ for module in modules],
+        [(prim.width, prim.dimensions) for prim in storage])
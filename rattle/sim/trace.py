@@ -1,3 +1,4 @@
+from collections import OrderedDict
 from ..signal import Signal
 from ..error import SignalNotTraceable
 
@@ -51,3 +52,71 @@ class Trace:
         if len(modules) != 1:
             raise RuntimeError('could not determine module for traced signal')
         return next(iter(modules))
+
+
+class TraceDump:
+    """Base class for writers dumping a trace of an engine.
+
+    Tracks which traced signals changed using the change notifications of the
+    engine. Subclasses write the initial values and the changes at each
+    timestamp.
+    """
+    def __init__(self, engine, trace):
+        self._engine, self._trace = engine, trace
+
+        self._prims = OrderedDict()
+        self._dependents = {}
+
+        for _scope, _name, prim in trace._traces:
+            if prim in self._prims:
+                continue
+            self._prims[prim] = None
+            for storage in prim.accessed_storage:
+                self._dependents.setdefault(storage, []).append(prim)
+
+        for storage in self._dependents:
+            engine.add_callback(storage, self, self._change_callback)
+
+        self._values = {}
+        self._changed = {}
+        self._time = None
+
+    def update(self):
+        time = self._engine.time()
+        if self._time is None:
+            self._time = time
+            for prim in self._prims:
+                self._values[prim] = self._engine.peek(prim)
+            self._changed.clear()
+            self._write_initial(time)
+            return
+
+        changes = []
+        for prim in self._changed:
+            value = self._engine.peek(prim)
+            if not value.same_as(self._values[prim]):
+                self._values[prim] = value
+                changes.append(prim)
+        self._changed.clear()
+
+        if changes:
+            self._time = time
+            self._write_changes(time, changes)
+
+    def close(self):
+        self.update()
+        self._write_end(self._engine.time())
+
+    def _change_callback(self, key, storage):
+        # pylint: disable=unused-argument
+        for prim in self._dependents[storage]:
+            self._changed[prim] = None
+
+    def _write_initial(self, time):
+        raise NotImplementedError
+
+    def _write_changes(self, time, changes):
+        raise NotImplementedError
+
+    def _write_end(self, time):
+        raise NotImplementedError
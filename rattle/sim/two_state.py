@@ -0,0 +1,597 @@
+from collections import OrderedDict
+
+from ..bitmath import bitmask, bitrepeat
+from ..bitvec import BitVec
+from ..circuit import BlockAssign, BlockCond
+from ..error import UnexpectedXValue
+from ..primitive import *
+from ..visitor import visitor
+from .compiled import CompiledSimEngine, SimCompiler, _FunctionGen
+from .memory import Memory
+
+
+class TwoStateSimEngine(CompiledSimEngine):
+    """Simulation engine without tracking of unknown values.
+
+    All storage holds plain ints and starts out as zero. Sources of ``x``
+    values, i.e. ``x`` constants, out of range indices and pokes of ``x``
+    values, evaluate to zero instead. If ``check_x`` is set, an
+    :class:`UnexpectedXValue` error is raised whenever an ``x`` value would
+    have been produced. Assignments of an ``x`` default value within a block
+    only raise if they are not overwritten later in the same block.
+
+    The public peek and poke methods still operate on :class:`BitVec` values.
+    Storage that isn't driven by the circuit, as well as storage
+    combinationally derived from it, peeks as ``x`` until it is poked. This
+    keeps clock edges at the start of a simulation the same as in four-state
+    simulation.
+    """
+    def __init__(self, *modules, check_x=False, circuits=None):
+        self._check_x = check_x
+        self._resetting = False
+        self._driven = set()
+        self._dependents = {}
+        self._unpoked = set()
+        super().__init__(*modules, circuits=circuits)
+
+    def _make_compiler(self):
+        return TwoStateSimCompiler(self)
+
+    def _add_combinational_node(self, key, inputs, outputs):
+        self._driven.update(outputs)
+        node = (inputs, outputs)
+        for storage in inputs:
+            self._dependents.setdefault(storage, []).append(node)
+        super()._add_combinational_node(key, inputs, outputs)
+
+    def _add_alias(self, alias, target):
+        self._driven.add(alias)
+        self._dependents.setdefault(target, []).append(([target], [alias]))
+        super()._add_alias(alias, target)
+
+    def _add_clocked(self, clock, block):
+        self._driven.update(block.storage)
+        super()._add_clocked(clock, block)
+
+    def _add_async_reset(self, clock, reset, block):
+        self._driven.update(block.storage)
+        super()._add_async_reset(clock, reset, block)
+
+    def _add_initial(self, storage, block):
+        self._driven.update(block.storage)
+        super()._add_initial(storage, block)
+
+    def reset(self):
+        self._unpoked = set()
+        stack = list(self._storage_prims - self._driven)
+        while stack:
+            storage = stack.pop()
+            if storage in self._unpoked:
+                continue
+            self._unpoked.add(storage)
+            for _inputs, outputs in self._dependents.get(storage, ()):
+                stack.extend(outputs)
+
+        # Storage starting out as zero doesn't count as clock edge source
+        self._resetting = True
+        try:
+            super().reset()
+        finally:
+            self._resetting = False
+
+    def get_state(self):
+        state = super().get_state()
+        state['unpoked'] = [
+            i for i, storage in enumerate(self._storage_order)
+            if storage in self._unpoked]
+        return state
+
+    def set_state(self, state):
+        super().set_state(state)
+        self._unpoked = set(
+            self._storage_order[i] for i in state['unpoked'])
+
+    def _xval(self, storage):
+        # pylint: disable=no-self-use
+        if storage.dimensions:
+            return Memory(storage.width, storage.dimensions, two_state=True)
+        return 0
+
+    def _x_produced(self, source):
+        if self._check_x:
+            raise UnexpectedXValue(
+                'simulation produced an x value for %r' % (source,))
+
+    def _eval_clocked(self, params):
+        if self._resetting:
+            return
+
+        clock, block = params
+
+        clock_value = self._peek_value(clock)
+        old_clock_value = self._old_clock_values.get(clock)
+        self._old_clock_values[clock] = clock_value
+
+        if old_clock_value == 0 and clock_value == 1:
+            pokes = self._eval_block(block)
+            self.poke_delayed(pokes)
+
+    def _eval_async_reset(self, params):
+        if self._resetting:
+            return
+
+        clocks, block = params
+
+        values = tuple(self._peek_value(clock) for clock in clocks)
+        old_values = self._old_clock_values.get(clocks, (None, None))
+        self._old_clock_values[clocks] = values
+
+        if any(
+                old_value == 0 and value == 1
+                for old_value, value in zip(old_values, values)):
+            pokes = self._eval_block(block)
+            self.poke_delayed(pokes)
+
+    def peek(self, rvalue, indices=()):
+        if rvalue in self._unpoked:
+            return BitVec(rvalue.width, 0, -1)
+        return BitVec(rvalue.width, self._peek_value(rvalue, indices))
+
+    def _peek_value(self, rvalue, indices=()):
+        if rvalue in self._storage_prims:
+            value = self._values[rvalue]
+            if indices and len(indices) == len(rvalue.dimensions):
+                return value.values[value.offset(indices)]
+            for idx in reversed(indices):
+                value = value[idx]
+            return value
+        elif isinstance(rvalue, PrimIndex):
+            index = self._peek_value(rvalue.index)
+            if index >= rvalue.x.dimensions[len(indices)]:
+                self._x_produced(rvalue)
+                return 0
+            return self._peek_value(rvalue.x, indices + (index,))
+        elif isinstance(rvalue, PrimTable):
+            return self._peek_value(
+                rvalue.table[indices[-1]], indices[:-1])
+        elif isinstance(rvalue, PrimReg):
+            return self._peek_value(rvalue.simplify_read(), indices)
+        assert not indices
+        try:
+            peek_fn = self._peek_fns[rvalue]
+        except KeyError:
+            peek_fn = self._peek_fns[rvalue] = (
+                self._compiler.compile_peek(rvalue))
+        return peek_fn()
+
+    def poke(
+            self, storage, lvalue, rvalue, *,
+            indices=(), bitslice=None, xpoke=False, shadow=None):
+        if rvalue.mask or xpoke:
+            self._x_produced(lvalue)
+        self._poke_value(
+            storage, lvalue, rvalue.value,
+            indices=indices, bitslice=bitslice, shadow=shadow)
+
+    def _mark_poked(self, storage):
+        unpoked = self._unpoked
+        poked = []
+        stack = [storage]
+        while stack:
+            storage = stack.pop()
+            if storage not in unpoked:
+                continue
+            unpoked.remove(storage)
+            poked.append(storage)
+            for inputs, outputs in self._dependents.get(storage, ()):
+                if any(
+                        output in unpoked and output not in inputs
+                        for output in outputs) and not any(
+                            i in unpoked and i not in outputs
+                            for i in inputs):
+                    stack.extend(
+                        output for output in outputs if output in unpoked)
+
+        # The storage itself is notified by the caller and aliases are notified
+        # along with their targets
+        marked = set(poked)
+        for storage in poked[1:]:
+            if self._alias_targets.get(storage) not in marked:
+                self._notify_change(storage)
+
+    def _poke_value(
+            self, storage, lvalue, value, *,
+            indices=(), bitslice=None, shadow=None):
+        if lvalue in self._storage_prims:
+            assert storage == lvalue
+            if shadow is None:
+                self._direct_poke(storage, value, indices, bitslice, False)
+            else:
+                if bitslice is not None:
+                    old_value = self._shadow_peek(shadow, lvalue, indices)
+                    value = _updated_at(old_value, *bitslice, value)
+                shadow[(storage, indices)] = value
+        elif isinstance(lvalue, PrimIndex):
+            index = self._peek_value(lvalue.index)
+            if index >= lvalue.x.dimensions[len(indices)]:
+                self._x_produced(lvalue)
+            else:
+                self._poke_value(
+                    storage, lvalue.x, value,
+                    indices=indices + (index,), bitslice=bitslice,
+                    shadow=shadow)
+        elif isinstance(lvalue, PrimSlice):
+            self._poke_value(
+                storage, lvalue.x, value,
+                indices=indices, bitslice=(lvalue.start, lvalue.width),
+                shadow=shadow)
+        elif isinstance(lvalue, PrimBitIndex):
+            index = self._peek_value(lvalue.index)
+            if index >= lvalue.x.width:
+                self._x_produced(lvalue)
+            else:
+                self._poke_value(
+                    storage, lvalue.x, value,
+                    indices=indices, bitslice=(index, 1), shadow=shadow)
+        else:
+            raise RuntimeError('unexpected lvalue')
+
+    def _direct_poke(self, storage, rvalue, indices, bitslice, xpoke):
+        assert not xpoke
+        if indices:
+            values = self._values[storage].values
+            key = self._values[storage].offset(indices)
+        else:
+            values = self._values
+            key = storage
+
+        old_value = values[key]
+
+        if bitslice is not None:
+            rvalue = _updated_at(old_value, *bitslice, rvalue)
+
+        # Once a value is stored, peeking no longer returns x, so the first
+        # stored value is a change even if it's the zero stored before
+        first = storage in self._unpoked
+        if first:
+            self._mark_poked(storage)
+
+        if old_value != rvalue or first:
+            values[key] = rvalue
+            self._notify_change(storage)
+
+    def _eval_value(self, rvalue):
+        value = rvalue.eval(self.peek)
+        if value.mask:
+            self._x_produced(rvalue)
+        return value.value
+
+    def _shadow_peek(self, shadow, storage, indices):
+        try:
+            return shadow[(storage, indices)]
+        except KeyError:
+            return self._peek_value(storage, indices)
+
+
+def _updated_at(value, pos, width, update):
+    return (value & ~(bitmask(width) << pos)) | (update << pos)
+
+
+class TwoStateSimCompiler(SimCompiler):
+    def compile_block(self, block):
+        gen = self.function_gen('block')
+        gen.line('shadow = OrderedDict()')
+        if self.engine._check_x:
+            gen.line('shadow_x = set()')
+        gen.statements(block.assignments)
+        if self.engine._check_x:
+            with gen.branch('if shadow_x:'):
+                gen.line('x_produced(shadow_x.pop())')
+        gen.line('return shadow')
+        return gen.build()
+
+    def compile_peek(self, rvalue):
+        gen = self.function_gen('peek')
+        gen.line('return %s' % gen.expr(rvalue))
+        return gen.build()
+
+    def namespace(self):
+        engine = self.engine
+        return {
+            'engine': engine,
+            'OrderedDict': OrderedDict,
+            'notify': engine._notify_change,
+            'poke_value': engine._poke_value,
+            'peek_value': engine._peek_value,
+            'eval_value': engine._eval_value,
+            'shadow_peek': engine._shadow_peek,
+            'x_produced': engine._x_produced,
+        }
+
+    def function_gen(self, kind):
+        return _TwoStateFunctionGen(self, kind)
+
+
+class _TwoStateFunctionGen(_FunctionGen):
+    # pylint: disable=function-redefined
+    def statements(self, assignments):
+        for statement in assignments:
+            if isinstance(statement, BlockAssign):
+                self.store(
+                    statement.storage, statement.lvalue, statement.rvalue,
+                    shadow=True)
+            elif isinstance(statement, BlockCond):
+                with self.branch('if %s:' % self.expr(statement.condition)):
+                    self.statements(statement.true)
+                with self.branch('else:'):
+                    self.statements(statement.false)
+            else:
+                assert False
+
+    def store(self, storage, lvalue, rvalue, shadow):
+        check_x = self.compiler.engine._check_x
+        x_default = isinstance(rvalue, PrimConst) and rvalue.value.mask != 0
+        if x_default:
+            value = '%#x' % rvalue.value.value
+        else:
+            value = self.expr(rvalue)
+
+        target = lvalue
+        bitslice = None
+        if isinstance(target, PrimSlice):
+            keep_mask = bitmask(storage.width) ^ (
+                bitmask(target.width) << target.start)
+            bitslice = (target.start, keep_mask)
+            target = target.x
+
+        indices = []
+        while isinstance(target, PrimIndex):
+            indices.append((self.expr(target.index), target.index.width,
+                            target.x.dimensions[-1]))
+            target = target.x
+
+        storage_ref = self.ref(storage)
+
+        if not shadow:
+            if x_default and check_x:
+                self.line('x_produced(%s)' % self.ref(lvalue))
+            if lvalue is storage:
+                old = self.tmp()
+                self.line('%s = values[%s]' % (old, storage_ref))
+                with self.branch('if %s != %s:' % (old, value)):
+                    self.line('values[%s] = %s' % (storage_ref, value))
+                    self.line('notify(%s)' % storage_ref)
+            else:
+                self.line('poke_value(%s, %s, %s)' % (
+                    storage_ref, self.ref(lvalue), value))
+            return
+
+        if target is not storage:
+            if x_default and check_x:
+                self.line('x_produced(%s)' % self.ref(lvalue))
+            self.line('poke_value(%s, %s, %s, shadow=shadow)' % (
+                storage_ref, self.ref(lvalue), value))
+            return
+
+        checks = []
+        for index_value, index_width, index_range in indices:
+            if index_range < 1 << index_width:
+                checks.append('%s < %i' % (index_value, index_range))
+
+        key = '(%s, (%s))' % (storage_ref, ''.join(
+            '%s, ' % index_value for index_value, _, _ in indices))
+
+        if checks:
+            with self.branch('if %s:' % ' and '.join(checks)):
+                self._store_shadow_value(
+                    storage_ref, key, bitslice, value, x_default, check_x)
+            with self.branch('else:'):
+                self.line('x_produced(%s)' % self.ref(lvalue))
+        else:
+            self._store_shadow_value(
+                storage_ref, key, bitslice, value, x_default, check_x)
+
+    def _store_shadow_value(
+            self, storage_ref, key, bitslice, value, x_default, check_x):
+        if check_x:
+            if x_default:
+                self.line('shadow_x.add(%s)' % key)
+            elif bitslice is None:
+                self.line('shadow_x.discard(%s)' % key)
+        if bitslice is not None:
+            old = self.tmp()
+            self.line('%s = shadow_peek(shadow, %s, %s[1])' % (
+                old, storage_ref, key))
+            start, keep_mask = bitslice
+            value = '(%s & %#x) | (%s << %i)' % (
+                old, keep_mask, value, start)
+        self.line('shadow[%s] = %s' % (key, value))
+
+    def fallback_peek(self, prim):
+        value = self.tmp('v')
+        self.line('%s = peek_value(%s)' % (value, self.ref(prim)))
+        return value
+
+    def assign(self, value_expr):
+        value = self.tmp('v')
+        self.line('%s = %s' % (value, value_expr))
+        return value
+
+    def x_source(self, prim):
+        if self.compiler.engine._check_x:
+            self.line('x_produced(%s)' % self.ref(prim))
+
+    @visitor
+    def _expr(self, prim):
+        return self.assign('eval_value(%s)' % self.ref(prim))
+
+    @_expr.on(PrimStorage)
+    def _expr(self, prim):
+        if prim.dimensions:
+            return self.fallback_peek(prim)
+        return self.assign('values[%s]' % self.ref(prim))
+
+    @_expr.on(PrimReg)
+    def _expr(self, prim):
+        return self.expr(prim.simplify_read())
+
+    @_expr.on(PrimConst)
+    def _expr(self, prim):
+        if prim.value.mask:
+            self.x_source(prim)
+        return '%#x' % prim.value.value
+
+    @_expr.on(PrimIndex)
+    def _expr(self, prim):
+        indices = []
+        target = prim
+        while isinstance(target, PrimIndex):
+            indices.append(target)
+            target = target.x
+        if not isinstance(target, PrimStorage) or prim.dimensions:
+            return self.fallback_peek(prim)
+
+        checks = []
+        index_values = []
+        for index_prim in indices:
+            index_value = self.expr(index_prim.index)
+            index_range = index_prim.x.dimensions[-1]
+            if index_range < 1 << index_prim.index.width:
+                checks.append('%s < %i' % (index_value, index_range))
+            index_values.append(index_value)
+        access = '.values[%s]' % self.memory_offset(target, index_values)
+
+        if not checks:
+            return self.assign('values[%s]%s' % (self.ref(target), access))
+
+        value = self.tmp('v')
+        with self.branch('if %s:' % ' and '.join(checks)):
+            self.line('%s = values[%s]%s' % (
+                value, self.ref(target), access))
+        with self.branch('else:'):
+            self.x_source(prim)
+            self.line('%s = 0' % value)
+        return value
+
+    @_expr.on(PrimNot)
+    def _expr(self, prim):
+        return self.assign('%s ^ %#x' % (
+            self.expr(prim.x), bitmask(prim.width)))
+
+    @_expr.on(PrimConcat)
+    def _expr(self, prim):
+        parts = []
+        offset = 0
+        for part in prim.parts:
+            value = self.expr(part)
+            if offset:
+                value = '(%s << %i)' % (value, offset)
+            parts.append(value)
+            offset += part.width
+        return self.assign(' | '.join(parts) or '0')
+
+    def _binary(self, prim, fmt):
+        return self.assign(fmt % (self.expr(prim.a), self.expr(prim.b)))
+
+    @_expr.on(PrimAnd)
+    def _expr(self, prim):
+        return self._binary(prim, '%s & %s')
+
+    @_expr.on(PrimOr)
+    def _expr(self, prim):
+        return self._binary(prim, '%s | %s')
+
+    @_expr.on(PrimXor)
+    def _expr(self, prim):
+        return self._binary(prim, '%s ^ %s')
+
+    @_expr.on(PrimAdd)
+    def _expr(self, prim):
+        return self._binary(prim, '(%%s + %%s) & %#x' % bitmask(prim.width))
+
+    @_expr.on(PrimSub)
+    def _expr(self, prim):
+        return self._binary(prim, '(%%s - %%s) & %#x' % bitmask(prim.width))
+
+    @_expr.on(PrimMul)
+    def _expr(self, prim):
+        return self._binary(prim, '(%%s * %%s) & %#x' % bitmask(prim.width))
+
+    @_expr.on(PrimEq)
+    def _expr(self, prim):
+        return self._binary(prim, 'int(%s == %s)')
+
+    @_expr.on(PrimLt)
+    def _expr(self, prim):
+        return self._binary(prim, 'int(%s < %s)')
+
+    @_expr.on(PrimSignedLt)
+    def _expr(self, prim):
+        sign_bit = 1 << (prim.a.width - 1)
+        return self._binary(
+            prim, 'int((%%s ^ %#x) < (%%s ^ %#x))' % (sign_bit, sign_bit))
+
+    @_expr.on(PrimShiftLeft)
+    def _expr(self, prim):
+        value, shift = self.expr(prim.x), self.expr(prim.shift)
+        return self.assign('(%s << %s) & %#x if %s < %i else 0' % (
+            value, shift, bitmask(prim.width), shift, prim.width))
+
+    @_expr.on(PrimShiftRight)
+    def _expr(self, prim):
+        return self.assign('%s >> %s' % (
+            self.expr(prim.x), self.expr(prim.shift)))
+
+    @_expr.on(PrimArithShiftRight)
+    def _expr(self, prim):
+        sign_bit = 1 << (prim.width - 1)
+        return self.assign('(((%s ^ %#x) - %#x) >> %s) & %#x' % (
+            self.expr(prim.x), sign_bit, sign_bit, self.expr(prim.shift),
+            bitmask(prim.width)))
+
+    @_expr.on(PrimZeroExt)
+    def _expr(self, prim):
+        return self.expr(prim.x)
+
+    @_expr.on(PrimSignExt)
+    def _expr(self, prim):
+        sign_bit = 1 << (prim.x.width - 1)
+        return self.assign('((%s ^ %#x) - %#x) & %#x' % (
+            self.expr(prim.x), sign_bit, sign_bit, bitmask(prim.width)))
+
+    @_expr.on(PrimSlice)
+    def _expr(self, prim):
+        return self.assign('(%s >> %i) & %#x' % (
+            self.expr(prim.x), prim.start, bitmask(prim.width)))
+
+    @_expr.on(PrimRepeat)
+    def _expr(self, prim):
+        return self.assign('%s * %#x' % (
+            self.expr(prim.x), bitrepeat(prim.count, prim.x.width, 1)))
+
+    @_expr.on(PrimBitIndex)
+    def _expr(self, prim):
+        value, index = self.expr(prim.x), self.expr(prim.index)
+        if prim.x.width >= 1 << prim.index.width:
+            return self.assign('(%s >> %s) & 1' % (value, index))
+        result = self.tmp('v')
+        with self.branch('if %s < %i:' % (index, prim.x.width)):
+            self.line('%s = (%s >> %s) & 1' % (result, value, index))
+        with self.branch('else:'):
+            self.x_source(prim)
+            self.line('%s = 0' % result)
+        return result
+
+    @_expr.on(PrimMux)
+    def _expr(self, prim):
+        index = self.expr(prim.index)
+        ports = '(%s,)' % ', '.join(self.expr(port) for port in prim.ports)
+        if len(prim.ports) >= 1 << prim.index.width:
+            return self.assign('%s[%s]' % (ports, index))
+        result = self.tmp('v')
+        with self.branch('if %s < %i:' % (index, len(prim.ports))):
+            self.line('%s = %s[%s]' % (result, ports, index))
+        with self.branch('else:'):
+            self.x_source(prim)
+            self.line('%s = 0' % result)
+        return result
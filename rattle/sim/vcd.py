@@ -1,55 +1,96 @@
-class Vcd:
+from itertools import count
+from .trace import TraceDump
+
+
+def _vcd_id(index):
+    # Shortest identifiers using the printable ASCII range '!' to '~'
+    chars = []
+    while True:
+        index, digit = divmod(index, 94)
+        chars.append(chr(33 + digit))
+        if not index:
+            break
+        index -= 1
+    return ''.join(chars)
+
+
+def _write_vcd_header(write, variables):
+    write('$version rattle sim $end\n')
+    write('$timescale 1ns $end\n')  # TODO don't hardcode this
+    for scope, name, width, vcd_id in variables:
+        for scope_type, scope_name in scope:
+            write('$scope %s %s $end\n' % (scope_type, scope_name))
+        if width > 1:
+            name = '%s[%i:0]' % (name, width - 1)
+        write('$var wire %i %s %s $end\n' % (width, vcd_id, name))
+        for _scope_type, _scope_name in scope:
+            write('$upscope $end\n')
+
+    write('$enddefinitions $end\n')
+
+
+def _vcd_value(value, vcd_id):
+    if value.width == 1:
+        return '%s%s\n' % (value, vcd_id)
+    else:
+        return 'b%s %s\n' % (value, vcd_id)
+
+
+class Vcd(TraceDump):
+    """Writes a VCD trace of an engine.
+
+    Only values that changed since the last timestamp are written.
+    """
+    buffer_size = 1 << 16
+
     def __init__(self, engine, trace, file):
-        self._engine, self._trace, self._file = engine, trace, file
+        super().__init__(engine, trace)
+        self._file = file
 
-        self._vcd_ids = {}
+        vcd_ids = map(_vcd_id, count())
+        self._vcd_ids = {prim: next(vcd_ids) for prim in self._prims}
 
-        for _scope, _name, prim in self._trace._traces:
-            if prim not in self._vcd_ids:
-                # TODO more compact encoding of vcd ids
-                self._vcd_ids[prim] = '%i' % len(self._vcd_ids)
+        self._buffer = []
+        self._buffered = 0
 
         self._write_header()
 
-    def update(self):
-        # TODO dump incrementally
-        self._write_time()
-        self._dumpvars()
-
     def close(self):
-        self.update()
+        super().close()
+        self._flush()
         self._file.close()
 
+    def _write(self, data):
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self.buffer_size:
+            self._flush()
+
+    def _flush(self):
+        self._file.write(''.join(self._buffer))
+        self._buffer.clear()
+        self._buffered = 0
+
     def _write_header(self):
-        self._file.write('$version rattle sim $end\n')
-        self._file.write('$timescale 1ns $end\n')  # TODO don't hardcode this
-        for scope, name, prim in self._trace._traces:
-            for scope_type, scope_name in scope:
-                self._file.write(
-                    '$scope %s %s $end\n' % (scope_type, scope_name))
-            width = prim.width
-            if width > 1:
-                name = '%s[%i:0]' % (name, width - 1)
-            vcd_id = self._vcd_ids[prim]
-            self._file.write(
-                '$var wire %i %s %s $end\n' % (width, vcd_id, name))
-            for _scope_type, _scope_name in scope:
-                self._file.write('$upscope $end\n')
-
-        self._file.write('$enddefinitions $end\n')
-
-    def _write_time(self):
-        self._file.write('#%i\n' % self._engine.time())
-
-    def _dumpvars(self):
-        self._file.write('$dumpvars\n')
+        _write_vcd_header(self._write, (
+            (scope, name, prim.width, self._vcd_ids[prim])
+            for scope, name, prim in self._trace._traces))
+
+    def _write_initial(self, time):
+        self._write('#%i\n' % time)
+        self._write('$dumpvars\n')
         for prim, vcd_id in self._vcd_ids.items():
-            value = self._engine.peek(prim)
-            self._dumpvar(vcd_id, value)
-        self._file.write('$end\n')
+            self._dumpvar(vcd_id, self._values[prim])
+        self._write('$end\n')
+
+    def _write_changes(self, time, changes):
+        self._write('#%i\n' % time)
+        for prim in changes:
+            self._dumpvar(self._vcd_ids[prim], self._values[prim])
+
+    def _write_end(self, time):
+        if time != self._time:
+            self._write('#%i\n' % time)
 
     def _dumpvar(self, vcd_id, value):
-        if value.width == 1:
-            self._file.write('%s%s\n' % (value, vcd_id))
-        else:
-            self._file.write('b%s %s\n' % (value, vcd_id))
+        self._write(_vcd_value(value, vcd_id))
@@ -0,0 +1,285 @@
+"""Chunked, compressed binary waveform traces.
+
+A waveform file starts with a header listing the traced signals, followed by
+zlib compressed chunks of value changes and an index of all chunks. Each
+chunk starts with the values of all signals, so that reading a time window
+only needs to decode the chunks overlapping it.
+
+Traces are written by dumping with ``format='waveform'`` and read using
+:func:`open`::
+
+    with waveform.open('trace.wave') as wave:
+        for time, value in wave.signal('fifo.count').values(100, 200):
+            ...
+"""
+from bisect import bisect_right
+import io
+import json
+import struct
+import zlib
+
+from ..bitvec import BitVec
+from .trace import TraceDump
+from .vcd import _vcd_id, _vcd_value, _write_vcd_header
+
+
+_MAGIC = b'RTLWAVE1'
+_INDEX_ENTRY = struct.Struct('<QQQQ')
+_TRAILER = struct.Struct('<QQQ8s')
+
+
+def _write_varint(data, value):
+    while value >= 0x80:
+        data.append((value & 0x7f) | 0x80)
+        value >>= 7
+    data.append(value)
+
+
+def _read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class WaveformWriter(TraceDump):
+    """Writes a waveform trace of an engine."""
+    chunk_size = 1 << 20
+
+    def __init__(self, engine, trace, file):
+        super().__init__(engine, trace)
+        self._file = file
+
+        self._signal_index = {
+            prim: i for i, prim in enumerate(self._prims)}
+
+        self._chunk = bytearray()
+        self._chunk_start = None
+        self._chunk_end = None
+        self._index = []
+
+        self._write_header()
+
+    def close(self):
+        super().close()
+        self._file.close()
+
+    def _write_header(self):
+        header = json.dumps(dict(
+            signals=[prim.width for prim in self._prims],
+            traces=[
+                [scope, name, self._signal_index[prim]]
+                for scope, name, prim in self._trace._traces],
+        )).encode()
+        self._file.write(_MAGIC)
+        self._file.write(struct.pack('<Q', len(header)))
+        self._file.write(header)
+        self._offset = len(_MAGIC) + 8 + len(header)
+
+    def _write_initial(self, time):
+        self._write_record(time, self._prims)
+
+    def _write_changes(self, time, changes):
+        if not self._chunk:
+            # Chunks start with all values, making them independent
+            changes = self._prims
+        self._write_record(time, changes)
+
+    def _write_record(self, time, prims):
+        chunk = self._chunk
+        if self._chunk_start is None:
+            self._chunk_start = time
+        self._chunk_end = time
+
+        _write_varint(chunk, time - self._chunk_start)
+        _write_varint(chunk, len(prims))
+        for prim in prims:
+            value = self._values[prim]
+            _write_varint(chunk, self._signal_index[prim])
+            _write_varint(chunk, value.value)
+            _write_varint(chunk, value.mask)
+
+        if len(chunk) >= self.chunk_size:
+            self._write_chunk()
+
+    def _write_chunk(self):
+        if not self._chunk:
+            return
+        data = zlib.compress(bytes(self._chunk))
+        self._file.write(data)
+        self._index.append(
+            (self._chunk_start, self._chunk_end, self._offset, len(data)))
+        self._offset += len(data)
+        self._chunk = bytearray()
+        self._chunk_start = None
+
+    def _write_end(self, time):
+        self._write_chunk()
+        for entry in self._index:
+            self._file.write(_INDEX_ENTRY.pack(*entry))
+        self._file.write(_TRAILER.pack(
+            self._offset, len(self._index), time, _MAGIC))
+
+
+class Waveform:
+    """A waveform trace opened for reading, see :func:`open`."""
+    def __init__(self, file):
+        if isinstance(file, str):
+            file = io.open(file, 'rb')
+        self._file = file
+
+        if file.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError('not a rattle waveform file')
+        header_size, = struct.unpack('<Q', file.read(8))
+        header = json.loads(file.read(header_size).decode())
+        self._widths = header['signals']
+        self._traces = [
+            ([tuple(part) for part in scope], name, index)
+            for scope, name, index in header['traces']]
+
+        self._names = {}
+        for scope, name, index in self._traces:
+            full_name = '.'.join(
+                [scope_name for _scope_type, scope_name in scope] + [name])
+            self._names.setdefault(full_name, index)
+
+        file.seek(-_TRAILER.size, io.SEEK_END)
+        index_offset, chunk_count, self.end_time, magic = _TRAILER.unpack(
+            file.read(_TRAILER.size))
+        if magic != _MAGIC:
+            raise ValueError('incomplete rattle waveform file')
+        file.seek(index_offset)
+        self._index = [
+            _INDEX_ENTRY.unpack(file.read(_INDEX_ENTRY.size))
+            for _ in range(chunk_count)]
+        self._chunk_starts = [start for start, *_ in self._index]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    @property
+    def signals(self):
+        """Names of all traced signals."""
+        return list(self._names)
+
+    def signal(self, name):
+        try:
+            index = self._names[name]
+        except KeyError:
+            raise KeyError('no traced signal named %r' % name) from None
+        return WaveformSignal(self, name, index, self._widths[index])
+
+    def records(self, start=0, end=None):
+        """Iterate over the changes between two times.
+
+        Yields ``(time, changes)`` pairs where changes is a list of
+        ``(signal_index, value, mask)`` tuples. The first chunk yielded may
+        begin before ``start``.
+        """
+        first = max(bisect_right(self._chunk_starts, start) - 1, 0)
+        for chunk_start, _chunk_end, offset, size in self._index[first:]:
+            if end is not None and chunk_start > end:
+                return
+            self._file.seek(offset)
+            data = zlib.decompress(self._file.read(size))
+            pos = 0
+            while pos < len(data):
+                time, pos = _read_varint(data, pos)
+                time += chunk_start
+                if end is not None and time > end:
+                    return
+                change_count, pos = _read_varint(data, pos)
+                changes = []
+                for _ in range(change_count):
+                    index, pos = _read_varint(data, pos)
+                    value, pos = _read_varint(data, pos)
+                    mask, pos = _read_varint(data, pos)
+                    changes.append((index, value, mask))
+                yield time, changes
+
+    def to_vcd(self, file):
+        """Convert the waveform to a VCD trace."""
+        if isinstance(file, str):
+            with io.open(file, 'w') as f:
+                return self.to_vcd(f)
+
+        vcd_ids = list(map(_vcd_id, range(len(self._widths))))
+        _write_vcd_header(file.write, (
+            (scope, name, self._widths[index], vcd_ids[index])
+            for scope, name, index in self._traces))
+
+        values = {}
+        last_time = None
+        for time, changes in self.records():
+            lines = []
+            for index, value, mask in changes:
+                value = BitVec(self._widths[index], value, mask)
+                old_value = values.get(index)
+                if old_value is None or not old_value.same_as(value):
+                    values[index] = value
+                    lines.append(_vcd_value(value, vcd_ids[index]))
+            if last_time is None:
+                file.write('#%i\n$dumpvars\n%s$end\n' % (time, ''.join(lines)))
+            elif lines:
+                file.write('#%i\n%s' % (time, ''.join(lines)))
+            last_time = time
+        if last_time != self.end_time:
+            file.write('#%i\n' % self.end_time)
+
+
+class WaveformSignal:
+    """A single signal of a :class:`Waveform`."""
+    def __init__(self, waveform, name, index, width):
+        self._waveform = waveform
+        self.name = name
+        self._index = index
+        self.width = width
+
+    def __repr__(self):
+        return 'WaveformSignal(%r)' % self.name
+
+    def values(self, start=0, end=None):
+        """Iterate over the values of the signal between two times.
+
+        Yields ``(time, value)`` pairs, starting with the value at ``start``
+        followed by all changes up to and including ``end``.
+        """
+        previous = None
+        started = False
+        for time, changes in self._waveform.records(start, end):
+            for index, value, mask in changes:
+                if index != self._index:
+                    continue
+                value = BitVec(self.width, value, mask)
+                if time <= start:
+                    previous = value
+                    continue
+                if not started:
+                    started = True
+                    if previous is not None:
+                        yield start, previous
+                if previous is not None and value.same_as(previous):
+                    continue
+                previous = value
+                yield time, value
+        if not started and previous is not None:
+            yield start, previous
+
+
+def open(file):  # pylint: disable=redefined-builtin
+    """Open a waveform trace for reading."""
+    return Waveform(file)
+
+
+__all__ = ['open', 'Waveform', 'WaveformSignal', 'WaveformWriter']
@@ -47,6 +47,13 @@ class SimSource(Module):
         self._update()
         sim.always_on(self.clk, self._sim_clk)
 
+    def sim_snapshot(self):
+        return list(self._items)
+
+    def sim_restore(self, items):
+        self._items = deque(items)
+        sim.always_on(self.clk, self._sim_clk)
+
     def _sim_clk(self):
         if self.source.active.value is True:
             self._items.popleft()
@@ -86,6 +93,13 @@ class SimSink(Module):
         self.run[:] = True
         sim.always_on(self.clk, self._sim_clk)
 
+    def sim_snapshot(self):
+        return None if self.items is None else list(self.items)
+
+    def sim_restore(self, items):
+        self.items = None if items is None else list(items)
+        sim.always_on(self.clk, self._sim_clk)
+
     def _sim_clk(self):
         if self.sink.active.value is True:
             payload = self.sink.payload.peek()
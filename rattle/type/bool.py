@@ -13,6 +13,9 @@ class BoolType(BasicType):
     def __repr__(self):
         return "Bool"
 
+    def __reduce__(self):
+        return 'Bool'
+
     @property
     def _signature_tuple(self):
         return (type(self),)
@@ -1,3 +1,4 @@
+import hashlib
 import io
 import os
 from itertools import product
@@ -6,10 +7,11 @@ from pathlib import Path
 
 from ..attribute import (
     SimulationOnly, DoNotGenerate, ModuleName,
-    VerilogParameters, VerilogSignalAttribute)
+    VerilogParameters, VerilogSignalAttribute, Keep)
 from ..circuit import BlockAssign, BlockCond
 from ..primitive import PrimIndex
 from ..visitor import visitor
+from .digest import ModuleDigest, UnsupportedModule
 from .templates import VerilogTemplates
 
 
@@ -27,14 +29,19 @@ def _mark_last(i):
 
 class ModuleSources:
     def __init__(self):
+        # Generated sources by module name
         self.sources = OrderedDict()
         self.names = set()
+        # Module names and the names within modules by (type, module digest)
+        self.modules = {}
+        # Module names by (type, source digest)
+        self.source_digests = {}
 
 
 class Verilog(VerilogTemplates):
     # pylint: disable=function-redefined
 
-    def __init__(self, module, module_sources=None):
+    def __init__(self, module, module_sources=None, cache=None):
         # TODO make this adjustable / include parameters
         self.module = module
         self.module_data = module._module_data
@@ -48,7 +55,9 @@ class Verilog(VerilogTemplates):
         self.do_not_generate = False
         self.parameters = None
         self.signal_attributes = {}
+        self.keep = []
         self.unique_module_name = True
+        self.cache = cache
         if module_sources is None:
             self.module_sources = ModuleSources()
         else:
@@ -65,16 +74,30 @@ class Verilog(VerilogTemplates):
                 'verilog parameters are not supported for generated modules')
 
         self._process_submodules()
-        self.circuit.finalize()
-        self._prepare()
-        self._emit()
+        self.circuit = self.circuit.eliminate_dead_logic(self.keep)
+
+        try:
+            self.digest = ModuleDigest(self)
+        except UnsupportedModule:
+            self.digest = None
+            self.cache = None
+
+        if self._find_identical_module():
+            return
+
+        if self.cache is None or not self.cache.load(self.digest, self):
+            self._prepare()
+            self._emit()
+            if self.cache is not None:
+                self.cache.store(self.digest, self)
+
         self._store()
 
     def write_to_dir(self, path):
         path = Path(path)
         path.mkdir(exist_ok=True)
         paths = set()
-        for ((_type, source), name) in self.module_sources.sources.items():
+        for name, source in self.module_sources.sources.items():
             # TODO handle invalid filenames
             source_path = path / ('%s.v' % name)
             paths.add(source_path)
@@ -125,11 +148,16 @@ class Verilog(VerilogTemplates):
             prim = prim.simplify_read()
             attributes = self.signal_attributes.setdefault(prim, [])
             attributes.append(attribute.attribute)
+            self.keep.append(prim)
+
+    @_attribute.on(Keep)
+    def _attribute(self, attribute):
+        self.keep.extend(attribute.signal._prims.values())
 
     def _process_submodules(self):
         for submodule in self.module_data.submodules:
             self.submodule_verilogs[submodule] = Verilog(
-                submodule, self.module_sources)
+                submodule, self.module_sources, self.cache)
 
     def _prepare(self):
         self.io_vecs = [
@@ -138,7 +166,8 @@ class Verilog(VerilogTemplates):
 
         self.non_io_storage = [
             prim for prim in self.module_data.storage_prims
-            if prim.direction is None]
+            if prim.direction is None
+            and prim not in self.circuit.removed_storage]
 
         self.submodule_io = []
 
@@ -197,6 +226,11 @@ class Verilog(VerilogTemplates):
             self._prepare_expr(clock, named=True)
             self._prepare_block(block)
 
+        for (clock, reset), block in self.circuit.async_reset.items():
+            self._prepare_expr(clock, named=True)
+            self._prepare_expr(reset, named=True)
+            self._prepare_block(block)
+
         if self.reg_storage & self.wire_storage:
             raise RuntimeError(
                 'storage cannot be wire and reg at the same time')
@@ -302,9 +336,6 @@ class Verilog(VerilogTemplates):
         self._emit_combinational()
         self._emit_clocked()
 
-        if self.circuit.async_reset:
-            raise RuntimeError('async reset not implemented yet')
-
         self.indent -= 1
         self._writeln('endmodule')
 
@@ -540,17 +571,27 @@ class Verilog(VerilogTemplates):
             self._writeln()
 
     def _emit_clocked(self):
-        if not self.circuit.clocked:
+        if not (self.circuit.clocked or self.circuit.async_reset):
             return
         self._writeln('// clocked processes')
         for clock, block in self.circuit.clocked.items():
             clock_name = self.names.name_prim(clock)
             self._writeln('always @ (posedge ', clock_name, ') begin')
-            self.indent += 1
-            self._emit_block_assignments(block.assignments)
-            self.indent -= 1
-            self._writeln('end')
-            self._writeln()
+            self._emit_clocked_block(block)
+        for (clock, reset), block in self.circuit.async_reset.items():
+            clock_name = self.names.name_prim(clock)
+            reset_name = self.names.name_prim(reset)
+            self._writeln(
+                'always @ (posedge ', clock_name,
+                ' or posedge ', reset_name, ') begin')
+            self._emit_clocked_block(block)
+
+    def _emit_clocked_block(self, block):
+        self.indent += 1
+        self._emit_block_assignments(block.assignments)
+        self.indent -= 1
+        self._writeln('end')
+        self._writeln()
 
     def _emit_block_assignments(self, assignments):
         for assignment in assignments:
@@ -607,19 +648,38 @@ class Verilog(VerilogTemplates):
         if parens:
             self._write(parens[1])
 
+    def _find_identical_module(self):
+        if self.digest is None:
+            return False
+        try:
+            name, names_entry = self.module_sources.modules[
+                type(self.module), self.digest.digest]
+        except KeyError:
+            return False
+        self.digest.restore_names(self, names_entry)
+        self.module_data.module_name = name
+        self.source = self.module_sources.sources[name]
+        return True
+
     def _store(self):
-        source_id = (type(self.module), self.source)
+        # Structurally different modules can still generate the same source
+        source_id = (
+            type(self.module),
+            hashlib.sha256(self.source.encode()).digest())
         try:
             self.module_data.module_name = (
-                self.module_sources.sources[source_id])
-            return
+                self.module_sources.source_digests[source_id])
         except KeyError:
-            pass
-
-        self._find_unique_name()
-
-        self.module_sources.sources[source_id] = (
-            self.module_data.module_name)
+            self._find_unique_name()
+            name = self.module_data.module_name
+            self.module_sources.source_digests[source_id] = name
+            self.module_sources.sources[name] = self.source
+
+        if self.digest is not None:
+            self.module_sources.modules[
+                type(self.module), self.digest.digest] = (
+                    self.module_data.module_name,
+                    self.digest.names_entry(self))
 
     def _find_unique_name(self):
         unique_name = self.module_data.module_name
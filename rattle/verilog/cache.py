@@ -0,0 +1,82 @@
+"""Persistent cache of generated verilog modules.
+
+Generated sources are stored in a directory, one file per module, keyed by
+the module's :class:`ModuleDigest`. Besides the source, an entry contains the
+names assigned while generating it, which are restored on a hit, so that paths
+of signals can be computed as if the module was generated.
+"""
+import json
+import os
+import tempfile
+from pathlib import Path
+
+
+class VerilogCache:
+    """Cache of generated verilog modules in ``directory``.
+
+    When the cached entries exceed ``max_size`` bytes, :meth:`evict` removes
+    the least recently used ones.
+    """
+    def __init__(self, directory, max_size=64 << 20):
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, digest, verilog):
+        """Restore the source and names of a module, if cached."""
+        path = self._path(digest)
+        try:
+            with path.open('r') as file:
+                entry = json.load(file)
+        except (FileNotFoundError, ValueError):
+            self.misses += 1
+            return False
+
+        try:
+            os.utime(str(path))
+        except FileNotFoundError:
+            pass
+
+        digest.restore_names(verilog, entry)
+        verilog.source = entry['source']
+        self.hits += 1
+        return True
+
+    def store(self, digest, verilog):
+        entry = digest.names_entry(verilog)
+        entry['source'] = verilog.source
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Written to a temporary file first, so concurrent builds never see
+        # partial entries
+        fd, temp_path = tempfile.mkstemp(
+            dir=str(self.directory), suffix='.tmp')
+        with os.fdopen(fd, 'w') as file:
+            json.dump(entry, file)
+        os.replace(temp_path, str(self._path(digest)))
+
+    def evict(self):
+        """Remove least recently used entries exceeding the size bound."""
+        entries = []
+        total_size = 0
+        for path in self.directory.glob('*.json'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_size += stat.st_size
+
+        entries.sort(key=lambda entry: entry[0])
+        for _mtime, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+    def _path(self, digest):
+        return self.directory / ('%s.json' % digest.digest)
@@ -0,0 +1,194 @@
+"""Structural digests of modules prepared for verilog generation.
+
+A digest covers everything the generated source of a module depends on: the
+module's storage and IO, its circuit after dead logic elimination, the names
+used in it and the names, parameters and ports of its submodules' generated
+modules. It does not cover the module's own generated module name. Modules
+with equal digests generate the same source.
+
+Primitives are numbered in order of first occurrence, so digests don't depend
+on the identity of storage primitives and are stable across processes.
+"""
+import hashlib
+from pathlib import Path
+
+from ..circuit import BlockAssign, BlockCond
+from ..primitive import PrimSignal, PrimStorage
+
+
+class UnsupportedModule(Exception):
+    """The module refers to storage of modules other than its submodules."""
+
+
+def _hash_emitter_sources():
+    digest = hashlib.sha256()
+    for name in ('__init__.py', 'templates.py'):
+        digest.update((Path(__file__).parent / name).read_bytes())
+    return digest.hexdigest()
+
+
+_emitter_version = _hash_emitter_sources()
+
+
+class ModuleDigest:
+    """Digest of the module of a :class:`Verilog` object.
+
+    The ``prims`` list contains all primitives occurring in the module, in the
+    order of their numbering.
+    """
+    def __init__(self, verilog):
+        module_data = verilog.module_data
+        self.prims = []
+        self._ids = {}
+        self._definitions = []
+        self._owners = {verilog.module: 'module'}
+        for index, submodule in enumerate(module_data.submodules):
+            self._owners[submodule] = index
+
+        circuit = verilog.circuit
+        names = verilog.names
+
+        data = (
+            _emitter_version,
+            self._prim_list(module_data.io_prims),
+            self._prim_list(module_data.storage_prims),
+            [
+                self._submodule(submodule, verilog)
+                for submodule in module_data.submodules],
+            self._mapping(circuit.assign, self._assignments),
+            self._mapping(circuit.combinational, self._block),
+            self._mapping(circuit.clocked, self._block),
+            self._mapping(circuit.async_reset, self._block),
+            self._mapping(circuit.sync_reset, self._block),
+            self._mapping(circuit.initial, self._block),
+            [self._prim_list(pair) for pair in circuit.inout],
+            self._prim_set(circuit.keep),
+            self._prim_set(circuit.removed_storage),
+            self._mapping(verilog.signal_attributes, list),
+            self._mapping(names.prim_to_name, str),
+            sorted(names.used_names),
+        )
+
+        self.digest = hashlib.sha256(
+            repr((data, self._definitions)).encode()).hexdigest()
+
+    def prim_id(self, prim):
+        try:
+            return self._ids[prim]
+        except KeyError:
+            pass
+
+        if isinstance(prim, PrimStorage):
+            try:
+                owner = self._owners[prim.module]
+            except KeyError:
+                raise UnsupportedModule(
+                    'storage %r of unrelated module %r' % (prim, prim.module))
+            definition = (
+                'storage', owner, prim.direction, prim.width, prim.dimensions)
+        else:
+            definition = (
+                type(prim).__name__, prim.shape,
+                self._value(prim.tuple()))
+
+        prim_id = self._ids[prim] = len(self.prims)
+        self.prims.append(prim)
+        self._definitions.append(definition)
+        return prim_id
+
+    def __contains__(self, prim):
+        return prim in self._ids
+
+    def names_entry(self, verilog):
+        """The names assigned to the module's primitives and submodules."""
+        names = verilog.names
+        return {
+            'names': [
+                (self._ids[prim], name)
+                for prim, name in names.prim_to_name.items()
+                if prim in self._ids],
+            'used_names': sorted(names.used_names),
+            'instances': [
+                names.module_to_name[submodule]
+                for submodule in verilog.module_data.submodules],
+        }
+
+    def restore_names(self, verilog, entry):
+        """Assign the names of another module with the same digest."""
+        names = verilog.names
+        for prim_id, name in entry['names']:
+            names.prim_to_name[self.prims[prim_id]] = name
+        names.used_names.update(entry['used_names'])
+        for submodule, name in zip(
+                verilog.module_data.submodules, entry['instances']):
+            names.module_to_name[submodule] = name
+            submodule._module_data.instance_name = name
+
+    def _value(self, value, prim_fn=None):
+        if prim_fn is None:
+            prim_fn = self.prim_id
+        if isinstance(value, PrimSignal):
+            return ('prim', prim_fn(value))
+        elif isinstance(value, (tuple, list)):
+            return tuple(self._value(item, prim_fn) for item in value)
+        return value
+
+    def _structure(self, prim):
+        try:
+            return self._ids[prim]
+        except KeyError:
+            pass
+        if isinstance(prim, PrimStorage):
+            return ('storage', id(prim))
+        return (
+            type(prim).__name__, prim.shape,
+            self._value(prim.tuple(), self._structure))
+
+    def _prim_list(self, prims):
+        return [self.prim_id(prim) for prim in prims]
+
+    def _prim_set(self, prims):
+        # Unnumbered members are numbered in an order independent of the
+        # set's iteration order
+        new_prims = [prim for prim in prims if prim not in self._ids]
+        new_prims.sort(key=lambda prim: repr(self._structure(prim)))
+        for prim in new_prims:
+            self.prim_id(prim)
+        return sorted(self._ids[prim] for prim in prims)
+
+    def _mapping(self, mapping, value_fn):
+        return [
+            (self._value(key), value_fn(value))
+            for key, value in mapping.items()]
+
+    def _assignments(self, assignments):
+        return [self._prim_list(assignment) for assignment in assignments]
+
+    def _block(self, block):
+        return (
+            self._block_assignments(block.assignments),
+            self._prim_set(block.storage))
+
+    def _block_assignments(self, assignments):
+        result = []
+        for assignment in assignments:
+            if isinstance(assignment, BlockAssign):
+                result.append(('assign', self._prim_list(assignment)))
+            elif isinstance(assignment, BlockCond):
+                result.append((
+                    'cond', self.prim_id(assignment.condition),
+                    self._block_assignments(assignment.true),
+                    self._block_assignments(assignment.false)))
+            else:
+                assert False
+        return result
+
+    def _submodule(self, submodule, verilog):
+        submodule_data = submodule._module_data
+        return (
+            verilog.names.module_to_name.get(submodule),
+            submodule_data.module_name,
+            verilog.submodule_verilogs[submodule].parameters,
+            [
+                (self.prim_id(port), submodule_data.names.name_prim(port))
+                for port in submodule_data.io_prims])
@@ -1,37 +1,60 @@
+import functools
+
 # TODO support inheritance for the visiting class?
 
 
 class Visitor:
     def __init__(self):
         self._handlers = {}
+        # Handlers by type of target, and for super calls by the type passed
+        self._cache = {}
+        self._super_cache = {}
 
     def on(self, target_type):
         return lambda fn: self._add_handler(target_type, fn)
 
     def _add_handler(self, target_type, fn):
         self._handlers[target_type] = fn
+        self._cache.clear()
+        self._super_cache.clear()
         return self
 
     def __get__(self, obj, objtype):
-        def dispatch(target, *args, **kwds):
-            return self._dispatch(
-                type(target).__mro__, obj, target, *args, **kwds)
-
-        def dispatch_super(target_type, target, *args, **kwds):
-            return self._dispatch(
-                target_type.__mro__[1:], obj, target, *args, **kwds)
+        return _BoundVisitor(self.dispatch, obj)
 
-        dispatch.super = dispatch_super
+    def dispatch(self, obj, target, *args, **kwds):
+        try:
+            handler = self._cache[type(target)]
+        except KeyError:
+            handler = self._cache[type(target)] = self._lookup(
+                type(target).__mro__)
+        return handler(obj, target, *args, **kwds)
 
-        return dispatch
+    def dispatch_super(self, obj, target_type, target, *args, **kwds):
+        try:
+            handler = self._super_cache[target_type]
+        except KeyError:
+            handler = self._super_cache[target_type] = self._lookup(
+                target_type.__mro__[1:])
+        return handler(obj, target, *args, **kwds)
 
-    def _dispatch(self, mro, obj, target, *args, **kwds):
+    def _lookup(self, mro):
         for target_type in mro:
             handler = self._handlers.get(target_type)
             if handler is not None:
-                break
+                return handler
         # This should always terminate due to having a handler for object
-        return handler(obj, target, *args, **kwds)
+        assert False
+
+
+class _BoundVisitor(functools.partial):
+    # Created on each attribute access, like a bound method, while the
+    # handler caches stay on the visitor
+    __slots__ = ()
+
+    def super(self, target_type, target, *args, **kwds):
+        owner, obj = self.func.__self__, self.args[0]
+        return owner.dispatch_super(obj, target_type, target, *args, **kwds)
 
 
 def visitor(fn):
@@ -10,12 +10,16 @@ setup(
     install_requires=[
         'lxml',
     ],
+    extras_require={
+        'batch': ['numpy'],
+    },
     setup_requires=[
         'pytest-runner',
     ],
     tests_require=[
         'pytest',
         'hypothesis',
+        'numpy',
         'pylama',
     ]
 )
@@ -0,0 +1,40 @@
+"""Measure BitVec operations per second.
+
+Run as ``python tests/benchmark/bench_bitvec.py``.
+"""
+import timeit
+
+from rattle.bitvec import BitVec
+
+
+def _operations():
+    a = BitVec(8, 0x5a)
+    b = BitVec(8, 0x0f, 0x30)
+    bit = BitVec(1, 1)
+    wide = BitVec(64, 0x1234, 0xff00)
+
+    return {
+        'construct': lambda: BitVec(8, 0x5a, 0x0f),
+        'construct bit': lambda: BitVec(1, 0),
+        'or': lambda: a | b,
+        'and': lambda: a & b,
+        'xor': lambda: a ^ b,
+        'invert': lambda: ~a,
+        'add': lambda: a + b,
+        'eq': lambda: a == b,
+        'slice': lambda: wide[8:24],
+        'index': lambda: bit[0],
+        'combine': lambda: a.combine(b),
+        'same_as': lambda: a.same_as(b),
+        'fields': lambda: (a.width, a.value, a.mask),
+    }
+
+
+def main(number=200000):
+    for name, operation in _operations().items():
+        seconds = min(timeit.repeat(operation, number=number, repeat=3))
+        print('%-16s %12.0f ops/s' % (name, number / seconds))
+
+
+if __name__ == '__main__':
+    main()
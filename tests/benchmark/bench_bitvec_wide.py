@@ -0,0 +1,35 @@
+"""Measure concatenation, parsing and formatting of wide BitVec values.
+
+Run as ``python tests/benchmark/bench_bitvec_wide.py``.
+"""
+import random
+import timeit
+
+from rattle.bitvec import BitVec, bv
+
+
+def _operations(width):
+    rng = random.Random(width)
+    parts = [
+        BitVec(32, rng.getrandbits(32), rng.getrandbits(32) & 0x00ff00ff)
+        for _ in range(width // 32)]
+    value = BitVec.concat(*parts)
+    text = str(value)
+
+    return {
+        'concat': lambda: BitVec.concat(*parts),
+        'str': lambda: str(value),
+        'bv': lambda: bv(text),
+    }
+
+
+def main(number=2000):
+    for width in (64, 512, 4096):
+        for name, operation in _operations(width).items():
+            seconds = min(timeit.repeat(operation, number=number, repeat=3))
+            print('%-8s %5i bits %12.0f ops/s' % (
+                name, width, number / seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Measure the overhead of visitor dispatch against plain method calls.
+
+Run as ``python tests/benchmark/bench_visitor.py``.
+"""
+import timeit
+
+from rattle.visitor import visitor
+
+
+class _Base:
+    pass
+
+
+class _Derived(_Base):
+    pass
+
+
+class _Deep(_Derived):
+    pass
+
+
+class _Visiting:
+    def method(self, target):
+        return target
+
+    @visitor
+    def visit(self, target):
+        return target
+
+    @visit.on(_Base)
+    def visit(self, target):
+        return target
+
+    @visit.on(_Derived)
+    def visit(self, target):
+        return self.visit.super(_Derived, target)
+
+
+def _operations():
+    visiting = _Visiting()
+    base, deep = _Base(), _Deep()
+
+    return {
+        'method': lambda: visiting.method(base),
+        'visit': lambda: visiting.visit(base),
+        'visit inherited': lambda: visiting.visit(deep),
+        'visit super': lambda: visiting.visit(_Derived()),
+        'visit default': lambda: visiting.visit(0),
+    }
+
+
+def main(number=200000):
+    for name, operation in _operations().items():
+        seconds = min(timeit.repeat(operation, number=number, repeat=3))
+        print('%-16s %12.0f calls/s' % (name, number / seconds))
+
+
+if __name__ == '__main__':
+    main()
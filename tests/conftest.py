@@ -20,14 +20,18 @@ def pytest_addoption(parser):
         help="Generate vcd dumps of test simulation runs")
 
 
-@pytest.fixture
+@pytest.fixture(params=[
+    {},
+    {'compiled': True},
+    {'two_state': True},
+], ids=['interpreted', 'compiled', 'two_state'])
 def sim_runner(request):
     import rattle.sim as sim
     import os
 
     def run(tb, *args, **kwds):
-        ctx = sim.SimContext(tb)
-        if pytest.config.getoption("--vcd"):
+        ctx = sim.SimContext(tb, **request.param)
+        if request.config.getoption("--vcd"):
             trace = sim.Trace()
             tb.trace(trace)
 
@@ -0,0 +1,76 @@
+from rattle.signal import *
+from rattle.type import *
+from rattle.conditional import *
+from rattle.primitive import *
+from rattle.bitvec import bv
+
+from rattle.opt.remove_overwritten_assignments import (
+    RemoveOverwrittenAssignments)
+from rattle.opt.find_continuous_assignments import FindContinuousAssignments
+from rattle.opt.eliminate_common_subexpressions import (
+    EliminateCommonSubexpressions)
+
+
+def test_share_commutative_operations(module):
+    self = module
+
+    self.a = Wire(UInt(8))
+    self.b = Wire(UInt(8))
+    self.c = Reg(UInt(8), init=None)
+    self.d = Reg(UInt(8), init=None)
+
+    self.c[:] = self.a & self.b
+    self.d[:] = self.b & self.a
+
+    circuit = self._module_data.circuit
+    EliminateCommonSubexpressions(circuit)
+    clocked_block = next(iter(circuit.clocked.values()))
+    c_rvalue = clocked_block.assignments[0].rvalue
+    d_rvalue = clocked_block.assignments[1].rvalue
+    assert c_rvalue is d_rvalue
+
+
+def test_propagate_constant_storage(module):
+    self = module
+
+    self.a = Wire(UInt(8))
+    self.b = Wire(UInt(8))
+    self.c = Input(UInt(8))
+    self.d = Reg(UInt(8), init=None)
+
+    self.a[:] = 3
+    self.b[:] = self.a + 1
+    self.d[:] = self.b ^ self.c
+
+    circuit = self._module_data.circuit
+    RemoveOverwrittenAssignments(circuit)
+    FindContinuousAssignments(circuit)
+    EliminateCommonSubexpressions(circuit)
+
+    expected = PrimXor(self.c._prim(), PrimConst(bv('00000100')))
+
+    clocked_block = next(iter(circuit.clocked.values()))
+    assert clocked_block.assignments[0].rvalue == expected
+    assert circuit.assign[self.b._prim()] == [
+        (self.b._prim(), PrimConst(bv('00000100')))]
+
+
+def test_keep_conditionally_assigned_storage(module):
+    self = module
+
+    self.a = Wire(UInt(8))
+    self.b = Wire(UInt(8))
+    self.c = Wire(Bool)
+
+    self.a[:] = 3
+    with when(self.c):
+        self.a[:] = 4
+    self.b[:] = self.a
+
+    circuit = self._module_data.circuit
+    RemoveOverwrittenAssignments(circuit)
+    FindContinuousAssignments(circuit)
+    EliminateCommonSubexpressions(circuit)
+
+    assert circuit.assign[self.b._prim()] == [
+        (self.b._prim(), self.a._prim())]
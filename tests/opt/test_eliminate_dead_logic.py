@@ -0,0 +1,82 @@
+from rattle.signal import *
+from rattle.type import *
+from rattle.conditional import *
+from rattle.module import *
+from rattle.attribute import Keep
+from rattle.verilog import Verilog
+import rattle.sim as sim
+
+
+class Debug(Module):
+    def __init__(self):
+        self.clk = Input(Clock(reset='init')).as_implicit('clk')
+        self.en = Wire(Bool)
+        self.out = Output(UInt(8))
+
+        self.counter = Reg(UInt(8))
+        self.history = Reg(UInt(8))
+        self.kept = Reg(UInt(8))
+        self.unused = Wire(UInt(8))
+
+        self.en[:] = 1
+        with when(self.en):
+            self.counter[:] = self.counter + 1
+            self.history[:] = self.history ^ self.counter
+            self.kept[:] = self.kept + 2
+        self.unused[:] = self.history + 1
+
+        self.out[:] = self.counter
+
+        self.attribute(Keep(self.kept))
+
+    def sim_init(self):
+        sim.clock(self.clk, 10)
+
+
+def test_eliminate_dead_logic():
+    dut = Debug()
+    circuit = dut._module_data.circuit.eliminate_dead_logic(
+        [dut.kept._prim()])
+
+    # The enable is removed, as all its reads are replaced by its constant
+    removed = {
+        dut.history._prim().simplify_read(), dut.unused._prim(),
+        dut.en._prim()}
+    assert circuit.removed_storage == removed
+    assert not removed & set(circuit.assign)
+    for block in circuit.blocks():
+        assert not removed & block.storage
+
+
+def test_eliminate_dead_logic_verilog():
+    source = Verilog(Debug()).source
+
+    assert 'counter' in source
+    assert 'kept' in source
+    assert 'history' not in source
+    assert 'unused' not in source
+
+
+def test_eliminate_dead_logic_sim():
+    dut = Debug()
+    trace = sim.Trace()
+    trace.add('unused', dut.unused)
+
+    ctx = sim.SimContext(dut, eliminate_dead_logic=True, keep=trace)
+
+    ctx.run(31)
+    engine = ctx._engine
+    assert engine.peek(dut.out._prim()).value == 3
+    assert engine.peek(dut.unused._prim()).value == (0 ^ 1 ^ 2) + 1
+    assert engine.peek(dut.en._prim()).mask == 1
+
+
+def test_eliminate_dead_logic_keeps_module():
+    dut = Debug()
+    Verilog(dut)
+    sim.SimContext(dut, eliminate_dead_logic=True)
+    assert not dut._module_data.circuit.removed_storage
+
+    ctx = sim.SimContext(dut)
+    ctx.run(31)
+    assert ctx._engine.peek(dut.unused._prim()).value == (0 ^ 1 ^ 2) + 1
@@ -0,0 +1,46 @@
+from rattle.circuit import BlockAssign, BlockCond
+from rattle.signal import *
+from rattle.type import *
+from rattle.conditional import *
+from rattle.module import *
+
+from rattle.opt.lower_async_reset import LowerAsyncReset
+
+
+class Regs(Module):
+    def __init__(self):
+        self.clk = Input(Clock(reset='async')).as_implicit('clk')
+        self.en = Input(Bool)
+        self.reset_reg = Reg(Bool, init=False)
+        self.other_reg = Reg(Bool, init=None)
+
+        with when(self.en):
+            self.reset_reg[:] = ~self.reset_reg
+            self.other_reg[:] = ~self.other_reg
+
+
+def test_lower_async_reset():
+    dut = Regs()
+    circuit = dut._module_data.circuit
+
+    LowerAsyncReset(circuit)
+
+    reset_storage = dut.reset_reg._prim().simplify_read()
+    other_storage = dut.other_reg._prim().simplify_read()
+    clock_prim = dut.clk.clk._prim()
+    reset_prim = dut.clk.reset._prim()
+
+    clocked_block = circuit.clocked[clock_prim]
+    assert clocked_block.storage == {other_storage}
+
+    reset_block = circuit.async_reset[(clock_prim, reset_prim)]
+    assert reset_block.storage == {reset_storage}
+    (process,) = reset_block.assignments
+    assert isinstance(process, BlockCond)
+    assert process.condition == reset_prim
+    assert [statement.storage for statement in process.true] == [
+        reset_storage]
+    (enabled,) = process.false
+    assert enabled.condition == dut.en._prim()
+    assert isinstance(enabled.true[0], BlockAssign)
+    assert enabled.true[0].storage == reset_storage
@@ -0,0 +1,57 @@
+from rattle.bitvec import bv
+from rattle.module import Module
+from rattle.signal import Input, Output
+from rattle.type import UInt
+from rattle.sim.engine import SimEngine
+from rattle.sim.compiled import CompiledSimEngine
+from rattle.sim.two_state import TwoStateSimEngine
+import pytest
+
+
+class Stage(Module):
+    def __init__(self, depth):
+        self.i = Input(UInt(8))
+        self.o = Output(UInt(8))
+        if depth:
+            self.inner = Stage(depth - 1)
+            self.inner.i[:] = self.i
+            self.o[:] = self.inner.o
+        else:
+            self.o[:] = (self.i + 1).truncate(8)
+
+
+@pytest.mark.parametrize('engine_class', [
+    SimEngine, CompiledSimEngine, TwoStateSimEngine])
+def test_port_aliases(engine_class):
+    depth = 10
+    top = Stage(depth)
+    engine = engine_class(top)
+
+    queue = engine._combinational_queue
+    evaluations = []
+    pop = queue.pop
+
+    def counting_pop():
+        key = pop()
+        evaluations.append(key)
+        return key
+
+    queue.pop = counting_pop
+
+    changes = []
+    innermost = top
+    for _ in range(depth):
+        innermost = innermost.inner
+    engine.add_callback(
+        innermost.i._prim(), 'test', lambda key, storage: changes.append(key))
+
+    engine.poke(top.i._prim(), top.i._prim(), bv('00000001'))
+    engine.step_combinational()
+
+    # Only the increment in the innermost stage is evaluated
+    assert len(evaluations) == 1
+    assert changes == ['test']
+    assert engine.peek(innermost.i._prim()).value == 1
+    assert engine.peek(innermost.o._prim()).value == 2
+    assert engine.peek(top.inner.o._prim()).value == 2
+    assert engine.peek(top.o._prim()).value == 2
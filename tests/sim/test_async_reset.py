@@ -0,0 +1,67 @@
+import numpy as np
+from rattle.prelude import *
+from rattle.verilog import Verilog
+from rattle.sim.batch import BatchSim
+import rattle.sim as sim
+
+
+class AsyncCounter(Module):
+    def __init__(self):
+        self.clk = Input(Clock(reset='async')).as_implicit('clk')
+        self.out = Output(UInt(8))
+        self.count = Reg(UInt(8), init=3)
+        self.last = Reg(UInt(8), init=None)
+        self.count[:] = self.count + 1
+        self.last[:] = self.count
+        self.out[:] = self.count ^ self.last
+
+
+def test_async_reset(sim_testbench):
+    def testbench(tb):
+        tb.dut = AsyncCounter()
+        tb.dut.clk.clk[:] = tb.clk.clk
+        tb.reset = Wire(Bool)
+        tb.dut.clk.reset[:] = tb.reset
+        yield
+
+        tb.reset[:] = 0
+        yield 1
+        tb.reset[:] = 1
+        yield 1
+        # Reset is applied without a clock edge
+        assert tb.dut.count.value == 3
+        yield 10
+        # and is held while asserted
+        assert tb.dut.count.value == 3
+        tb.reset[:] = 0
+        yield 50
+        assert tb.dut.count.value == 3 + 5
+
+        assert tb.dut.last.value == 3 + 4
+        tb.reset[:] = 1
+        yield 3
+        assert tb.dut.count.value == 3
+        # Registers without async reset are still clocked
+        yield 10
+        assert tb.dut.last.value == 3
+
+    sim_testbench(testbench)
+
+
+def test_async_reset_batch():
+    dut = AsyncCounter()
+    batch = BatchSim(dut, 2)
+    batch.poke(dut.clk.reset, np.array([0, 0]))
+    batch.poke(dut.clk.clk, np.array([0, 0]))
+    batch.step()
+    batch.poke(dut.clk.reset, np.array([1, 0]))
+    batch.step()
+    assert batch.peek_x(dut.count).tolist() == [0, 0xff]
+    assert batch.peek(dut.count)[0] == 3
+
+
+def test_async_reset_verilog():
+    source = Verilog(AsyncCounter()).source
+    assert 'always @ (posedge clk_clk) begin' in source
+    assert 'always @ (posedge clk_clk or posedge clk_reset) begin' in source
+    assert 'if (clk_reset) begin' in source
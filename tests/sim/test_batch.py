@@ -0,0 +1,147 @@
+from hypothesis import given, settings
+import hypothesis.strategies as st
+import numpy as np
+from rattle.primitive import *
+from rattle.bitvec import BitVec
+from rattle.prelude import *
+from rattle.sim.engine import SimEngine
+from rattle.sim.batch import BatchSim, BatchSimEngine
+
+from test_compiled import Operands, operands, expressions
+
+
+@settings(deadline=None)
+@given(st.lists(operands(), min_size=1, max_size=4))
+def test_batch_peek_matches_interpreter(lanes):
+    width = lanes[0][0]
+    module = Operands(width)
+    batch_engine = BatchSimEngine(module, lanes=len(lanes))
+    engine = SimEngine(module)
+
+    prims = {
+        name: getattr(module, name)._prim()
+        for name in lanes[0][1]}
+
+    for name, prim in prims.items():
+        lane_values = []
+        for lane_width, values in lanes:
+            value = values[name]
+            lane_values.append(BitVec(
+                prim.width,
+                value.value if lane_width == width else 0,
+                value.mask if lane_width == width else -1))
+        batch_engine._values[prim] = tuple(
+            np.array([getattr(v, field) for v in lane_values], dtype=(
+                np.uint64 if prim.width <= 64 else object))
+            for field in ('value', 'mask'))
+
+    for lane in range(len(lanes)):
+        for name, prim in prims.items():
+            value, mask = batch_engine._values[prim]
+            engine._values[prim] = BitVec(
+                prim.width, int(value[lane]), int(mask[lane]))
+
+        for expr in expressions(**prims):
+            value, mask = batch_engine.peek(expr)
+            interpreted = engine.peek(expr)
+            assert BitVec(
+                expr.width, int(value[lane]), int(mask[lane])
+            ).same_as(interpreted), expr
+
+
+class Accumulator(Module):
+    def __init__(self):
+        self.clk = Input(Clock(reset='init')).as_implicit('clk')
+        self.en = Input(Bool)
+        self.addr = Input(UInt(2))
+        self.data = Input(UInt(8))
+        self.sum = Output(UInt(8))
+        self.mem_out = Output(UInt(8))
+
+        self.mem = Reg(Vec(4, UInt(8)), init=None)
+        self.acc = Reg(UInt(8))
+
+        self.sum[:] = self.acc
+
+        with when(self.en):
+            self.acc[:] += self.data
+            self.mem[self.addr][:] = self.data
+
+        self.mem_out[:] = self.mem[self.addr]
+
+
+def test_batch_accumulator():
+    lanes = 5
+    dut = Accumulator()
+    sim = BatchSim(dut, lanes)
+
+    rng = np.random.RandomState(0)
+    expected_sum = np.zeros(lanes, dtype=np.uint64)
+    expected_mem = {}
+
+    for _ in range(20):
+        en = rng.randint(0, 2, lanes)
+        addr = rng.randint(0, 4, lanes)
+        data = rng.randint(0, 256, lanes)
+
+        sim.poke(dut.en, en)
+        sim.poke(dut.addr, addr)
+        sim.poke(dut.data, data)
+        sim.cycle(dut.clk)
+
+        for lane in range(lanes):
+            if en[lane]:
+                expected_sum[lane] = (expected_sum[lane] + data[lane]) % 256
+                expected_mem[lane, addr[lane]] = data[lane]
+
+        assert (sim.peek(dut.sum) == expected_sum).all()
+
+        sim.settle()
+        mem_out = sim.peek(dut.mem_out)
+        mem_x = sim.peek_x(dut.mem_out)
+        for lane in range(lanes):
+            if (lane, addr[lane]) in expected_mem:
+                assert mem_x[lane] == 0
+                assert mem_out[lane] == expected_mem[lane, addr[lane]]
+            else:
+                assert mem_x[lane] == 0xff
+
+    sim.poke(dut.addr, 0, mask=0b11)
+    sim.settle()
+    assert (sim.peek_x(dut.mem_out) != 0).any()
+
+    sim.poke(dut.en, 1)
+    sim.poke(dut.data, 0x5a)
+    sim.cycle(dut.clk)
+
+    for addr in range(4):
+        sim.poke(dut.addr, addr)
+        sim.settle()
+        mem_out = sim.peek(dut.mem_out)
+        mem_x = sim.peek_x(dut.mem_out)
+        for lane in range(lanes):
+            assert mem_out[lane] == 0x5a & ~mem_x[lane]
+            if expected_mem.get((lane, addr)) == 0x5a:
+                assert mem_x[lane] == 0
+            else:
+                assert mem_x[lane] != 0
+
+
+def test_batch_engine_clock():
+    dut = Accumulator()
+    engine = BatchSimEngine(dut, lanes=3)
+    for signal, value in [(dut.en, 1), (dut.data, 1)]:
+        prim = signal._prim()
+        engine.poke(prim, prim, (
+            np.full(3, value, dtype=np.uint64), np.zeros(3, dtype=np.uint64)))
+    engine.add_clock(dut.clk.clk._prim(), 10)
+
+    for _ in range(40):
+        engine.advance_time(1)
+        engine.step_clocks()
+        while engine.step():
+            pass
+
+    value, mask = engine.peek(dut.sum._prim())
+    assert (mask == 0).all()
+    assert (value == 4).all()
@@ -0,0 +1,104 @@
+from rattle.prelude import *
+from rattle.sim.engine import SimEngine
+import rattle.sim as sim
+import pytest
+
+
+class TwoCounters(Module):
+    def __init__(self, cycle_based=False):
+        self.cycle_based = cycle_based
+        self.fast = Input(Clock(reset='init'))
+        self.slow = Input(Clock(reset='init'))
+        self.fast_count = Reg(UInt(8), clk=self.fast)
+        self.fast_count[:] = self.fast_count + 1
+        self.slow_count = Reg(UInt(8), clk=self.slow)
+        self.slow_count[:] = self.slow_count + 1
+        self.steps = 0
+        self.levels = []
+
+    def sim_init(self):
+        sim.clock(self.fast, 4, cycle_based=self.cycle_based)
+        yield 3
+        sim.clock(self.slow, 10, cycle_based=self.cycle_based)
+
+
+@pytest.mark.parametrize('options', [
+    {}, {'compiled': True}, {'two_state': True},
+], ids=['interpreted', 'compiled', 'two_state'])
+@pytest.mark.parametrize('cycle_based', [False, True])
+def test_clocks(options, cycle_based):
+    dut = TwoCounters(cycle_based)
+    ctx = sim.SimContext(dut, **options)
+    steps = []
+    step = ctx._step
+
+    def counting_step():
+        steps.append(ctx.time())
+        return step()
+
+    ctx._step = counting_step
+    ctx.run(100)
+
+    # Time 100 is not reached and only in two-state simulation the clocks
+    # start from a low level, so that their initial rising edges count
+    initial = 1 if options.get('two_state') else 0
+    assert ctx.peek(dut.fast_count).value == 24
+    assert ctx.peek(dut.slow_count).value == 9 + initial
+    times = set(steps)
+    if cycle_based:
+        # The low phase of the initial cycle is not skipped
+        assert times == (
+            set(range(0, 100, 4)) | set(range(3, 100, 10)) | {2, 8})
+    else:
+        assert {2, 6, 8, 98} <= times
+
+
+def test_cycle_based_watched():
+    class Watched(TwoCounters):
+        def sim_init(self):
+            yield from super().sim_init()
+            while True:
+                self.levels.append((sim.time(), self.fast.clk.value))
+                yield self.fast.clk
+
+    dut = Watched(cycle_based=True)
+    sim.SimContext(dut).run(20)
+
+    # While a thread waits for changes, the low phase is not skipped
+    assert (6, 0) in dut.levels
+    assert (8, 1) in dut.levels
+
+
+class UnitClock(Module):
+    def __init__(self, cycle_based):
+        self.cycle_based = cycle_based
+        self.clk = Input(Clock(reset='init'))
+        self.count = Reg(UInt(8), clk=self.clk)
+        self.count[:] = self.count + 1
+        self.rises = []
+
+    def sim_init(self):
+        sim.clock(self.clk, 1, cycle_based=self.cycle_based)
+        while True:
+            yield self.clk.clk
+            if self.clk.clk.value:
+                self.rises.append(sim.time())
+
+
+@pytest.mark.parametrize('options', [
+    {}, {'compiled': True}, {'two_state': True},
+], ids=['interpreted', 'compiled', 'two_state'])
+@pytest.mark.parametrize('cycle_based', [False, True])
+def test_unit_period_clock(options, cycle_based):
+    dut = UnitClock(cycle_based)
+    ctx = sim.SimContext(dut, **options)
+    ctx.run(10)
+    assert dut.rises == list(range(1, 10))
+    assert ctx.peek(dut.count).value == 9
+
+
+def test_invalid_clock_period():
+    dut = UnitClock(False)
+    engine = SimEngine(dut)
+    with pytest.raises(ValueError):
+        engine.add_clock(dut.clk.clk._prim(), 0)
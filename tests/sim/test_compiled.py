@@ -0,0 +1,76 @@
+from hypothesis import given
+import hypothesis.strategies as st
+from rattle.primitive import *
+from rattle.bitvec import BitVec
+from rattle.bitmath import log2up
+from rattle.module import Module
+from rattle.signal import Wire
+from rattle.type import Bits
+from rattle.sim.engine import SimEngine
+from rattle.sim.compiled import CompiledSimEngine
+
+
+class Operands(Module):
+    def __init__(self, width):
+        self.a = Wire(Bits(width))
+        self.b = Wire(Bits(width))
+        self.shift = Wire(Bits(log2up(width) + 1))
+        self.index = Wire(Bits(log2up(width)))
+        self.select = Wire(Bits(2))
+
+
+def bitvecs(width):
+    return st.builds(
+        BitVec, st.just(width),
+        st.integers(0, (1 << width) - 1),
+        st.integers(0, (1 << width) - 1) | st.just(0))
+
+
+@st.composite
+def operands(draw):
+    width = draw(st.integers(1, 70))
+    return width, {
+        name: draw(bitvecs(width_fn(width)))
+        for name, width_fn in [
+            ('a', lambda w: w),
+            ('b', lambda w: w),
+            ('shift', lambda w: log2up(w) + 1),
+            ('index', log2up),
+            ('select', lambda w: 2),
+        ]}
+
+
+def expressions(a, b, shift, index, select):
+    yield PrimNot(a)
+    for op in (
+            PrimAnd, PrimOr, PrimXor, PrimAdd, PrimSub, PrimMul,
+            PrimEq, PrimLt, PrimSignedLt):
+        yield op(a, b)
+    for op in (PrimShiftLeft, PrimShiftRight, PrimArithShiftRight):
+        yield op(a, shift)
+    yield PrimZeroExt(a.width + 3, a)
+    yield PrimSignExt(a.width + 3, a)
+    yield PrimSlice(a.width // 2, a.width - a.width // 2, a)
+    yield PrimRepeat(3, b)
+    yield PrimConcat([a, shift, b])
+    if index.width:
+        yield PrimBitIndex(index, a)
+    yield PrimMux(select, [a, b, PrimNot(a)])
+
+
+@given(operands())
+def test_compiled_peek_matches_interpreter(args):
+    width, values = args
+    module = Operands(width)
+    engine = CompiledSimEngine(module)
+
+    prims = {}
+    for name, value in values.items():
+        prim = getattr(module, name)._prim()
+        prims[name] = prim
+        engine._values[prim] = value
+
+    for expr in expressions(**prims):
+        compiled = engine.peek(expr)
+        interpreted = SimEngine.peek(engine, expr)
+        assert compiled.same_as(interpreted), expr
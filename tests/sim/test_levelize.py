@@ -0,0 +1,78 @@
+from rattle.bitvec import bv
+from rattle.module import Module
+from rattle.signal import Input, Wire
+from rattle.type import UInt
+from rattle.sim.engine import SimEngine
+from rattle.sim.compiled import CompiledSimEngine
+from rattle.sim.levelize import levelize, WorkQueue
+import pytest
+
+
+def test_levelize_chain():
+    nodes = [
+        ('c', ['b'], ['c']),
+        ('b', ['a'], ['b']),
+        ('a', ['input'], ['a']),
+    ]
+    ranks = levelize(nodes)
+    assert ranks['a'] < ranks['b'] < ranks['c']
+
+
+def test_levelize_loop():
+    nodes = [
+        ('after', ['y'], ['z']),
+        ('loop_b', ['x'], ['y']),
+        ('loop_a', ['y', 'input'], ['x']),
+        ('before', ['input'], ['input']),
+    ]
+    ranks = levelize(nodes)
+    assert ranks['loop_a'] == ranks['loop_b']
+    assert ranks['before'] < ranks['loop_a'] < ranks['after']
+
+
+def test_work_queue_order():
+    queue = WorkQueue({'a': 0, 'b': 1, 'c': 2})
+    for key in ['c', 'a', 'unranked', 'b', 'a']:
+        queue.push(key)
+    assert len(queue) == 4
+    popped = []
+    while queue:
+        popped.append(queue.pop())
+    assert popped == ['unranked', 'a', 'b', 'c']
+
+
+class Chain(Module):
+    def __init__(self, length):
+        self.input = Input(UInt(8))
+        self.stages = [Wire(UInt(8)) for _ in range(length)]
+        # Assign the stages in reverse order, so that a FIFO evaluation order
+        # would re-evaluate stages repeatedly
+        for i in reversed(range(1, length)):
+            total = self.stages[i - 1] + self.stages[0]
+            self.stages[i][:] = total.truncate(8)
+        self.stages[0][:] = self.input
+
+
+@pytest.mark.parametrize('engine_class', [SimEngine, CompiledSimEngine])
+def test_chain_evaluated_once(engine_class):
+    length = 20
+    chain = Chain(length)
+    engine = engine_class(chain)
+
+    queue = engine._combinational_queue
+    evaluations = []
+    pop = queue.pop
+
+    def counting_pop():
+        key = pop()
+        evaluations.append(key)
+        return key
+
+    queue.pop = counting_pop
+
+    engine.poke(chain.input._prim(), chain.input._prim(), bv('00000001'))
+    engine.step_combinational()
+
+    # The first stage is an alias of the input and needs no evaluation
+    assert len(evaluations) == length - 1
+    assert engine.peek(chain.stages[-1]._prim()).value == length
@@ -0,0 +1,76 @@
+from rattle.prelude import *
+from rattle.bitvec import BitVec
+from rattle.sim.engine import SimEngine
+from rattle.sim.compiled import CompiledSimEngine
+from rattle.sim.two_state import TwoStateSimEngine
+from rattle.sim.memory import Memory
+import pytest
+
+
+def test_memory_indexing():
+    memory = Memory(8, (3, 2))
+    assert len(memory) == 2
+    assert all(
+        entry.same_as(BitVec(8, 0, -1))
+        for row in memory.to_list() for entry in row)
+
+    memory[1][2] = BitVec(8, 5)
+    assert memory.get(memory.offset((2, 1))).value == 5
+    assert memory[1][2].value == 5
+
+    copy = memory.copy()
+    memory[0][0] = BitVec(8, 1)
+    assert copy[0][0].mask == 0xff
+    assert copy != memory
+
+    with pytest.raises(IndexError):
+        memory[1][3]  # pylint: disable=pointless-statement
+
+
+def test_memory_wide_entries():
+    memory = Memory(100, (4,), two_state=True)
+    memory[3] = 1 << 99
+    assert memory.to_list() == [0, 0, 0, 1 << 99]
+
+
+class Grid(Module):
+    def __init__(self):
+        self.clk = Input(Clock(reset='init')).as_implicit('clk')
+        self.x = Input(UInt(2))
+        self.y = Input(UInt(3))
+        self.data = Input(UInt(16))
+        self.out = Output(UInt(16))
+
+        self.grid = Reg(Vec(5, Vec(3, UInt(16))), init=None)
+        self.grid[self.y][self.x][:] = self.data
+        self.out[:] = self.grid[self.y][self.x]
+
+
+@pytest.mark.parametrize('engine_class', [
+    SimEngine, CompiledSimEngine, TwoStateSimEngine])
+def test_memory_storage(engine_class):
+    dut = Grid()
+    engine = engine_class(dut)
+
+    def poke(signal, value):
+        prim = signal._prim()
+        engine.poke(prim, prim, BitVec(prim.width, value))
+        engine.step()
+
+    poke(dut.clk.clk, 0)
+    for y in range(5):
+        for x in range(3):
+            poke(dut.x, x)
+            poke(dut.y, y)
+            poke(dut.data, y * 3 + x + 100)
+            poke(dut.clk.clk, 1)
+            poke(dut.clk.clk, 0)
+
+    grid = engine._values[dut.grid._prim().simplify_read()]
+    assert isinstance(grid, Memory)
+
+    for y in range(5):
+        for x in range(3):
+            poke(dut.x, x)
+            poke(dut.y, y)
+            assert engine.peek(dut.out._prim()).value == y * 3 + x + 100
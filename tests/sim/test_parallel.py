@@ -0,0 +1,68 @@
+import os
+from rattle.prelude import *
+from rattle.sim.parallel import SimJob, run_parallel
+import rattle.sim as sim
+
+
+class Counting(Module):
+    def __init__(self, cycles, expected=None, stop=True):
+        self.clk = Input(Clock(reset='init')).as_implicit('clk')
+        self.count = Reg(UInt(8))
+        self.count[:] = self.count + 1
+        self.cycles = cycles
+        self.expected = cycles if expected is None else expected
+        self.stop = stop
+
+    def sim_init(self):
+        sim.clock(self.clk, 10)
+        yield 5
+        yield 10 * self.cycles
+        assert self.count.value == self.expected
+        if self.stop:
+            sim.stop()
+
+
+def test_run_parallel(tmp_path):
+    jobs = [SimJob(Counting, (cycles,)) for cycles in (3, 3, 3, 3, 4)]
+    jobs.append(SimJob(Counting, (3, 7), name='wrong'))
+    jobs.append(SimJob(Counting, (3,), {'stop': False}, timeout=0.5))
+
+    results = list(run_parallel(jobs, processes=2, vcd_dir=str(tmp_path)))
+
+    assert sorted(result.index for result in results) == list(range(7))
+    by_name = {result.name: result for result in results}
+    for i in range(5):
+        assert by_name['job%i' % i].passed
+        assert os.path.getsize(by_name['job%i' % i].vcd_path) > 0
+    assert by_name['wrong'].status == 'failed'
+    assert 'AssertionError' in by_name['wrong'].error
+    assert by_name['job6'].status == 'timeout'
+
+    # Each of the two workers elaborates the shared testbench at most once
+    shared = [result for result in results if result.index < 4]
+    assert sum(not result.reused for result in shared) <= 2
+
+
+def test_design_key_argument_types():
+    assert SimJob(Counting, (1,)).design_key() != (
+        SimJob(Counting, (True,)).design_key())
+    assert SimJob(Counting, (3,), {'stop': 1}).design_key() != (
+        SimJob(Counting, (3,), {'stop': True}).design_key())
+
+
+class Broken(Module):
+    def __init__(self, value):
+        raise ValueError('broken testbench %i' % value)
+
+
+def test_run_parallel_elaboration_error():
+    jobs = [SimJob(Broken, (1,)), SimJob(Broken, (2,)), SimJob(Counting, (3,))]
+
+    results = list(run_parallel(jobs, processes=2))
+
+    by_name = {result.name: result for result in results}
+    assert sorted(by_name) == ['job0', 'job1', 'job2']
+    for name, value in [('job0', 1), ('job1', 2)]:
+        assert by_name[name].status == 'failed'
+        assert 'ValueError: broken testbench %i' % value in by_name[name].error
+    assert by_name['job2'].passed
@@ -0,0 +1,53 @@
+from hypothesis import given
+import hypothesis.strategies as st
+from rattle.sim.scheduler import Scheduler
+import pytest
+
+
+@given(st.lists(st.lists(
+    st.integers(min_value=1, max_value=300), max_size=5), max_size=20))
+def test_scheduler_order(batches):
+    scheduler = Scheduler(wheel_size=16)
+    expected = set()
+    stepped = []
+    for batch in batches:
+        for delay in batch:
+            scheduler.schedule(scheduler.time() + delay)
+            expected.add(scheduler.time() + delay)
+        next_time = scheduler.next_time()
+        if next_time is not None:
+            assert scheduler.advance(next_time) == []
+            stepped.append(next_time)
+    while scheduler:
+        next_time = scheduler.next_time()
+        scheduler.advance(next_time)
+        stepped.append(next_time)
+
+    assert stepped == sorted(expected)
+
+
+def test_scheduler_periodic():
+    scheduler = Scheduler(wheel_size=4)
+    calls = []
+    scheduler.schedule_periodic(3, 10, calls.append)
+    scheduler.schedule(7)
+    scheduler.schedule(7)
+
+    times = []
+    while scheduler.time() < 40:
+        time = scheduler.next_time()
+        times.append(time)
+        for action in scheduler.advance(time):
+            action(time)
+
+    assert times == [3, 7, 13, 23, 33, 43]
+    assert calls == [3, 13, 23, 33, 43]
+
+
+def test_scheduler_skip():
+    scheduler = Scheduler()
+    scheduler.schedule(5)
+    with pytest.raises(ValueError):
+        scheduler.advance(6)
+    with pytest.raises(ValueError):
+        scheduler.schedule(-1)
@@ -0,0 +1,89 @@
+import pytest
+from rattle.prelude import *
+from rattle.std.port import SimSource, SimSink
+from rattle.std.fifo import Fifo
+import rattle.sim as sim
+
+
+class Pipeline(Module):
+    def __init__(self):
+        self.clk = Input(Clock(reset='init')).as_implicit('clk')
+        self.source = SimSource(UInt(8))
+        self.sink = SimSink(UInt(8))
+        self.fifo = Fifo(UInt(8), 4)
+        self.count = Reg(UInt(8))
+        self.count[:] = self.count + 1
+
+        self.fifo.sink[:] = self.source.source
+        self.sink.sink[:] = self.fifo.source
+
+    def sim_init(self):
+        sim.clock(self.clk, 10)
+        self.source.replace(range(40))
+
+
+def run_scenario(ctx, dut, stall):
+    with ctx.activate():
+        @sim.thread
+        def _toggle_sink():
+            for _ in range(stall):
+                dut.sink.run[:] = False
+                yield dut.clk
+            dut.sink.run[:] = True
+
+    ctx.run(200)
+    with ctx.activate():
+        return ctx.time(), dut.count.value, [
+            item.value for item in dut.sink.items]
+
+
+@pytest.mark.parametrize('options', [
+    {}, {'compiled': True}, {'two_state': True},
+], ids=['interpreted', 'compiled', 'two_state'])
+def test_snapshot_restore(options, tmp_path):
+    dut = Pipeline()
+    ctx = sim.SimContext(dut, **options)
+    ctx.run(133)
+    snapshot = ctx.snapshot()
+
+    results = []
+    for stall in (0, 5):
+        ctx.restore(snapshot)
+        results.append(run_scenario(ctx, dut, stall))
+    assert results[0] != results[1]
+
+    ctx.reset()
+    for stall, expected in zip((0, 5), results):
+        ctx.restore(snapshot)
+        assert run_scenario(ctx, dut, stall) == expected
+
+    ctx.reset()
+    dut.sink.items = []
+    ctx.run(133)
+    assert run_scenario(ctx, dut, 0) == results[0]
+
+    path = str(tmp_path / 'snapshot.pickle')
+    snapshot.save(path)
+
+    for stall, expected in zip((0, 5), results):
+        loaded_dut = Pipeline()
+        loaded_ctx = sim.SimContext(loaded_dut, **options)
+        loaded_ctx.restore(loaded_ctx.load_snapshot(path))
+        assert run_scenario(loaded_ctx, loaded_dut, stall) == expected
+
+
+def test_snapshot_design_mismatch(tmp_path):
+    ctx = sim.SimContext(Pipeline())
+    ctx.run(50)
+    path = str(tmp_path / 'snapshot.pickle')
+    ctx.snapshot().save(path)
+
+    class Other(Module):
+        def __init__(self):
+            self.clk = Input(Clock(reset='init')).as_implicit('clk')
+
+    other_ctx = sim.SimContext(Other())
+    with pytest.raises(ValueError):
+        other_ctx.load_snapshot(path)
+    with pytest.raises(ValueError):
+        other_ctx.restore(ctx.snapshot())
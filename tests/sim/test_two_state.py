@@ -0,0 +1,181 @@
+from hypothesis import given, settings
+import pytest
+from rattle.primitive import *
+from rattle.bitvec import BitVec
+from rattle.error import UnexpectedXValue
+from rattle.prelude import *
+from rattle.sim.engine import SimEngine
+from rattle.sim.two_state import TwoStateSimEngine
+import rattle.sim as sim
+
+from test_compiled import Operands, operands, expressions
+
+
+@settings(deadline=None)
+@given(operands())
+def test_two_state_peek_matches_interpreter(operands):
+    width, values = operands
+    module = Operands(width)
+    two_state_engine = TwoStateSimEngine(module)
+    engine = SimEngine(module)
+
+    prims = {}
+    for name, value in values.items():
+        prim = prims[name] = getattr(module, name)._prim()
+        value = BitVec(value.width, value.value)
+        engine._values[prim] = value
+        two_state_engine._values[prim] = value.value
+        two_state_engine._unpoked.discard(prim)
+
+    for expr in expressions(**prims):
+        interpreted = engine.peek(expr)
+        if interpreted.mask:
+            continue
+        assert two_state_engine.peek(expr).same_as(interpreted), expr
+
+
+class Counter(Module):
+    def __init__(self):
+        self.clk = Input(Clock(reset='init')).as_implicit('clk')
+        self.en = Input(Bool)
+        self.count = Output(UInt(8))
+        self.addr = Input(UInt(2))
+        self.mem_out = Output(UInt(8))
+
+        self.counter = Reg(UInt(8))
+        self.mem = Reg(Vec(3, UInt(8)), init=None)
+
+        self.count[:] = self.counter
+
+        with when(self.en):
+            self.counter[:] = self.counter + 1
+            self.mem[self.addr][:] = self.counter
+
+        self.mem_out[:] = self.mem[self.addr]
+
+
+def run_counter(check_x, addrs):
+    dut = Counter()
+    engine = TwoStateSimEngine(dut, check_x=check_x)
+
+    def poke(signal, value):
+        prim = signal._prim()
+        engine.poke(prim, prim, BitVec(prim.width, value))
+        engine.step()
+
+    poke(dut.en, 1)
+    for addr in addrs:
+        poke(dut.addr, addr)
+        poke(dut.clk.clk, 1)
+        poke(dut.clk.clk, 0)
+
+    return dut, engine
+
+
+def test_two_state_counter():
+    dut, engine = run_counter(True, [0, 1, 2, 0])
+    assert engine.peek(dut.count._prim()).value == 4
+    assert engine.peek(dut.mem_out._prim()).value == 3
+
+
+def test_two_state_check_x_index():
+    with pytest.raises(UnexpectedXValue):
+        run_counter(True, [0, 3])
+    run_counter(False, [0, 3])
+
+
+def test_two_state_check_x_poke():
+    dut = Counter()
+    engine = TwoStateSimEngine(dut, check_x=True)
+    prim = dut.en._prim()
+    with pytest.raises(UnexpectedXValue):
+        engine.poke(prim, prim, BitVec(1, 0, 1))
+
+
+class Defaults(Module):
+    def __init__(self):
+        self.a = Input(UInt(8))
+        self.overwritten = Output(UInt(8))
+        self.partial = Output(UInt(8))
+
+        self.tmp = Wire(UInt(8))
+        self.tmp[:] = X
+        self.tmp[:] = self.a
+
+        self.overwritten[:] = self.tmp
+
+        self.other = Wire(UInt(8))
+        self.other[:] = X
+        with when(self.a != 2):
+            self.other[:] = 0
+
+        self.partial[:] = self.other
+
+
+def test_two_state_check_x_default():
+    dut = Defaults()
+    prim = dut.a._prim()
+    engine = TwoStateSimEngine(dut, check_x=True)
+    engine.poke(prim, prim, BitVec(8, 1))
+    engine.step()
+    assert engine.peek(dut.overwritten._prim()).value == 1
+    engine.poke(prim, prim, BitVec(8, 2))
+    with pytest.raises(UnexpectedXValue):
+        engine.step()
+
+
+def test_two_state_requires_check_x():
+    with pytest.raises(ValueError):
+        sim.SimContext(Counter(), check_x=True)
+
+
+class FirstPoke(Module):
+    def __init__(self):
+        self.a = Input(UInt(8))
+        self.b = Output(UInt(8))
+        self.b[:] = self.a
+        self.changes = []
+
+    def sim_init(self):
+        @sim.thread
+        def _poke():
+            yield 5
+            self.a[:] = 0
+
+        while True:
+            yield self.b
+            self.changes.append(sim.time())
+
+
+def test_first_poke_notifies(sim_runner):
+    # Poking zero changes an unpoked value from x to zero in two-state
+    # simulation, even though the stored value stays the same
+    dut = FirstPoke()
+    sim_runner(dut, 20)
+    assert dut.changes == [5]
+
+
+class LatePoke(Module):
+    def __init__(self):
+        self.a = Input(UInt(6))
+        self.i = Input(UInt(3))
+
+
+def test_poke_marks_stored_values():
+    # Storage stays x until a value is actually stored in it
+    dut = LatePoke()
+    engine = TwoStateSimEngine(dut)
+    engine.reset()
+    a = dut.a._prim()
+    i = dut.i._prim()
+
+    engine.poke(i, i, BitVec(3, 7))
+    engine.poke(a, PrimBitIndex(i, a), BitVec(1, 1))
+    assert engine.peek(a).mask
+
+    shadow = {}
+    engine.poke(a, a, BitVec(6, 0), shadow=shadow)
+    assert engine.peek(a).mask
+    engine.poke_delayed(shadow)
+    engine.step()
+    assert engine.peek(a) == BitVec(6, 0)
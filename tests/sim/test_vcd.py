@@ -0,0 +1,61 @@
+import re
+import pytest
+from rattle.prelude import *
+from rattle.sim.vcd import _vcd_id
+import rattle.sim as sim
+
+
+def test_vcd_ids():
+    ids = [_vcd_id(i) for i in range(94 * 95 + 10)]
+    assert len(set(ids)) == len(ids)
+    assert all(len(vcd_id) == 1 for vcd_id in ids[:94])
+    assert all(len(vcd_id) == 2 for vcd_id in ids[94:94 * 95])
+    assert all(33 <= ord(c) <= 126 for vcd_id in ids for c in vcd_id)
+
+
+class Counter(Module):
+    def __init__(self):
+        self.clk = Input(Clock(reset='init')).as_implicit('clk')
+        self.count = Reg(UInt(4))
+        self.count[:] = self.count + 1
+        self.slow = Reg(UInt(4))
+        with when(self.count == 0):
+            self.slow[:] = self.slow + 1
+        self.const = Wire(UInt(8))
+        self.const[:] = 42
+
+    def sim_init(self):
+        sim.clock(self.clk, 10)
+
+
+@pytest.mark.parametrize('options', [
+    {}, {'compiled': True}, {'two_state': True},
+], ids=['interpreted', 'compiled', 'two_state'])
+def test_vcd_incremental(options, tmp_path):
+    path = str(tmp_path / 'trace.vcd')
+    dut = Counter()
+    trace = sim.Trace()
+    dut.trace(trace)
+
+    ctx = sim.SimContext(dut, **options)
+    ctx.dump_vcd_trace(trace, path)
+    ctx.run(1000)
+    ctx.reset()
+
+    with open(path) as vcd:
+        header, body = vcd.read().split('$enddefinitions $end\n')
+
+    ids = dict(re.findall(r'\$var wire \d+ (\S+) (\w+)', header))
+    ids = {name: vcd_id for vcd_id, name in ids.items()}
+
+    dumpvars, changes = body.split('$end\n')
+    assert 'b00101010 %s' % ids['const'] in dumpvars
+    assert ids['const'] not in changes.split()
+
+    times = [int(time) for time in re.findall(r'^#(\d+)$', changes, re.M)]
+    assert times == list(range(5, 1001, 5))
+
+    slow_changes = [
+        line for line in changes.splitlines()
+        if line.endswith(' ' + ids['slow'])]
+    assert len(slow_changes) == 7
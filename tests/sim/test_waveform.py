@@ -0,0 +1,79 @@
+import re
+import pytest
+from rattle.prelude import *
+from rattle.sim import waveform
+from rattle.sim.waveform import WaveformWriter
+import rattle.sim as sim
+
+
+class Counter(Module):
+    def __init__(self):
+        self.clk = Input(Clock(reset='init')).as_implicit('clk')
+        self.count = Reg(UInt(8))
+        self.count[:] = self.count + 1
+        self.wide = Wire(UInt(100))
+        self.wide[:] = self.count.repeat(12).as_uint().extend(100) << 3
+        self.unknown = Wire(UInt(4))
+        self.unknown[:] = X
+
+    def sim_init(self):
+        sim.clock(self.clk, 10)
+
+
+def parse_vcd(vcd):
+    header, body = vcd.split('$enddefinitions $end\n')
+    times = {}
+    lines = None
+    for line in body.splitlines():
+        if re.match(r'#\d+$', line):
+            lines = times[int(line[1:])] = set()
+        elif not line.startswith('$'):
+            lines.add(line)
+    return header, times
+
+
+def test_waveform(tmp_path, monkeypatch):
+    monkeypatch.setattr(WaveformWriter, 'chunk_size', 200)
+
+    wave_path = str(tmp_path / 'trace.wave')
+    vcd_path = str(tmp_path / 'trace.vcd')
+    converted_path = str(tmp_path / 'converted.vcd')
+
+    dut = Counter()
+    ctx = sim.SimContext(dut)
+
+    for path, format in [(wave_path, 'waveform'), (vcd_path, 'vcd')]:
+        trace = sim.Trace()
+        dut.trace(trace)
+        ctx.dump_trace(trace, path, format=format)
+
+    ctx.run(5000)
+    ctx.reset()
+
+    with waveform.open(wave_path) as wave:
+        assert len(wave._index) > 10
+        assert wave.end_time == 5000
+        assert set(wave.signals) >= {'count', 'wide', 'unknown', 'clk.clk'}
+
+        values = [
+            (time, value.value)
+            for time, value in wave.signal('count').values(1003, 1051)]
+        assert values == [
+            (1003, 100), (1010, 101), (1020, 102), (1030, 103), (1040, 104),
+            (1050, 105)]
+
+        wide = list(wave.signal('wide').values(2000, 2000))
+        assert len(wide) == 1
+        assert wide[0][1].value == int('%02x' % 200 * 12, 16) << 3
+
+        unknown = list(wave.signal('unknown').values())
+        assert len(unknown) == 1
+        assert unknown[0][1].mask == 0xf
+
+        with pytest.raises(KeyError):
+            wave.signal('missing')
+
+        wave.to_vcd(converted_path)
+
+    with open(vcd_path) as vcd, open(converted_path) as converted:
+        assert parse_vcd(vcd.read()) == parse_vcd(converted.read())
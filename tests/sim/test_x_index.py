@@ -0,0 +1,72 @@
+from rattle.prelude import *
+from rattle.bitvec import BitVec
+from rattle.sim.engine import SimEngine
+from rattle.sim.compiled import CompiledSimEngine
+import time
+import pytest
+
+
+class BigMemory(Module):
+    def __init__(self):
+        self.clk = Input(Clock(reset='init')).as_implicit('clk')
+        self.addr = Input(UInt(16))
+        self.write = Input(Bool)
+        self.data = Input(UInt(8))
+        self.out = Output(UInt(8))
+
+        self.mem = Reg(Vec(1 << 16, UInt(8)), init=None)
+        with when(self.write):
+            self.mem[self.addr][:] = self.data
+        self.out[:] = self.mem[self.addr]
+
+
+def make_engine(engine_class, **kwargs):
+    dut = BigMemory()
+    engine = engine_class(dut)
+    for name, value in kwargs.items():
+        setattr(engine, name, value)
+
+    def poke(signal, value, mask=0):
+        prim = signal._prim()
+        engine.poke(prim, prim, BitVec(prim.width, value, mask))
+        engine.step()
+
+    poke(dut.clk.clk, 0)
+    poke(dut.write, 1)
+    for addr in range(4):
+        poke(dut.addr, addr)
+        poke(dut.data, addr + 1)
+        poke(dut.clk.clk, 1)
+        poke(dut.clk.clk, 0)
+    poke(dut.write, 0)
+
+    return dut, engine, poke
+
+
+@pytest.mark.parametrize('engine_class', [SimEngine, CompiledSimEngine])
+def test_x_index_read(engine_class):
+    dut, engine, poke = make_engine(engine_class)
+
+    start = time.perf_counter()
+    poke(dut.addr, 0, 0xffff)
+    assert time.perf_counter() - start < 1
+    assert engine.peek(dut.out._prim()).mask == 0xff
+
+    # Below the limit unknown indices are still enumerated
+    poke(dut.addr, 0, 0x1)
+    assert engine.peek(dut.out._prim()).same_as(BitVec(8, 0, 0x3))
+
+
+@pytest.mark.parametrize('engine_class', [SimEngine, CompiledSimEngine])
+def test_x_index_write(engine_class):
+    dut, engine, poke = make_engine(engine_class, x_index_limit=2)
+
+    poke(dut.addr, 0, 0x3)
+    poke(dut.write, 1)
+    poke(dut.clk.clk, 1)
+    poke(dut.clk.clk, 0)
+    poke(dut.write, 0)
+
+    for addr in (0, 3, 100):
+        poke(dut.addr, addr)
+        assert engine.peek(dut.out._prim()).mask == 0xff
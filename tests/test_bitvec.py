@@ -0,0 +1,91 @@
+from hypothesis import given
+import hypothesis.strategies as st
+import copy
+import pickle
+from pytest import raises
+from rattle.bitvec import BitVec, X, bv
+
+
+@st.composite
+def bitvec_pair(draw):
+    width = draw(st.integers(min_value=0, max_value=70))
+    values = st.integers(min_value=0, max_value=(1 << width) - 1)
+    return tuple(
+        BitVec(width, draw(values), draw(values)) for _ in range(2))
+
+
+def reference_and(a, b):
+    result = []
+    for bit_a, bit_b in zip(a, b):
+        if bit_a is False or bit_b is False:
+            result.append('0')
+        elif bit_a is True and bit_b is True:
+            result.append('1')
+        else:
+            result.append('x')
+    return ''.join(reversed(result))
+
+
+@given(bitvec_pair())  # pylint: disable=no-value-for-parameter
+def test_and(pair):
+    a, b = pair
+    assert str(a & b) == reference_and(a, b)
+
+
+@given(bitvec_pair())  # pylint: disable=no-value-for-parameter
+def test_eq(pair):
+    a, b = pair
+    expected = True
+    for bit_a, bit_b in zip(a, b):
+        if bit_a is X or bit_b is X:
+            expected = X
+        elif bit_a != bit_b:
+            expected = False
+            break
+    assert (a == b) is expected
+
+
+def test_interned():
+    assert BitVec(1, 1) is bv('1')
+    assert BitVec(1, 1, 1) is bv('x')
+    assert BitVec(12, 0) is BitVec(12, 0x1000)
+    assert BitVec(12, 5, -1) is bv('xxxxxxxxxxxx')
+    assert BitVec(12, 5) is not BitVec(12, 5)
+
+
+def test_copy_and_pickle():
+    value = bv('10x1')
+    assert copy.deepcopy(value) is value
+    assert pickle.loads(pickle.dumps(value)).same_as(value)
+    assert pickle.loads(pickle.dumps(bv('0'))) is bv('0')
+
+
+@given(bitvec_pair())  # pylint: disable=no-value-for-parameter
+def test_str_roundtrip(pair):
+    a, _b = pair
+    text = ''.join(
+        'x' if bit is X else str(int(bit)) for bit in reversed(list(a)))
+    assert str(a) == text
+    assert bv(text).same_as(a)
+
+
+@given(bitvec_pair(), bitvec_pair())  # pylint: disable=no-value-for-parameter
+def test_concat(pair_a, pair_b):
+    parts = pair_a + pair_b[:1]
+    concat = BitVec.concat(*parts)
+    assert str(concat) == ''.join(str(part) for part in reversed(parts))
+
+
+def test_literals():
+    assert bv("'h1fx").same_as(bv('00011111xxxx'))
+    assert bv("'o7x").same_as(bv('111xxx'))
+    assert bv("'B1x").same_as(bv('1x'))
+    assert bv("8'h3").same_as(bv('00000011'))
+    assert bv("8'hx1").same_as(bv('xxxx0001'))
+    assert bv("6'hx").same_as(bv('xxxxxx'))
+    assert bv("2'hff").same_as(bv('11'))
+    assert bv('0x1').same_as(BitVec(3, 1, 2))
+
+    for invalid in ["'h1g", "'q1", "x'h1", '012']:
+        with raises(ValueError):
+            bv(invalid)
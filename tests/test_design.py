@@ -0,0 +1,119 @@
+import pytest
+from rattle.prelude import *
+from rattle import design
+from rattle.error import StaleDesign
+from rattle.std.port import Port, SimSource, SimSink
+from rattle.std.fifo import Fifo
+from rattle.verilog import Verilog
+import rattle.sim as sim
+
+
+Item = Bundle(a=UInt(32), b=Bool)
+
+
+class FifoChain(Module):
+    constructions = 0
+
+    def __init__(self, count):
+        FifoChain.constructions += 1
+        self.clk = Input(Clock(reset='init')).as_implicit('clk')
+        self.sink = Input(Port(Item))
+        self.source = Output(Port(Item))
+        port = self.sink
+        self.fifos = []
+        for _ in range(count):
+            fifo = Fifo(Item, 4)
+            fifo.sink[:] = port
+            port = fifo.source
+            self.fifos.append(fifo)
+        self.source[:] = port
+
+
+class FifoChainTestbench(Module):
+    def __init__(self):
+        self.clk = Input(Clock(reset='init')).as_implicit('clk')
+        self.source = SimSource(Item)
+        self.sink = SimSink(Item)
+        self.dut = FifoChain(3)
+        self.dut.clk[:] = self.clk
+        self.dut.sink[:] = self.source.source
+        self.sink.sink[:] = self.dut.source
+
+    def sim_init(self):
+        sim.clock(self.clk, 10)
+        items = [dict(a=a, b=a & 1) for a in range(20)]
+        self.source.replace(items)
+        self.source.run[:] = True
+        self.sink.run[:] = True
+        for _ in range(40):
+            yield self.clk
+        assert [x.value for x in self.sink.items] == items
+        sim.stop()
+
+
+def test_save_load_verilog(tmp_path):
+    path = str(tmp_path / 'design')
+    design.save(FifoChain(3), path)
+    loaded = design.load(path)
+    assert isinstance(loaded, FifoChain)
+    assert len(loaded.fifos) == 3
+    assert (
+        Verilog(loaded).module_sources.sources ==
+        Verilog(FifoChain(3)).module_sources.sources)
+
+
+def test_save_load_simulation(tmp_path, sim_runner):
+    path = str(tmp_path / 'design')
+    design.save(FifoChainTestbench(), path)
+    sim_runner(design.load(path))
+
+
+def test_elaborate(tmp_path):
+    path = str(tmp_path / 'design')
+    FifoChain.constructions = 0
+
+    design.elaborate(path, FifoChain, 2)
+    loaded = design.elaborate(path, FifoChain, 2)
+    assert FifoChain.constructions == 1
+    assert len(loaded.fifos) == 2
+
+    rebuilt = design.elaborate(path, FifoChain, 3)
+    assert FifoChain.constructions == 2
+    assert len(rebuilt.fifos) == 3
+
+    with pytest.raises(StaleDesign):
+        design.load(path, key=design.construction_key(FifoChain, (2,)))
+
+
+class LeafTop(Module):
+    def __init__(self):
+        from design_leaf import Leaf
+        self.x = Input(UInt(8))
+        self.y = Output(UInt(8))
+        self.leaf = Leaf()
+        self.leaf.x[:] = self.x
+        self.y[:] = self.leaf.y
+
+
+def test_changed_submodule_source(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(str(tmp_path))
+    leaf_path = tmp_path / 'design_leaf.py'
+    leaf_path.write_text(
+        'from rattle.prelude import *\n'
+        '\n'
+        '\n'
+        'class Leaf(Module):\n'
+        '    def __init__(self):\n'
+        '        self.x = Input(UInt(8))\n'
+        '        self.y = Output(UInt(8))\n'
+        '        self.y[:] = self.x\n')
+
+    path = str(tmp_path / 'design')
+    design.elaborate(path, LeafTop)
+    key = design.construction_key(LeafTop)
+    design.load(path, key=key)
+
+    with leaf_path.open('a') as file:
+        file.write('# changed\n')
+    with pytest.raises(StaleDesign):
+        design.load(path, key=key)
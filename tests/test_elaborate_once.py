@@ -0,0 +1,110 @@
+from rattle.prelude import *
+from rattle.std.port import SimSource, SimSink
+from rattle.std.fifo import Fifo
+from rattle.verilog import Verilog
+import rattle.sim as sim
+
+
+@elaborate_once
+class OnceFifo(Fifo):
+    pass
+
+
+class Accumulator(Module):
+    elaborations = 0
+
+    def __init__(self, width):
+        Accumulator.elaborations += 1
+        self.x = Input(UInt(width))
+        self.y = OutputReg(UInt(width), init=0)
+        self.y[:] = self.x + self.y
+
+
+@elaborate_once
+class OnceAccumulator(Accumulator):
+    pass
+
+
+class Accumulators(Module):
+    def __init__(self, accumulator_class):
+        self.clk = Input(Clock(reset='init')).as_implicit('clk')
+        self.x = Input(UInt(8))
+        self.y = Output(UInt(8))
+        self.accumulators = []
+        value = self.x
+        for _ in range(4):
+            accumulator = accumulator_class(8)
+            accumulator.x[:] = value
+            value = accumulator.y
+            self.accumulators.append(accumulator)
+        self.wide = accumulator_class(9)
+        self.wide.x[:] = self.x.extend(9)
+        self.y[:] = value
+
+
+def test_elaborate_once():
+    @elaborate_once
+    class FreshAccumulator(Accumulator):
+        pass
+
+    Accumulator.elaborations = 0
+    Accumulators(FreshAccumulator)
+    assert Accumulator.elaborations == 2
+
+
+def test_elaborate_once_argument_types():
+    @elaborate_once
+    class Flag(Module):
+        def __init__(self, flag):
+            self.flag = flag
+
+    with Module().reopen():
+        assert type(Flag(1).flag) is int
+        assert type(Flag(True).flag) is bool
+        assert type(Flag(flag=True).flag) is bool
+        assert type(Flag(flag=1).flag) is int
+
+
+def test_elaborate_once_generates_same_verilog():
+    expected = Verilog(Accumulators(Accumulator)).module_sources.sources
+    sources = Verilog(Accumulators(OnceAccumulator)).module_sources.sources
+    assert list(sources) == [
+        'OnceAccumulator', 'OnceAccumulator_1', 'Accumulators']
+    assert [
+        source.replace('OnceAccumulator', 'Accumulator')
+        for source in sources.values()] == list(expected.values())
+
+
+def test_elaborate_once_clones_are_independent(sim_testbench):
+    Type = Bundle(a=UInt(32), b=Bool)
+
+    @sim_testbench
+    def _testbench(self):
+        self.source = SimSource(Type)
+        self.sink = SimSink(Type)
+        self.fifos = [OnceFifo(Type, 4) for _ in range(3)]
+
+        self.fifos[0].sink[:] = self.source.source
+        for fifo, next_fifo in zip(self.fifos, self.fifos[1:]):
+            next_fifo.sink[:] = fifo.source
+        self.sink.sink[:] = self.fifos[-1].source
+
+        yield
+
+        items = [dict(a=a, b=a & 1) for a in range(20)]
+
+        self.source.replace(items)
+        self.source.run[:] = True
+
+        @sim.thread
+        def _toggle_sink():
+            for _ in range(8):
+                yield self.clk
+                self.sink.run[:] = False
+                yield self.clk
+                self.sink.run[:] = True
+
+        for _ in range(60):
+            yield self.clk
+
+        assert [x.value for x in self.sink.items] == items
@@ -62,3 +62,82 @@ def test_lower_mux_lvalue_to_conditional_assigns():
 
 def test_equality_considers_shape():
     assert PrimConst(bv('00')) != PrimConst(bv('000'))
+
+
+def test_equal_values_are_shared():
+    a, b = mkvars('a b', width=8)
+    assert PrimAnd(a, b) is PrimAnd(a, b)
+    assert PrimAdd(PrimNot(a), b) is PrimAdd(PrimNot(a), b)
+    assert PrimAnd(a, b) is not PrimAnd(b, a)
+    assert PrimSlice(0, 8, a) is a
+    assert PrimConst(bv('0101')) is PrimConst(bv('0101'))
+    assert PrimAdd(PrimConst(bv('0101')), PrimConst(bv('0001'))) is (
+        PrimConst(bv('0110')))
+
+
+def test_shared_values_are_released():
+    import gc
+    import weakref
+    a, b = mkvars('a b', width=8)
+    expr = weakref.ref(PrimXor(PrimOr(a, b), b))
+    gc.collect()
+    assert expr() is None
+
+
+def test_simplified_operands_are_released():
+    import gc
+    import weakref
+    a, b = mkvars('a b', width=8)
+    refs = [weakref.ref(a), weakref.ref(b)]
+    assert PrimSlice(0, 8, a) is a
+    assert PrimMux(PrimConst(bv('1')), [a, b]) is b
+    del a, b
+    gc.collect()
+    assert all(ref() is None for ref in refs)
+
+
+def test_values_of_storage_owners_are_released():
+    import gc
+    import weakref
+
+    class Owner:
+        pass
+
+    owner = Owner()
+    a, b = (PrimStorage(owner, None, 8, ()) for _ in range(2))
+    owner.value = PrimSlice(0, 8, PrimConcat([a, b]))
+    assert PrimSlice(0, 8, PrimConcat([a, b])) is owner.value
+    ref = weakref.ref(owner)
+    del owner, a, b
+    gc.collect()
+    assert ref() is None
+
+
+def test_pickled_values_rehash():
+    import gc
+    import pickle
+    const = PrimConst(bv('0101'))
+    hash(const)
+    assert '_hash' not in const.__getstate__()
+    data = pickle.dumps(const)
+    del const
+    gc.collect()
+    loaded = pickle.loads(data)
+    assert not hasattr(loaded, '_hash')
+    assert hash(loaded) == hash(PrimConst(bv('0101')))
+
+
+def test_pickled_values_are_shared():
+    import pickle
+    a, b = mkvars('a b', width=8)
+    expr = PrimXor(PrimOr(a, b), b)
+    loaded = pickle.loads(pickle.dumps((a, b, expr)))
+    assert loaded[2] is PrimXor(PrimOr(loaded[0], loaded[1]), loaded[1])
+    const = PrimConst(bv('0101'))
+    assert pickle.loads(pickle.dumps(const)) is const
+
+
+def test_mux_and_table_accessed_storage():
+    a, b, index = mkvars('a b index')
+    assert PrimMux(index, [a, b]).accessed_storage == {a, b, index}
+    assert PrimTable([a, b]).accessed_storage == {a, b}
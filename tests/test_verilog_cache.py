@@ -0,0 +1,71 @@
+from rattle.prelude import *
+from rattle.verilog import Verilog
+from rattle.verilog.cache import VerilogCache
+
+
+class Counter(Module):
+    def __init__(self, width):
+        self.clk = Input(Clock()).as_implicit('clk')
+        self.en = Input(Bool)
+        self.count = OutputReg(UInt(width), init=0)
+        with when(self.en):
+            self.count[:] = self.count + 1
+
+
+class Top(Module):
+    def __init__(self, width_b):
+        self.clk = Input(Clock()).as_implicit('clk')
+        self.en = Input(Bool)
+        self.out_a = Output(UInt(8))
+        self.out_b = Output(UInt(width_b))
+
+        self.a = Counter(8)
+        self.a.en[:] = self.en
+        self.b = Counter(width_b)
+        self.b.en[:] = ~self.en
+        self.out_a[:] = self.a.count
+        self.out_b[:] = self.b.count
+
+
+def generate(top, cache):
+    verilog = Verilog(top, cache=cache)
+    return dict(verilog.module_sources.sources)
+
+
+def test_cache_hits(tmp_path):
+    expected = generate(Top(4), None)
+
+    cache = VerilogCache(tmp_path)
+    assert generate(Top(4), cache) == expected
+    assert (cache.hits, cache.misses) == (0, 3)
+
+    cache = VerilogCache(tmp_path)
+    top = Top(4)
+    assert generate(top, cache) == expected
+    assert (cache.hits, cache.misses) == (3, 0)
+
+    # Names assigned during generation are restored
+    names = top.b._module_data.names
+    assert names.name_prim(top.b.count._prim()) == 'count'
+    assert top.a._module_data.instance_name == 'a'
+
+
+def test_cache_changed_submodule(tmp_path):
+    cache = VerilogCache(tmp_path)
+    generate(Top(4), cache)
+
+    cache = VerilogCache(tmp_path)
+    expected = generate(Top(5), None)
+    assert generate(Top(5), cache) == expected
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_cache_eviction(tmp_path):
+    cache = VerilogCache(tmp_path)
+    generate(Top(4), cache)
+    generate(Top(5), cache)
+    assert len(list(tmp_path.glob('*.json'))) == 5
+
+    cache.max_size = 0
+    cache.evict()
+    assert not list(tmp_path.glob('*.json'))
@@ -0,0 +1,52 @@
+from rattle.prelude import *
+from rattle.verilog import Verilog
+
+
+class Lane(Module):
+    def __init__(self, width):
+        self.clk = Input(Clock()).as_implicit('clk')
+        self.x = Input(UInt(width))
+        self.y = OutputReg(UInt(width), init=0)
+        self.y[:] = self.x + self.y
+
+
+class Lanes(Module):
+    def __init__(self, count):
+        self.clk = Input(Clock()).as_implicit('clk')
+        self.x = Input(UInt(8))
+        self.lanes = []
+        for _ in range(count):
+            lane = Lane(8)
+            lane.x[:] = self.x
+            self.lanes.append(lane)
+        self.wide = Lane(9)
+        self.wide.x[:] = self.x.extend(9)
+
+        self.y = Output(UInt(8))
+        acc = self.lanes[0].y
+        for lane in self.lanes[1:]:
+            acc = acc ^ lane.y
+        self.y[:] = acc
+
+
+def test_identical_modules_share_source():
+    top = Lanes(16)
+    verilog = Verilog(top)
+    sources = verilog.module_sources.sources
+    assert list(sources) == ['Lane', 'Lane_1', 'Lanes']
+
+    for lane in top.lanes:
+        assert lane._module_data.module_name == 'Lane'
+        assert lane._module_data.names.name_prim(lane.y._prim()) == 'y'
+    assert top.wide._module_data.module_name == 'Lane_1'
+
+    instance_names = {lane._module_data.instance_name for lane in top.lanes}
+    assert len(instance_names) == 16
+    assert sources['Lanes'].count('Lane ') == 16
+
+
+def test_identical_modules_match_separate_generation():
+    top = Lanes(4)
+    Verilog(top)
+    for lane in top.lanes:
+        assert Verilog(lane).source == Verilog(top.lanes[0]).source
@@ -141,3 +141,44 @@ def test_visitor_super():
     v = V()
     v.visit(aaar)
     assert v.obj == ('aaar', aaar)
+
+
+def test_visitor_handler_added_later():
+    class V:
+        @visitor
+        def visit(self, obj):
+            self.obj = 'default', obj
+
+    v = V()
+    ar = AR()
+    v.visit(ar)
+    assert v.obj == ('default', ar)
+
+    @V.__dict__['visit'].on(R)
+    def _visit_r(self, obj):
+        self.obj = 'r', obj
+
+    v.visit(ar)
+    assert v.obj == ('r', ar)
+
+
+class Copied:
+    @visitor
+    def visit(self, obj):
+        self.obj = obj
+
+
+def test_visitor_bound_per_instance():
+    import copy
+    import pickle
+
+    v, w = Copied(), Copied()
+    v.visit('v')
+    w.visit('w')
+    assert (v.obj, w.obj) == ('v', 'w')
+    assert 'visit' not in vars(v)
+
+    c = copy.copy(v)
+    c.visit('c')
+    assert (v.obj, c.obj) == ('v', 'c')
+    assert pickle.loads(pickle.dumps(v)).obj == 'v'